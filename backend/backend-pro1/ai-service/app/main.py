@@ -9,6 +9,7 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import structlog
 import ray
 
@@ -19,8 +20,12 @@ sys.path.insert(0, str(shared_dir))
 
 from shared.config import get_settings
 from shared.logging import setup_logging
+from shared.metrics_registry import metrics_response
 from shared.database import Database
+from shared.database_sampler import DatabaseSampler
 from shared.redis_client import RedisClient
+from shared.redis_lock import LockReleaseListener
+from shared.cache import FunctionCache
 from shared.middleware.request_id import RequestIDMiddleware
 from shared.middleware.metrics import MetricsMiddleware
 
@@ -36,8 +41,26 @@ async def lifespan(app: FastAPI):
     logger.info("Starting AI Service", project_id=settings.PROJECT_ID)
     
     # 初始化连接
-    await Database.connect(settings.DATABASE_URL)
-    await RedisClient.connect(settings.REDIS_URL)
+    await Database.connect_service("ai_service", settings)
+    await RedisClient.connect(
+        settings.REDIS_URL,
+        codec=settings.REDIS_CODEC,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        pool_timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS,
+        circuit_failure_threshold=settings.REDIS_CIRCUIT_FAILURE_THRESHOLD,
+        circuit_reset_seconds=settings.REDIS_CIRCUIT_RESET_SECONDS,
+        auto_pipeline=settings.REDIS_AUTO_PIPELINE,
+        auto_pipeline_max_batch=settings.REDIS_AUTO_PIPELINE_MAX_BATCH,
+        near_cache=settings.REDIS_NEAR_CACHE_ENABLED,
+        near_cache_prefixes=settings.redis_near_cache_prefixes,
+        near_cache_max_size=settings.REDIS_NEAR_CACHE_MAX_SIZE,
+        near_cache_ttl=settings.REDIS_NEAR_CACHE_TTL_SECONDS
+    )
+    await LockReleaseListener.start()
+    await DatabaseSampler.start("ai_service")
+    await FunctionCache.start()
     
     # 初始化Ray集群
     try:
@@ -59,6 +82,9 @@ async def lifespan(app: FastAPI):
     
     logger.info("Shutting down AI Service")
     ray.shutdown()
+    await FunctionCache.stop()
+    await DatabaseSampler.stop()
+    await LockReleaseListener.stop()
     await Database.disconnect()
     await RedisClient.disconnect()
 
@@ -94,6 +120,25 @@ def create_app() -> FastAPI:
     app.include_router(model_management.router, prefix="/models", tags=["模型管理"])
     app.include_router(distributed_tasks.router, prefix="/tasks", tags=["分布式任务"])
     
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        """获取Prometheus指标"""
+        return metrics_response()
+    
+    if settings.DEBUG:
+        # 与 /docs 相同，调试快照仅在 DEBUG 模式下注册
+        @app.get("/debug/db", include_in_schema=False)
+        async def database_debug_snapshot(limit: int = 20):
+            """数据库调试快照：连接池状态与最近的统计样本"""
+            return DatabaseSampler.snapshot(limit=min(max(limit, 0), 1000))
+    
+    @app.get("/ready")
+    async def readiness_check():
+        """就绪检查：连接池预热完成后才接收流量"""
+        if not Database.is_ready():
+            return JSONResponse(content={"status": "not_ready", "service": "ai-service"}, status_code=503)
+        return {"status": "ready", "service": "ai-service"}
+    
     @app.get("/health")
     async def health_check():
         return {
@@ -0,0 +1,38 @@
+"""
+限流策略配置
+API网关按路由、方法和用户套餐声明的限流规则
+"""
+
+from shared.middleware.rate_limit_policy import RateLimitPolicy, rule
+
+API_V1_PREFIX = "/api/v1"
+
+# 限流策略
+LOGIN_POLICY = RateLimitPolicy(name="auth_login", limit=10, window=60, algorithm="sliding_window")
+REGISTER_POLICY = RateLimitPolicy(name="auth_register", limit=5, window=3600, algorithm="sliding_window")
+ANALYSIS_FREE_POLICY = RateLimitPolicy(name="analysis_free", limit=30, window=60)
+ANALYSIS_PAID_POLICY = RateLimitPolicy(name="analysis_paid", limit=300, window=60)
+API_PAID_POLICY = RateLimitPolicy(name="api_paid", limit=1000, window=60)
+
+PAID_PLANS = ("pro", "enterprise")
+
+# 规则按声明顺序匹配，policy为None表示豁免限流
+GATEWAY_RATE_LIMIT_RULES = [
+    # 健康检查和指标端点
+    rule("/health", None),
+    rule("/health/*", None),
+    rule("/ready", None),
+    rule("/live", None),
+    rule("/metrics", None),
+
+    # 认证端点（按IP限流，防止暴力破解）
+    rule(f"{API_V1_PREFIX}/auth/login", LOGIN_POLICY, methods=["POST"]),
+    rule(f"{API_V1_PREFIX}/auth/register", REGISTER_POLICY, methods=["POST"]),
+
+    # 数据分析端点
+    rule(f"{API_V1_PREFIX}/analysis/*", ANALYSIS_PAID_POLICY, plans=PAID_PLANS),
+    rule(f"{API_V1_PREFIX}/analysis/*", ANALYSIS_FREE_POLICY),
+
+    # 付费套餐的通用配额，其余请求使用中间件默认策略
+    rule(f"{API_V1_PREFIX}/*", API_PAID_POLICY, plans=PAID_PLANS),
+]
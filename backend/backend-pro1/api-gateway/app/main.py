@@ -15,7 +15,6 @@ from fastapi.responses import JSONResponse
 import structlog
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 # 添加共享模块到Python路径
 current_dir = Path(__file__).parent.parent.parent
@@ -24,14 +23,22 @@ sys.path.insert(0, str(shared_dir))
 
 from shared.config import get_settings
 from shared.logging import setup_logging
+from shared.metrics_registry import metrics_response
 from shared.database import Database
+from shared.database_sampler import DatabaseSampler
 from shared.redis_client import RedisClient
+from shared.redis_lock import LockReleaseListener
+from shared.user_cache import UserCache
+from shared.cache import FunctionCache
+from shared.token_revocation import TokenRevocationList
+from shared.password_hasher import PasswordHasher
 from shared.middleware.rate_limit import RateLimitMiddleware
 from shared.middleware.request_id import RequestIDMiddleware
 from shared.middleware.metrics import MetricsMiddleware
 
 from app.routers import auth, users, projects, analysis, health
 from app.core.exceptions import setup_exception_handlers
+from app.core.rate_limits import GATEWAY_RATE_LIMIT_RULES
 
 
 @asynccontextmanager
@@ -44,18 +51,50 @@ async def lifespan(app: FastAPI):
     logger.info("Starting API Gateway", project_id=settings.PROJECT_ID)
     
     # 初始化数据库连接
-    await Database.connect(settings.DATABASE_URL)
+    await Database.connect_service("api_gateway", settings)
     logger.info("Database connected")
     
     # 初始化Redis连接
-    await RedisClient.connect(settings.REDIS_URL)
+    await RedisClient.connect(
+        settings.REDIS_URL,
+        codec=settings.REDIS_CODEC,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        pool_timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS,
+        circuit_failure_threshold=settings.REDIS_CIRCUIT_FAILURE_THRESHOLD,
+        circuit_reset_seconds=settings.REDIS_CIRCUIT_RESET_SECONDS,
+        auto_pipeline=settings.REDIS_AUTO_PIPELINE,
+        auto_pipeline_max_batch=settings.REDIS_AUTO_PIPELINE_MAX_BATCH,
+        near_cache=settings.REDIS_NEAR_CACHE_ENABLED,
+        near_cache_prefixes=settings.redis_near_cache_prefixes,
+        near_cache_max_size=settings.REDIS_NEAR_CACHE_MAX_SIZE,
+        near_cache_ttl=settings.REDIS_NEAR_CACHE_TTL_SECONDS
+    )
     logger.info("Redis connected")
     
+    # 启动锁释放通知监听与数据库统计采样（数据库级统计由领导者副本采样）
+    await LockReleaseListener.start()
+    await DatabaseSampler.start("api_gateway")
+    
+    # 启动用户缓存与函数缓存失效监听
+    await UserCache.start()
+    await FunctionCache.start()
+    
+    # 启动令牌撤销列表同步
+    await TokenRevocationList.start()
+    
     # 应用运行期间
     yield
     
     # 关闭时清理
     logger.info("Shutting down API Gateway")
+    await TokenRevocationList.stop()
+    await FunctionCache.stop()
+    await UserCache.stop()
+    await DatabaseSampler.stop()
+    await LockReleaseListener.stop()
+    PasswordHasher.shutdown()
     await Database.disconnect()
     await RedisClient.disconnect()
 
@@ -115,7 +154,14 @@ def setup_middleware(app: FastAPI, settings):
     app.add_middleware(MetricsMiddleware)
     
     # 限流中间件
-    app.add_middleware(RateLimitMiddleware, redis_url=settings.REDIS_URL)
+    app.add_middleware(
+        RateLimitMiddleware,
+        redis_url=settings.REDIS_URL,
+        rules=GATEWAY_RATE_LIMIT_RULES,
+        lease_size=settings.RATE_LIMIT_LEASE_SIZE,
+        lease_ttl=settings.RATE_LIMIT_LEASE_TTL_SECONDS,
+        lease_max_overdraft=settings.RATE_LIMIT_LEASE_MAX_OVERDRAFT,
+    )
     
     # CORS中间件
     if settings.DEBUG:
@@ -178,13 +224,12 @@ def setup_routers(app: FastAPI):
         prefix=f"{api_v1_prefix}/analysis",
         tags=["数据分析"]
     )
-
-
-# Prometheus指标端点
-@app.get("/metrics")
-async def get_metrics():
-    """获取Prometheus指标"""
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    
+    # Prometheus指标端点（多worker部署时聚合所有worker）
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        """获取Prometheus指标"""
+        return metrics_response()
 
 
 # 创建应用实例
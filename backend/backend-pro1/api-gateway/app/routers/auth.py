@@ -6,20 +6,32 @@
 from datetime import timedelta
 from typing import Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, validator
 import structlog
 
 from shared.config import get_settings, Settings
 from shared.auth import (
-    authenticate_user,
+    authenticate_user_record,
     create_access_token,
     create_refresh_token,
     get_current_user,
-    get_password_hash,
+    get_password_hash_async,
+    revoke_token,
+    security,
+    token_claims,
     verify_refresh_token
 )
-from shared.database import Database
+from shared.database import Database, get_unit_of_work
+from shared.queries import (
+    ACTIVE_USER_BY_ID,
+    INSERT_USER,
+    INSERT_USER_PROFILE,
+    USER_BY_ID,
+    USER_ID_BY_EMAIL
+)
+from shared.token_revocation import TokenRevocationList
+from shared.users import record_login
 from shared.models.user import User, UserCreate, UserResponse
 from app.core.exceptions import (
     AuthenticationError,
@@ -75,7 +87,11 @@ class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
 
-@router.post("/register", response_model=Dict[str, Any])
+@router.post(
+    "/register",
+    response_model=Dict[str, Any],
+    dependencies=[Depends(get_unit_of_work)]
+)
 async def register(
     user_data: UserRegisterRequest,
     request: Request,
@@ -90,81 +106,65 @@ async def register(
         request_id=request_id
     )
     
-    # 检查用户是否已存在
-    existing_user = await Database.fetch_one(
-        "SELECT id FROM users WHERE email = $1",
-        user_data.email
-    )
-    
-    if existing_user:
-        raise ResourceConflictError("用户已存在", "用户")
-    
-    # 创建用户
-    password_hash = get_password_hash(user_data.password)
+    # 先计算密码哈希，避免在持有数据库连接期间执行耗时哈希
+    password_hash = await get_password_hash_async(user_data.password)
     
-    try:
-        # 插入用户记录
-        user_id = await Database.fetch_val(
-            """
-            INSERT INTO users (email, password_hash, is_active, email_verified)
-            VALUES ($1, $2, true, false)
-            RETURNING id
-            """,
-            user_data.email,
-            password_hash
-        )
-        
-        # 插入用户档案
-        await Database.execute(
-            """
-            INSERT INTO user_profiles (user_id, first_name, last_name)
-            VALUES ($1, $2, $3)
-            """,
-            user_id,
-            user_data.first_name,
-            user_data.last_name
-        )
-        
-        # 获取完整用户信息
-        user_record = await Database.fetch_one(
-            """
-            SELECT u.*, p.first_name, p.last_name, p.avatar_url
-            FROM users u
-            LEFT JOIN user_profiles p ON u.id = p.user_id
-            WHERE u.id = $1
-            """,
-            user_id
-        )
-        
-        user = User.from_record(user_record)
+    # 查重与创建在同一连接的同一事务中完成
+    async with Database.transaction():
+        # 检查用户是否已存在
+        existing_user = await Database.fetch_one(USER_ID_BY_EMAIL, user_data.email)
         
-        logger.info(
-            "用户注册成功",
-            user_id=user_id,
-            email=user_data.email,
-            request_id=request_id
-        )
+        if existing_user:
+            raise ResourceConflictError("用户已存在", "用户")
         
-        # TODO: 发送验证邮件
-        
-        return {
-            "success": True,
-            "message": "注册成功，请检查邮箱完成验证",
-            "user": UserResponse.from_user(user)
-        }
-        
-    except Exception as e:
-        logger.error(
-            "用户注册失败",
-            email=user_data.email,
-            error=str(e),
-            request_id=request_id,
-            exc_info=True
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="注册失败，请稍后重试"
-        )
+        try:
+            # 插入用户记录
+            user_id = await Database.fetch_val(
+                INSERT_USER,
+                user_data.email,
+                password_hash
+            )
+            
+            # 插入用户档案
+            await Database.execute(
+                INSERT_USER_PROFILE,
+                user_id,
+                user_data.first_name,
+                user_data.last_name
+            )
+            
+            # 获取完整用户信息
+            user_record = await Database.fetch_one(USER_BY_ID, user_id)
+            
+            user = User.from_record(user_record)
+            
+        except Exception as e:
+            logger.error(
+                "用户注册失败",
+                email=user_data.email,
+                error=str(e),
+                request_id=request_id,
+                exc_info=True
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="注册失败，请稍后重试"
+            )
+    
+    logger.info(
+        "用户注册成功",
+        user_id=user_id,
+        email=user_data.email,
+        request_id=request_id
+    )
+    
+    # TODO: 发送验证邮件
+    
+    return {
+        "success": True,
+        "message": "注册成功，请检查邮箱完成验证",
+        "user": UserResponse.from_user(user)
+    }
 
 
 @router.post("/login", response_model=TokenResponse)
@@ -183,8 +183,8 @@ async def login(
     )
     
     # 认证用户
-    user = await authenticate_user(user_data.email, user_data.password)
-    if not user:
+    user_record = await authenticate_user_record(user_data.email, user_data.password)
+    if not user_record:
         logger.warning(
             "登录失败：用户名或密码错误",
             email=user_data.email,
@@ -192,23 +192,22 @@ async def login(
         )
         raise AuthenticationError("用户名或密码错误")
     
-    # 创建访问令牌
+    user = User.from_record(user_record)
+    
+    # 创建访问令牌（含套餐声明，限流中间件据此选择策略）
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "email": user.email},
+        data=token_claims(user_record),
         expires_delta=access_token_expires
     )
     
     # 创建刷新令牌
     refresh_token = create_refresh_token(
-        data={"sub": str(user.id), "email": user.email}
+        data=token_claims(user_record)
     )
     
-    # 更新最后登录时间
-    await Database.execute(
-        "UPDATE users SET last_login_at = NOW() WHERE id = $1",
-        user.id
-    )
+    # 更新最后登录时间（同时使用户缓存失效）
+    await record_login(user.id)
     
     logger.info(
         "用户登录成功",
@@ -243,16 +242,11 @@ async def refresh_token(
     if not user_id:
         raise AuthenticationError("无效的刷新令牌")
     
+    if await TokenRevocationList.is_revoked(payload):
+        raise AuthenticationError("刷新令牌已被撤销")
+    
     # 获取用户信息
-    user_record = await Database.fetch_one(
-        """
-        SELECT u.*, p.first_name, p.last_name, p.avatar_url
-        FROM users u
-        LEFT JOIN user_profiles p ON u.id = p.user_id
-        WHERE u.id = $1 AND u.is_active = true
-        """,
-        int(user_id)
-    )
+    user_record = await Database.fetch_one(ACTIVE_USER_BY_ID, int(user_id))
     
     if not user_record:
         raise AuthenticationError("用户不存在或已被禁用")
@@ -262,13 +256,13 @@ async def refresh_token(
     # 创建新的访问令牌
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "email": user.email},
+        data=token_claims(user_record),
         expires_delta=access_token_expires
     )
     
-    # 创建新的刷新令牌
+    # 创建新的刷新令牌（套餐按数据库中的当前值更新）
     new_refresh_token = create_refresh_token(
-        data={"sub": str(user.id), "email": user.email}
+        data=token_claims(user_record)
     )
     
     logger.info(
@@ -288,12 +282,14 @@ async def refresh_token(
 @router.post("/logout")
 async def logout(
     request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
     current_user: User = Depends(get_current_user)
 ):
     """用户登出"""
     request_id = getattr(request.state, "request_id", None)
     
-    # TODO: 将令牌加入黑名单（Redis）
+    # 将令牌加入撤销列表（Redis）
+    await revoke_token(credentials.credentials)
     
     logger.info(
         "用户登出",
@@ -3,7 +3,7 @@
 提供系统健康状态检查端点
 """
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import JSONResponse
 from datetime import datetime
 import asyncio
@@ -11,6 +11,7 @@ import structlog
 
 from shared.config import get_settings, Settings
 from shared.database import Database
+from shared.database_sampler import DatabaseSampler
 from shared.redis_client import RedisClient
 
 logger = structlog.get_logger()
@@ -48,6 +49,13 @@ async def detailed_health_check(settings: Settings = Depends(get_settings)):
             "status": "healthy",
             "response_time_ms": None  # 可以添加响应时间测量
         }
+        # 该端点无需认证且不限流，归一化SQL、副本地址、连接池容量等内部细节与 /debug/db 一样仅 DEBUG 模式返回
+        if settings.DEBUG:
+            health_status["dependencies"]["database"].update({
+                "queries": Database.get_query_stats(),
+                "replicas": Database.replica_status(),
+                "pools": Database.pool_status()
+            })
     except Exception as e:
         logger.error("数据库健康检查失败", error=str(e))
         health_status["dependencies"]["database"] = {
@@ -63,6 +71,9 @@ async def detailed_health_check(settings: Settings = Depends(get_settings)):
             "status": "healthy",
             "response_time_ms": None
         }
+        # Redis拓扑与连接池状态同样仅 DEBUG 模式返回
+        if settings.DEBUG:
+            health_status["dependencies"]["redis"].update(RedisClient.status())
     except Exception as e:
         logger.error("Redis健康检查失败", error=str(e))
         health_status["dependencies"]["redis"] = {
@@ -105,7 +116,9 @@ async def detailed_health_check(settings: Settings = Depends(get_settings)):
 async def readiness_check():
     """就绪检查，用于Kubernetes readiness probe"""
     try:
-        # 检查关键依赖是否就绪
+        # 检查关键依赖是否就绪（连接池预热完成前不接收流量）
+        if not Database.is_ready():
+            raise RuntimeError("数据库连接池尚未预热完成")
         await Database.execute_query("SELECT 1")
         await RedisClient.ping()
         
@@ -131,4 +144,12 @@ async def liveness_check():
     return {
         "status": "alive",
         "timestamp": datetime.utcnow().isoformat() + "Z"
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/debug/db", include_in_schema=False)
+async def database_debug_snapshot(limit: int = 20, settings: Settings = Depends(get_settings)):
+    """数据库调试快照：连接池状态与最近的统计样本（与 /docs 相同，仅 DEBUG 模式开放）"""
+    if not settings.DEBUG:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return DatabaseSampler.snapshot(limit=min(max(limit, 0), 1000))
@@ -2,23 +2,41 @@
 用户管理路由模块
 """
 
-from fastapi import APIRouter, Depends, Request
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
 from shared.auth import get_current_user
+from shared.database import Database
 from shared.models.user import User, UserResponse
+from shared.queries import USER_BY_ID
+from shared.users import update_user_profile as save_user_profile
+from app.core.exceptions import ResourceNotFoundError
 
 router = APIRouter()
 
 
+class UserProfileUpdateRequest(BaseModel):
+    """用户档案更新请求（未提供的字段保留原值）"""
+    first_name: Optional[str] = Field(None, max_length=100)
+    last_name: Optional[str] = Field(None, max_length=100)
+    avatar_url: Optional[str] = Field(None, max_length=500)
+
+
 @router.get("/profile", response_model=UserResponse)
 async def get_user_profile(current_user: User = Depends(get_current_user)):
     """获取用户档案"""
     return UserResponse.from_user(current_user)
 
 
-@router.put("/profile")
+@router.put("/profile", response_model=UserResponse)
 async def update_user_profile(
-    request: Request,
+    profile_data: UserProfileUpdateRequest,
     current_user: User = Depends(get_current_user)
 ):
     """更新用户档案"""
-    return {"message": "Profile update endpoint - 待实现"}
\ No newline at end of file
+    if not await save_user_profile(current_user.id, **profile_data.dict()):
+        raise ResourceNotFoundError("用户档案", str(current_user.id))
+
+    user_record = await Database.fetch_one(USER_BY_ID, current_user.id)
+    return UserResponse.from_user(User.from_record(user_record))
@@ -4,15 +4,18 @@
 
 from fastapi import APIRouter, Depends
 from shared.auth import get_current_user
+from shared.database import Database
 from shared.models.user import User
+from shared.queries import DATASETS_BY_OWNER
+from shared.responses import ndjson_response
 
 router = APIRouter()
 
 
 @router.get("/datasets")
 async def get_datasets(current_user: User = Depends(get_current_user)):
-    """获取数据集列表"""
-    return {"message": "数据集列表功能待实现"}
+    """获取数据集列表（NDJSON流式返回，每行一个数据集）"""
+    return ndjson_response(Database.stream(DATASETS_BY_OWNER, current_user.id))
 
 
 @router.delete("/datasets/{dataset_id}")
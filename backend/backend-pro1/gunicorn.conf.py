@@ -0,0 +1,43 @@
+"""
+Gunicorn配置
+以uvicorn worker运行各服务，并启用Prometheus多进程指标模式
+
+用法:
+    gunicorn -c gunicorn.conf.py api-gateway.app.main:app --bind 0.0.0.0:8000
+"""
+
+import multiprocessing
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# 多进程指标目录需在任何worker导入prometheus_client之前设置
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join("/tmp", f"prometheus-{os.getpid()}")
+)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from shared.metrics_registry import cleanup_multiprocess_dir, mark_worker_dead  # noqa: E402
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+
+# 定期回收worker以释放内存，退出worker的指标由 child_exit 归档
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    """主进程启动：清理上次运行遗留的指标文件"""
+    cleanup_multiprocess_dir()
+
+
+def child_exit(server, worker):
+    """worker退出：清理其仪表文件并归档累加型指标"""
+    mark_worker_dead(worker.pid)
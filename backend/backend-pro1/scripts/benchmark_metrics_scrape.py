@@ -0,0 +1,115 @@
+"""
+多进程指标抓取基准测试
+模拟多代worker（含 max_requests 回收产生的已退出worker）写入指标文件，
+对比归档前后单次 /metrics 聚合耗时
+
+用法:
+    python scripts/benchmark_metrics_scrape.py --workers 32 --generations 4 --series 2000
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def write_worker_metrics(multiproc_dir: str, series: int) -> None:
+    """子进程：写入指定数量的请求指标序列"""
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+
+    from shared.middleware.metrics import ACTIVE_REQUESTS, REQUEST_COUNT, REQUEST_DURATION
+
+    for i in range(series):
+        endpoint = f"/api/v1/resource-{i % 200}/{{id}}"
+        method = ("GET", "POST", "PUT", "DELETE")[i % 4]
+        REQUEST_COUNT.labels(
+            method=method,
+            endpoint=endpoint,
+            status_code=200 + (i // 800) % 3,
+            project_id="benchmark"
+        ).inc()
+        REQUEST_DURATION.labels(
+            method=method,
+            endpoint=endpoint,
+            project_id="benchmark"
+        ).observe((i % 100) / 1000)
+    ACTIVE_REQUESTS.labels(project_id="benchmark").inc()
+
+
+def spawn_generation(multiproc_dir: str, workers: int, series: int) -> list:
+    """启动一代worker并等待退出，返回其pid"""
+    processes = [
+        multiprocessing.Process(target=write_worker_metrics, args=(multiproc_dir, series))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return [process.pid for process in processes]
+
+
+def time_scrape(rounds: int) -> tuple:
+    """多次聚合取最优耗时，返回 (毫秒, 输出字节数)"""
+    from shared.metrics_registry import collect_latest
+
+    best = float("inf")
+    size = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        output = collect_latest()
+        best = min(best, time.perf_counter() - started)
+        size = len(output)
+    return best * 1000, size
+
+
+def main(workers: int, generations: int, series: int, rounds: int):
+    multiproc_dir = tempfile.mkdtemp(prefix="prometheus-bench-")
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+
+    from shared.metrics_registry import compact_worker_files, mark_worker_dead
+
+    try:
+        dead_pids = []
+        for _ in range(generations - 1):
+            dead_pids.extend(spawn_generation(multiproc_dir, workers, series))
+        live_pids = spawn_generation(multiproc_dir, workers, series)
+
+        files_before = len(os.listdir(multiproc_dir))
+        before_ms, before_size = time_scrape(rounds)
+
+        # 已退出的历史worker：删除仪表文件并归档
+        for pid in dead_pids:
+            mark_worker_dead(pid, multiproc_dir)
+        files_after = len(os.listdir(multiproc_dir))
+        after_ms, after_size = time_scrape(rounds)
+
+        # 当前一代全部退出（如滚动重启）后的极限情况
+        compact_worker_files(live_pids, multiproc_dir)
+        files_compacted = len(os.listdir(multiproc_dir))
+        compacted_ms, _ = time_scrape(rounds)
+
+        print(f"workers={workers} generations={generations} series/worker={series} rounds={rounds}")
+        print(f"{'state':<22}{'files':>8}{'scrape(ms)':>14}{'bytes':>12}")
+        print(f"{'uncompacted':<22}{files_before:>8}{before_ms:>14.1f}{before_size:>12}")
+        print(f"{'dead workers archived':<22}{files_after:>8}{after_ms:>14.1f}{after_size:>12}")
+        print(f"{'all archived':<22}{files_compacted:>8}{compacted_ms:>14.1f}{'-':>12}")
+    finally:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多进程指标抓取基准测试")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--generations", type=int, default=4)
+    parser.add_argument("--series", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.workers, args.generations, args.series, args.rounds)
@@ -0,0 +1,294 @@
+"""
+中间件基准测试
+对比 BaseHTTPMiddleware 旧实现与纯ASGI实现的中间件栈在 /health 端点上的
+吞吐量(RPS)和延迟分位数
+
+两种栈的中间件顺序与 api-gateway 的 setup_middleware 一致
+（RequestID -> Metrics -> RateLimit）。旧版栈为重构前实现的原样副本，不复用新实现；
+两种栈的Redis调用均由进程内的恒允许客户端代替，只度量中间件本身的开销。
+新版限流中间件在模块级导入 shared.auth，需在完整的依赖环境中运行。
+
+用法:
+    python scripts/benchmark_middleware.py --requests 20000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import re
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from shared.redis_client import RedisClient
+from shared.middleware.metrics import MetricsMiddleware
+from shared.middleware.rate_limit import RateLimitMiddleware
+from shared.middleware.request_id import RequestIDMiddleware
+
+
+class AllowAllScriptClient:
+    """恒允许的限流脚本客户端（纯ASGI栈的 EVALSHA 限流）"""
+
+    async def script_load(self, source: str) -> str:
+        return "benchmark"
+
+    async def evalsha(self, sha: str, numkeys: int, *args):
+        return [1, 99, int(time.time()) + 60]
+
+
+class AllowAllLegacyPipeline:
+    """恒允许的流水线（旧版固定窗口 INCR/EXPIRE）"""
+
+    def incr(self, key):
+        return self
+
+    def expire(self, key, seconds):
+        return self
+
+    async def execute(self):
+        return [1, True]
+
+
+class AllowAllLegacyClient:
+    """恒允许的旧版限流客户端（旧版先 GET 计数再经流水线 INCR/EXPIRE）"""
+
+    async def get(self, key, deserialize_json=True):
+        return None
+
+    def pipeline(self):
+        return AllowAllLegacyPipeline()
+
+
+# 以下为重构前（BaseHTTPMiddleware）的三个中间件，保留原实现在请求路径上的逻辑作为基线
+# （省略基准中不会触发的慢请求/异常日志分支），指标注册到独立的注册表，避免与新实现的同名指标冲突
+LEGACY_REGISTRY = CollectorRegistry()
+
+LEGACY_REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "总HTTP请求数",
+    ["method", "endpoint", "status_code", "project_id"],
+    registry=LEGACY_REGISTRY
+)
+
+LEGACY_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP请求持续时间",
+    ["method", "endpoint", "project_id"],
+    registry=LEGACY_REGISTRY
+)
+
+LEGACY_ACTIVE_REQUESTS = Gauge(
+    "http_active_requests",
+    "当前活跃请求数",
+    ["project_id"],
+    registry=LEGACY_REGISTRY
+)
+
+
+class LegacyRequestIDMiddleware(BaseHTTPMiddleware):
+    """旧版请求ID中间件"""
+
+    async def dispatch(self, request: Request, call_next):
+        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
+        request.state.request_id = request_id
+        response: Response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+class LegacyMetricsMiddleware(BaseHTTPMiddleware):
+    """旧版指标中间件"""
+
+    def __init__(self, app, project_id: str = "unknown"):
+        super().__init__(app)
+        self.project_id = project_id
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        LEGACY_ACTIVE_REQUESTS.labels(project_id=self.project_id).inc()
+
+        try:
+            response: Response = await call_next(request)
+
+            duration = time.time() - start_time
+            method = request.method
+            endpoint = self._get_endpoint_name(request)
+            status_code = response.status_code
+
+            LEGACY_REQUEST_COUNT.labels(
+                method=method,
+                endpoint=endpoint,
+                status_code=status_code,
+                project_id=self.project_id
+            ).inc()
+
+            LEGACY_REQUEST_DURATION.labels(
+                method=method,
+                endpoint=endpoint,
+                project_id=self.project_id
+            ).observe(duration)
+
+            return response
+
+        except Exception:
+            LEGACY_REQUEST_COUNT.labels(
+                method=request.method,
+                endpoint=self._get_endpoint_name(request),
+                status_code=500,
+                project_id=self.project_id
+            ).inc()
+            raise
+
+        finally:
+            LEGACY_ACTIVE_REQUESTS.labels(project_id=self.project_id).dec()
+
+    def _get_endpoint_name(self, request: Request) -> str:
+        if hasattr(request.scope, "route") and hasattr(request.scope["route"], "name"):
+            return request.scope["route"].name
+
+        path = request.url.path
+        path = re.sub(r'/\d+', '/{id}', path)
+        path = re.sub(r'/[a-f0-9-]{36}', '/{uuid}', path)
+        return path
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """旧版固定窗口限流中间件"""
+
+    def __init__(self, app, default_rate_limit: int = 100, window_size: int = 60):
+        super().__init__(app)
+        self.default_rate_limit = default_rate_limit
+        self.window_size = window_size
+        self._redis_client = AllowAllLegacyClient()
+
+    async def dispatch(self, request: Request, call_next):
+        client_id = self._get_client_id(request)
+        is_allowed, remaining_requests, reset_time = await self._check_rate_limit(client_id)
+
+        if not is_allowed:
+            return JSONResponse(status_code=429, content={"success": False})
+
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(self.default_rate_limit)
+        response.headers["X-RateLimit-Remaining"] = str(remaining_requests)
+        response.headers["X-RateLimit-Reset"] = str(reset_time)
+        return response
+
+    def _get_client_id(self, request: Request) -> str:
+        if hasattr(request.state, "user_id"):
+            return f"user:{request.state.user_id}"
+
+        client_ip = request.client.host if request.client else "unknown"
+        forwarded_for = request.headers.get("X-Forwarded-For")
+        if forwarded_for:
+            client_ip = forwarded_for.split(",")[0].strip()
+        real_ip = request.headers.get("X-Real-IP")
+        if real_ip:
+            client_ip = real_ip
+        return f"ip:{client_ip}"
+
+    async def _check_rate_limit(self, client_id: str) -> tuple:
+        redis_client = self._redis_client
+        current_time = int(time.time())
+        window_start = current_time - (current_time % self.window_size)
+        rate_limit_key = f"rate_limit:{client_id}:{window_start}"
+
+        current_count = await redis_client.get(rate_limit_key, deserialize_json=False)
+        current_count = int(current_count) if current_count else 0
+        if current_count >= self.default_rate_limit:
+            return False, 0, window_start + self.window_size
+
+        pipe = redis_client.pipeline()
+        pipe.incr(rate_limit_key)
+        pipe.expire(rate_limit_key, self.window_size)
+        await pipe.execute()
+
+        remaining_requests = max(0, self.default_rate_limit - current_count - 1)
+        return True, remaining_requests, window_start + self.window_size
+
+
+def build_app(stack: str) -> FastAPI:
+    """构建指定中间件栈的应用"""
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy", "service": "benchmark"}
+
+    if stack == "legacy":
+        app.add_middleware(LegacyRequestIDMiddleware)
+        app.add_middleware(LegacyMetricsMiddleware, project_id="benchmark-legacy")
+        app.add_middleware(LegacyRateLimitMiddleware)
+    else:
+        app.add_middleware(RequestIDMiddleware)
+        app.add_middleware(MetricsMiddleware, project_id="benchmark-asgi")
+        app.add_middleware(RateLimitMiddleware, redis_url="")
+
+    return app
+
+
+async def run_load(app: FastAPI, total: int, concurrency: int) -> dict:
+    """并发请求 /health 并统计吞吐量和延迟"""
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # 预热
+        for _ in range(min(200, total)):
+            await client.get("/health")
+
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.get("/health")
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise RuntimeError(f"意外的响应状态码: {response.status_code}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(total: int, concurrency: int, rounds: int):
+    RedisClient._client = AllowAllScriptClient()
+
+    results = {"legacy": [], "asgi": []}
+    for _ in range(rounds):
+        for stack in results:
+            results[stack].append(await run_load(build_app(stack), total, concurrency))
+
+    print(f"requests={total} concurrency={concurrency} rounds={rounds}")
+    print(f"{'stack':<8}{'rps':>12}{'p50(ms)':>12}{'p99(ms)':>12}")
+    for stack, runs in results.items():
+        best = max(runs, key=lambda r: r["rps"])
+        print(f"{stack:<8}{best['rps']:>12.0f}{best['p50_ms']:>12.2f}{best['p99_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="中间件栈基准测试")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests, args.concurrency, args.rounds))
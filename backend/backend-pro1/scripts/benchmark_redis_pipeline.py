@@ -0,0 +1,171 @@
+"""
+Redis批量命令与自动流水线基准测试
+统计网络往返次数（每次向连接写出命令包计为一次往返，含新建连接时的握手命令）与吞吐量：
+
+1. 并发请求：每个请求依次检查令牌吊销（EXISTS）并读取用户缓存（GET），
+   对比关闭/开启自动流水线；
+2. 批量读写：逐键 GET/SET+EXPIRE 对比 mget_many/mset_many。
+
+需要可访问的Redis实例，基准键写入 bench: 前缀下并在结束时删除。
+
+用法:
+    python scripts/benchmark_redis_pipeline.py --redis-url redis://localhost:6379/15 \\
+        --requests 20000 --concurrency 64 --keys 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import redis.asyncio as redis
+
+from shared.redis_client import RedisClient
+from shared.redis_codec import TaggedSerializer
+from shared.redis_pipeline import AutoPipeline
+
+KEY_PREFIX = "bench:"
+
+
+class CountingConnection(redis.Connection):
+    """统计写出命令包次数的连接"""
+
+    round_trips = 0
+
+    async def send_packed_command(self, command, check_health: bool = True):
+        CountingConnection.round_trips += 1
+        await super().send_packed_command(command, check_health)
+
+
+async def configure(redis_url: str, codec: str, auto_pipeline: bool, max_batch: int):
+    """按 RedisClient.connect 的方式创建客户端，连接替换为计数连接"""
+    await RedisClient.disconnect()
+    RedisClient._serializer = TaggedSerializer(codec)
+    RedisClient._client = redis.from_url(
+        redis_url, decode_responses=True, connection_class=CountingConnection
+    )
+    RedisClient._binary_client = redis.from_url(redis_url, connection_class=CountingConnection)
+    if auto_pipeline:
+        RedisClient._pipeline = AutoPipeline(RedisClient._client, "text", max_batch)
+        RedisClient._binary_pipeline = AutoPipeline(RedisClient._binary_client, "binary", max_batch)
+
+
+def user_record(user_id: int) -> dict:
+    return {
+        "id": user_id,
+        "email": f"user{user_id}@example.com",
+        "is_active": True,
+        "email_verified": True,
+        "created_at": "2024-01-15T08:30:00",
+    }
+
+
+async def concurrent_requests(requests: int, concurrency: int) -> dict:
+    """模拟认证中间件的Redis访问：吊销检查 + 用户缓存读取"""
+    latencies = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            await RedisClient.exists(f"{KEY_PREFIX}revoked:{i}")
+            await RedisClient.get(f"{KEY_PREFIX}user:{i % 1000}")
+            latencies.append(time.perf_counter() - started)
+
+    CountingConnection.round_trips = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "commands": requests * 2,
+        "round_trips": CountingConnection.round_trips,
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+async def bulk_operations(keys: int, repeat: int, ttl: int) -> dict:
+    """逐键操作与批量操作的往返次数及耗时"""
+    names = [f"{KEY_PREFIX}bulk:{i}" for i in range(keys)]
+    records = {name: user_record(i) for i, name in enumerate(names)}
+    results = {}
+
+    async def per_key_set():
+        for name, record in records.items():
+            await RedisClient.set(name, record)
+            await RedisClient.expire(name, ttl)
+
+    async def per_key_get():
+        for name in names:
+            await RedisClient.get(name)
+
+    async def batched_set():
+        await RedisClient.mset_many(records, expire=ttl)
+
+    async def batched_get():
+        await RedisClient.mget_many(names)
+
+    for label, operation in (
+        ("set+expire per key", per_key_set),
+        ("mset_many", batched_set),
+        ("get per key", per_key_get),
+        ("mget_many", batched_get),
+    ):
+        CountingConnection.round_trips = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await operation()
+        elapsed = time.perf_counter() - started
+        results[label] = {
+            "round_trips": CountingConnection.round_trips / repeat,
+            "ms": elapsed / repeat * 1000,
+        }
+    return results
+
+
+async def main(args):
+    print(f"requests={args.requests} concurrency={args.concurrency} keys={args.keys}")
+
+    await configure(args.redis_url, args.codec, False, args.max_batch)
+    await RedisClient.mset_many({f"{KEY_PREFIX}user:{i}": user_record(i) for i in range(1000)})
+
+    print(f"{'auto_pipeline':<16}{'commands':>10}{'round_trips':>13}{'rps':>10}{'p50_ms':>9}{'p99_ms':>9}")
+    for auto_pipeline in (False, True):
+        await configure(args.redis_url, args.codec, auto_pipeline, args.max_batch)
+        result = await concurrent_requests(args.requests, args.concurrency)
+        print(
+            f"{str(auto_pipeline):<16}{result['commands']:>10}{result['round_trips']:>13}"
+            f"{result['rps']:>10.0f}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+        )
+
+    await configure(args.redis_url, args.codec, False, args.max_batch)
+    print(f"\n{'operation':<22}{'round_trips':>13}{'ms':>10}")
+    for label, result in (await bulk_operations(args.keys, args.repeat, args.ttl)).items():
+        print(f"{label:<22}{result['round_trips']:>13.0f}{result['ms']:>10.2f}")
+
+    keys = [key async for key in RedisClient._client.scan_iter(match=f"{KEY_PREFIX}*", count=1000)]
+    if keys:
+        await RedisClient.delete(*keys)
+    await RedisClient.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redis批量命令与自动流水线基准测试")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--codec", default="orjson")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--keys", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--ttl", type=int, default=300)
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
@@ -3,8 +3,9 @@
 JWT令牌管理和用户认证
 """
 
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
@@ -13,7 +14,13 @@ import structlog
 
 from .config import get_settings
 from .database import Database
+from .middleware.rate_limit_policy import DEFAULT_PLAN
 from .models.user import User
+from .password_hasher import PasswordHasher
+from .queries import ACTIVE_USER_BY_EMAIL, ACTIVE_USER_BY_ID
+from .token_cache import TokenVerificationCache
+from .token_revocation import TokenRevocationList
+from .user_cache import UserCache
 
 logger = structlog.get_logger()
 
@@ -23,6 +30,9 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # HTTP Bearer令牌方案
 security = HTTPBearer()
 
+# 已撤销令牌（含其他worker登出的令牌）经本地布隆过滤器跳过验证缓存
+TokenVerificationCache.add_revocation_hook(TokenRevocationList.might_be_revoked)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
@@ -34,6 +44,25 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在密码哈希线程池中验证密码"""
+    return await PasswordHasher.run("verify", verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """在密码哈希线程池中计算密码哈希"""
+    return await PasswordHasher.run("hash", get_password_hash, password)
+
+
+def token_claims(user_record: Dict[str, Any]) -> dict:
+    """签发令牌时写入的用户声明（plan 供限流中间件按套餐选择策略，刷新令牌时按数据库更新）"""
+    return {
+        "sub": str(user_record["id"]),
+        "email": user_record["email"],
+        "plan": user_record.get("plan") or DEFAULT_PLAN,
+    }
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
     to_encode = data.copy()
@@ -42,7 +71,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     
-    to_encode.update({"exp": expire, "type": "access"})
+    to_encode.update({"exp": expire, "type": "access", "jti": uuid.uuid4().hex})
     settings = get_settings()
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
@@ -52,7 +81,7 @@ def create_refresh_token(data: dict):
     """创建刷新令牌"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=get_settings().REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
     
     settings = get_settings()
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
@@ -62,8 +91,12 @@ def create_refresh_token(data: dict):
 def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
     """验证令牌"""
     try:
-        settings = get_settings()
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        # 优先使用已验证令牌缓存，未命中时才进行签名校验
+        payload = TokenVerificationCache.get(token)
+        if payload is None:
+            settings = get_settings()
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            TokenVerificationCache.put(token, payload)
         
         # 检查令牌类型
         if payload.get("type") != token_type:
@@ -79,25 +112,43 @@ def verify_refresh_token(token: str) -> Optional[dict]:
     return verify_token(token, "refresh")
 
 
-async def authenticate_user(email: str, password: str) -> Optional[User]:
-    """认证用户"""
-    user_record = await Database.fetch_one(
-        """
-        SELECT u.*, p.first_name, p.last_name, p.avatar_url
-        FROM users u
-        LEFT JOIN user_profiles p ON u.id = p.user_id
-        WHERE u.email = $1 AND u.is_active = true
-        """,
-        email
-    )
+def evict_token(token: str) -> None:
+    """从令牌验证缓存中淘汰令牌"""
+    TokenVerificationCache.evict(token)
+
+
+async def revoke_token(token: str, token_type: str = "access") -> bool:
+    """撤销令牌（登出时调用）"""
+    payload = verify_token(token, token_type)
+    evict_token(token)
+    if payload is None:
+        return False
+    return await TokenRevocationList.revoke(payload)
+
+
+async def authenticate_user_record(email: str, password: str) -> Optional[dict]:
+    """认证用户，成功时返回用户记录（不含密码哈希）"""
+    user_record = await Database.fetch_one(ACTIVE_USER_BY_EMAIL, email)
     
     if not user_record:
         return None
     
-    if not verify_password(password, user_record["password_hash"]):
+    password_hash = user_record.pop("password_hash")
+    if not await verify_password_async(password, password_hash):
         return None
     
-    return User.from_record(user_record)
+    return user_record
+
+
+async def authenticate_user(email: str, password: str) -> Optional[User]:
+    """认证用户"""
+    user_record = await authenticate_user_record(email, password)
+    return User.from_record(user_record) if user_record else None
+
+
+async def _load_active_user(user_id: int) -> Optional[dict]:
+    """从数据库加载活跃用户记录"""
+    return await Database.fetch_one(ACTIVE_USER_BY_ID, user_id)
 
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
@@ -120,18 +171,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    # 获取用户信息
-    user_record = await Database.fetch_one(
-        """
-        SELECT u.*, p.first_name, p.last_name, p.avatar_url
-        FROM users u
-        LEFT JOIN user_profiles p ON u.id = p.user_id
-        WHERE u.id = $1 AND u.is_active = true
-        """,
-        int(user_id)
-    )
+    # 检查令牌是否已撤销
+    if await TokenRevocationList.is_revoked(payload):
+        raise credentials_exception
+    
+    # 获取用户信息（优先命中用户缓存）
+    user_record = await UserCache.get_or_load(int(user_id), _load_active_user)
     
     if user_record is None:
         raise credentials_exception
     
-    return User.from_record(user_record)
\ No newline at end of file
+    return User.from_record(user_record)
@@ -0,0 +1,392 @@
+"""
+函数结果缓存模块
+为异步函数提供 进程内LRU -> Redis -> 回源 的旁路缓存（@cached），
+包含单飞合并、概率提前刷新（XFetch）与过期后先返回旧值再后台刷新（stale-while-revalidate）
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import math
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+import structlog
+
+from .config import get_settings
+from .redis_client import RedisClient
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义
+CACHE_REQUESTS = Counter(
+    "function_cache_requests_total",
+    "函数缓存查询次数",
+    ["namespace", "tier", "result"]
+)
+
+CACHE_REFRESHES = Counter(
+    "function_cache_refreshes_total",
+    "函数缓存后台刷新次数",
+    ["namespace", "trigger", "status"]
+)
+
+CACHE_LOAD_DURATION = Histogram(
+    "function_cache_load_duration_seconds",
+    "缓存未命中时回源计算耗时",
+    ["namespace"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+CACHE_LOCAL_ENTRIES = Gauge(
+    "function_cache_local_entries",
+    "进程内函数缓存条目数",
+    multiprocess_mode="livesum"
+)
+
+# Redis键前缀和失效广播频道
+CACHE_KEY_PREFIX = "cache:"
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+
+# 刷新触发原因
+TRIGGER_EARLY = "early"
+TRIGGER_STALE = "stale"
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """单个被缓存函数的缓存策略"""
+
+    namespace: str
+    ttl: int
+    stale_ttl: int
+    local_ttl: Optional[float]
+    beta: float
+    cache_none: bool
+
+
+class FunctionCache:
+    """函数结果两级缓存
+
+    Redis中的条目为 [值, 新鲜截止时间, 回源耗时]，物理TTL为 ttl + stale_ttl：
+
+    - 新鲜期内按 XFetch 以 now - delta * beta * ln(rand) >= 新鲜截止时间
+      的概率提前刷新，回源越慢、越接近过期越可能提前刷新，热点键在过期前即被续期；
+    - 新鲜期过后的 stale_ttl 内直接返回旧值并在后台刷新；
+    - 后台刷新以Redis NX锁保证各副本同一时刻只有一个刷新者；
+    - 本进程内同一键的并发未命中合并为一次回源，后台刷新每键至多一个；
+      刷新任务与未命中回源分开登记，未命中不会等到因刷新锁被占而跳过的刷新结果。
+
+    进程内LRU仅缓存新鲜值，TTL不超过剩余新鲜时间；失效消息通过Redis
+    发布订阅广播到所有worker。
+    """
+
+    _local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+    _inflight: Dict[str, asyncio.Task] = {}
+    _refreshing: Dict[str, asyncio.Task] = {}
+    _background: Set[asyncio.Task] = set()
+    _listener_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def _local_get(cls, key: str) -> Optional[Tuple[float, Any]]:
+        """读取进程内缓存，返回 (过期时间, 值)"""
+        entry = cls._local.get(key)
+        if entry is None:
+            return None
+
+        if entry[0] <= time.monotonic():
+            cls._local_evict(key)
+            return None
+
+        cls._local.move_to_end(key)
+        return entry
+
+    @classmethod
+    def _local_set(cls, key: str, value: Any, ttl: float) -> None:
+        """写入进程内缓存，超出容量时淘汰最久未使用的条目"""
+        if ttl <= 0:
+            return
+
+        cls._local[key] = (time.monotonic() + ttl, value)
+        cls._local.move_to_end(key)
+
+        max_size = get_settings().CACHE_LOCAL_MAX_SIZE
+        while len(cls._local) > max_size:
+            cls._local.popitem(last=False)
+
+        CACHE_LOCAL_ENTRIES.set(len(cls._local))
+
+    @classmethod
+    def _local_evict(cls, key: str) -> None:
+        """删除进程内缓存条目"""
+        cls._local.pop(key, None)
+        CACHE_LOCAL_ENTRIES.set(len(cls._local))
+
+    @classmethod
+    async def get_or_load(cls, key: str, policy: CachePolicy, loader: Loader) -> Any:
+        """按 本地 -> Redis -> 回源 顺序获取缓存值"""
+        local_entry = cls._local_get(key)
+        if local_entry is not None:
+            CACHE_REQUESTS.labels(namespace=policy.namespace, tier="local", result="hit").inc()
+            return local_entry[1]
+
+        try:
+            entry = await RedisClient.get(key)
+        except Exception as e:
+            # Redis不可用时直接回源
+            logger.warning("函数缓存读取Redis失败", key=key, error=str(e))
+            entry = None
+
+        if isinstance(entry, list) and len(entry) == 3:
+            value, fresh_until, delta = entry
+            now = time.time()
+
+            if now >= fresh_until:
+                CACHE_REQUESTS.labels(namespace=policy.namespace, tier="redis", result="stale").inc()
+                cls._refresh(key, policy, loader, delta, TRIGGER_STALE)
+                return value
+
+            if policy.beta > 0 and now - delta * policy.beta * math.log(1.0 - random.random()) >= fresh_until:
+                CACHE_REQUESTS.labels(namespace=policy.namespace, tier="redis", result="early").inc()
+                cls._refresh(key, policy, loader, delta, TRIGGER_EARLY)
+            else:
+                CACHE_REQUESTS.labels(namespace=policy.namespace, tier="redis", result="hit").inc()
+
+            cls._local_set(key, value, min(cls._local_ttl(policy), fresh_until - now))
+            return value
+
+        CACHE_REQUESTS.labels(namespace=policy.namespace, tier="redis", result="miss").inc()
+        return await cls._single_flight(key, lambda: cls._load(key, policy, loader))
+
+    @staticmethod
+    def _local_ttl(policy: CachePolicy) -> float:
+        if policy.local_ttl is not None:
+            return policy.local_ttl
+        return get_settings().CACHE_LOCAL_TTL_SECONDS
+
+    @classmethod
+    async def _single_flight(cls, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """同一键的并发调用共享一个回源任务，单个调用方取消不影响其他等待者"""
+        task = cls._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            cls._inflight[key] = task
+            task.add_done_callback(functools.partial(cls._inflight_done, key))
+        return await asyncio.shield(task)
+
+    @classmethod
+    def _inflight_done(cls, key: str, task: asyncio.Task) -> None:
+        if cls._inflight.get(key) is task:
+            del cls._inflight[key]
+        # 所有等待者均已取消时避免 "exception was never retrieved" 告警
+        if not task.cancelled():
+            task.exception()
+
+    @classmethod
+    async def _load(cls, key: str, policy: CachePolicy, loader: Loader) -> Any:
+        """回源计算并写入两级缓存"""
+        start_time = time.perf_counter()
+        value = await loader()
+        delta = time.perf_counter() - start_time
+        CACHE_LOAD_DURATION.labels(namespace=policy.namespace).observe(delta)
+
+        if value is None and not policy.cache_none:
+            return None
+
+        try:
+            await RedisClient.set(
+                key,
+                [value, time.time() + policy.ttl, round(delta, 4)],
+                expire=policy.ttl + policy.stale_ttl
+            )
+        except Exception as e:
+            logger.warning("函数缓存写入Redis失败", key=key, error=str(e))
+
+        cls._local_set(key, value, min(cls._local_ttl(policy), policy.ttl))
+        return value
+
+    @classmethod
+    def _refresh(cls, key: str, policy: CachePolicy, loader: Loader, delta: float, trigger: str) -> None:
+        """在后台刷新条目，本进程正在回源或刷新、或其他副本已在刷新时跳过"""
+        if key in cls._inflight or key in cls._refreshing:
+            return
+
+        task = asyncio.create_task(cls._locked_refresh(key, policy, loader, delta, trigger))
+        cls._refreshing[key] = task
+        cls._background.add(task)
+        task.add_done_callback(cls._background.discard)
+        task.add_done_callback(functools.partial(cls._refresh_done, key, policy, trigger))
+
+    @classmethod
+    async def _locked_refresh(
+        cls, key: str, policy: CachePolicy, loader: Loader, delta: float, trigger: str
+    ) -> Any:
+        """取得刷新锁后回源，锁在回源耗时的数倍后自动过期"""
+        lock_seconds = max(1, math.ceil(delta * 4))
+        try:
+            acquired = await RedisClient.set(f"{key}:refresh", 1, expire=lock_seconds, nx=True)
+        except Exception:
+            acquired = True
+        if not acquired:
+            CACHE_REFRESHES.labels(namespace=policy.namespace, trigger=trigger, status="skipped").inc()
+            return None
+
+        return await cls._load(key, policy, loader)
+
+    @classmethod
+    def _refresh_done(cls, key: str, policy: CachePolicy, trigger: str, task: asyncio.Task) -> None:
+        if cls._refreshing.get(key) is task:
+            del cls._refreshing[key]
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            CACHE_REFRESHES.labels(namespace=policy.namespace, trigger=trigger, status="ok").inc()
+        else:
+            CACHE_REFRESHES.labels(namespace=policy.namespace, trigger=trigger, status="error").inc()
+            logger.warning("函数缓存后台刷新失败", namespace=policy.namespace, trigger=trigger, error=str(error))
+
+    @classmethod
+    async def invalidate(cls, *keys: str) -> None:
+        """使缓存键失效并广播到所有worker"""
+        for key in keys:
+            cls._local_evict(key)
+
+        try:
+            await RedisClient.delete(*keys)
+            if RedisClient._client:
+                for key in keys:
+                    await RedisClient._client.publish(CACHE_INVALIDATION_CHANNEL, key)
+        except Exception as e:
+            logger.error("函数缓存失效广播失败", keys=keys, error=str(e))
+
+    @classmethod
+    def clear(cls) -> None:
+        """清空进程内缓存"""
+        cls._local.clear()
+        CACHE_LOCAL_ENTRIES.set(0)
+
+    @classmethod
+    async def start(cls):
+        """启动失效广播监听任务"""
+        if cls._listener_task is None or cls._listener_task.done():
+            cls._listener_task = asyncio.create_task(cls._listen_invalidations())
+            logger.info("函数缓存失效监听已启动")
+
+    @classmethod
+    async def stop(cls):
+        """停止失效广播监听与后台刷新任务"""
+        if cls._listener_task:
+            cls._listener_task.cancel()
+            try:
+                await cls._listener_task
+            except asyncio.CancelledError:
+                pass
+            cls._listener_task = None
+
+        for task in list(cls._background):
+            task.cancel()
+        if cls._background:
+            await asyncio.gather(*cls._background, return_exceptions=True)
+        cls.clear()
+
+    @classmethod
+    async def _listen_invalidations(cls):
+        """订阅失效频道并淘汰本地条目，连接断开后自动重连"""
+        while True:
+            try:
+                if not RedisClient._client:
+                    await asyncio.sleep(1)
+                    continue
+
+                pubsub = RedisClient.pubsub()
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                try:
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            cls._local_evict(message["data"])
+                finally:
+                    await pubsub.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 重连期间无法收到广播，清空本地缓存以保证一致性
+                logger.warning("函数缓存失效监听中断，准备重连", error=str(e))
+                cls.clear()
+                await asyncio.sleep(1)
+
+
+def cached(
+    namespace: str,
+    ttl: int = 300,
+    version: int = 1,
+    stale_ttl: int = 60,
+    local_ttl: Optional[float] = None,
+    beta: float = 1.0,
+    cache_none: bool = False,
+    ignore: Iterable[str] = ("self", "cls"),
+):
+    """异步函数结果缓存装饰器
+
+    缓存键为 cache:{namespace}:v{version}:{参数摘要}，参数按函数签名绑定并补全默认值，
+    ignore 中的参数（如连接、请求对象）不参与键计算；修改返回结构时递增 version。
+    返回值经 RedisClient 编解码器存储，应使用 dict/list/str/数值等可无损还原的类型。
+    后台刷新在原调用结束后以相同参数重新调用函数，函数不应依赖调用方持有的连接或事务。
+
+    用法:
+        @cached("project_meta", ttl=600)
+        async def get_project_meta(project_id: int) -> dict: ...
+
+        await get_project_meta.invalidate(project_id)
+    """
+    policy = CachePolicy(
+        namespace=namespace,
+        ttl=ttl,
+        stale_ttl=stale_ttl,
+        local_ttl=local_ttl,
+        beta=beta,
+        cache_none=cache_none,
+    )
+    ignored = frozenset(ignore)
+    prefix = f"{CACHE_KEY_PREFIX}{namespace}:v{version}:"
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError(f"@cached 只能用于异步函数: {func.__qualname__}")
+
+        signature = inspect.signature(func)
+
+        def make_key(*args: Any, **kwargs: Any) -> str:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = [(name, value) for name, value in bound.arguments.items() if name not in ignored]
+            digest = hashlib.blake2b(repr(arguments).encode("utf-8"), digest_size=16).hexdigest()
+            return prefix + digest
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not get_settings().CACHE_ENABLED:
+                return await func(*args, **kwargs)
+
+            return await FunctionCache.get_or_load(
+                make_key(*args, **kwargs), policy, lambda: func(*args, **kwargs)
+            )
+
+        async def invalidate(*args: Any, **kwargs: Any) -> None:
+            """使指定参数对应的缓存失效"""
+            await FunctionCache.invalidate(make_key(*args, **kwargs))
+
+        wrapper.cache_key = make_key
+        wrapper.invalidate = invalidate
+        wrapper.uncached = func
+        wrapper.policy = policy
+        return wrapper
+
+    return decorator
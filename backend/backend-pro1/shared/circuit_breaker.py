@@ -0,0 +1,143 @@
+"""
+熔断器模块
+依赖连续失败达到阈值后熔断，熔断期间调用立即失败而不是等待超时；
+冷却期过后放行单个探测调用，成功则恢复，失败则重新熔断
+"""
+
+import asyncio
+import time
+from typing import Optional, Tuple, Type
+
+from prometheus_client import Counter, Gauge
+import structlog
+
+logger = structlog.get_logger()
+
+# 熔断器状态
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Prometheus指标定义
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state",
+    "熔断器状态（0关闭，1半开，2熔断）",
+    ["name"],
+    multiprocess_mode="livemax"
+)
+
+CIRCUIT_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total",
+    "熔断器状态切换次数",
+    ["name", "state"]
+)
+
+CIRCUIT_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total",
+    "熔断期间被直接拒绝的调用次数",
+    ["name"]
+)
+
+
+class CircuitOpenError(ConnectionError):
+    """熔断期间的调用被拒绝"""
+
+
+class CircuitBreaker:
+    """连续失败熔断器
+
+    作为同步上下文管理器包裹一次调用（块内可以 await）：
+
+        with breaker:
+            await client.execute_command(...)
+
+    只有 failure_types 中的异常计为失败（如连接错误、超时），
+    其他异常说明依赖可达，计为成功；ignore_types 中的异常不影响状态。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        failure_types: Tuple[Type[BaseException], ...] = (Exception,),
+        ignore_types: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_types = failure_types
+        self.ignore_types = ignore_types + (asyncio.CancelledError,)
+
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+        CIRCUIT_STATE.labels(name=name).set(STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+
+        previous, self.state = self.state, state
+        CIRCUIT_STATE.labels(name=self.name).set(STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(name=self.name, state=state).inc()
+        log = logger.warning if state == OPEN else logger.info
+        log("熔断器状态切换", name=self.name, previous=previous, state=state, failures=self.failures)
+
+    def allow(self) -> bool:
+        """是否放行本次调用（半开状态只放行一个探测调用）"""
+        if self.state == CLOSED:
+            return True
+
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._transition(HALF_OPEN)
+
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self._probing = False
+        self.failures = 0
+        self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition(OPEN)
+
+    def __enter__(self) -> "CircuitBreaker":
+        if not self.allow():
+            CIRCUIT_REJECTIONS.labels(name=self.name).inc()
+            raise CircuitOpenError(f"{self.name} 已熔断，{self.reset_timeout}秒内不再尝试")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.record_success()
+        elif issubclass(exc_type, self.ignore_types):
+            self._probing = False
+        elif issubclass(exc_type, self.failure_types):
+            self.record_failure()
+        else:
+            self.record_success()
+        return False
+
+    def status(self) -> dict:
+        """当前状态快照"""
+        return {
+            "name": self.name,
+            "state": self.state,
+            "failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+        }
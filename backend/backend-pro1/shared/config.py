@@ -4,7 +4,7 @@
 """
 
 from functools import lru_cache
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseSettings, validator
 
 
@@ -24,13 +24,62 @@ class Settings(BaseSettings):
     
     # 数据库配置
     DATABASE_URL: str
-    DATABASE_POOL_SIZE: int = 10
-    DATABASE_MAX_OVERFLOW: int = 20
+    # 连接池容量与回收周期未设置时按 ENVIRONMENT 使用 shared/pool_config.py 中的配置
+    DATABASE_POOL_SIZE: Optional[int] = None
+    DATABASE_MAX_OVERFLOW: int = 2
+    DATABASE_POOL_MIN_SIZE: Optional[int] = None
+    DATABASE_POOL_RECYCLE_SECONDS: Optional[float] = None  # 0 表示不回收
+    DATABASE_POOL_IDLE_TIMEOUT_SECONDS: float = 60.0
+    DATABASE_POOL_ADAPTIVE: bool = True
+    DATABASE_POOL_CONTROL_INTERVAL_SECONDS: float = 5.0
+    DATABASE_POOL_TARGET_WAIT_MS: float = 20.0
+    DATABASE_SERVER_CONNECTION_RESERVE: int = 5  # 为其他服务/worker 保留的服务端连接数
+    # 启动时核算连接预算：Σ(各服务 max_size + DATABASE_MAX_OVERFLOW) × worker数 ≤ 服务端可用连接数
+    DATABASE_SERVER_MAX_CONNECTIONS: int = 150  # 与 PostgreSQL max_connections 一致
+    DATABASE_SUPERUSER_RESERVED_CONNECTIONS: int = 3
+    DATABASE_POOL_WORKERS: Optional[int] = None  # 每个服务的worker数，未设置时与 gunicorn.conf.py 一致
+    DATABASE_REPLICA_URLS: str = ""  # 只读副本连接串，逗号分隔
+    DATABASE_REPLICA_ROUTING: str = "round_robin"  # round_robin 或 least_busy
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DATABASE_REPLICA_CHECK_INTERVAL_SECONDS: float = 2.0
+    DATABASE_READ_YOUR_WRITES_SECONDS: float = 2.0
+    DATABASE_SLOW_QUERY_MS: float = 200.0
+    DATABASE_SLOW_QUERY_SAMPLE_RATE: float = 1.0
+    DATABASE_EXPLAIN_THRESHOLD_MS: Optional[float] = None  # 未设置时不执行EXPLAIN
+    DATABASE_SAMPLER_ENABLED: bool = True
+    DATABASE_SAMPLER_INTERVAL_SECONDS: float = 15.0
+    DATABASE_SAMPLER_BUFFER_SIZE: int = 120  # 内存中保留的样本数
+    DATABASE_SAMPLER_TOP_STATEMENTS: int = 10
+    DATABASE_SAMPLER_LEADER_ONLY: bool = True  # 数据库级统计只由每个服务的领导者副本采样
     
     # Redis配置
-    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_URL: str = "redis://localhost:6379/0"  # 也可为 redis+sentinel:// 或 redis+cluster://
     REDIS_CELERY_DB: int = 1
-    
+    REDIS_CODEC: str = "orjson"  # orjson、msgpack 或 json
+    REDIS_MAX_CONNECTIONS: int = 50  # 每个客户端的连接池上限（Cluster模式为每个节点）
+    REDIS_POOL_TIMEOUT_SECONDS: float = 2.0  # 连接全部检出时的最长等待
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    REDIS_CIRCUIT_FAILURE_THRESHOLD: int = 5  # 连续连接错误/超时达到该次数后熔断
+    REDIS_CIRCUIT_RESET_SECONDS: float = 10.0  # 熔断后多久放行探测请求
+    REDIS_AUTO_PIPELINE: bool = False  # 合并同一事件循环轮次内的并发命令
+    REDIS_AUTO_PIPELINE_MAX_BATCH: int = 256
+    REDIS_NEAR_CACHE_ENABLED: bool = False  # 服务端辅助的客户端缓存（需Redis 6+）
+    REDIS_NEAR_CACHE_PREFIXES: str = "user_cache:,cache:"  # 逗号分隔的键前缀
+    REDIS_NEAR_CACHE_MAX_SIZE: int = 10000
+    REDIS_NEAR_CACHE_TTL_SECONDS: float = 300.0  # 条目最长保留时间（防止失效消息丢失）
+    LEADER_ELECTION_TTL_SECONDS: float = 15.0  # 领导者崩溃后最迟多久由其他副本接任
+
+    # 用户缓存配置
+    USER_CACHE_LOCAL_TTL_SECONDS: int = 30
+    USER_CACHE_LOCAL_MAX_SIZE: int = 10000
+    USER_CACHE_REDIS_TTL_SECONDS: int = 300
+
+    # 函数结果缓存配置（@cached）
+    CACHE_ENABLED: bool = True
+    CACHE_LOCAL_TTL_SECONDS: float = 10.0
+    CACHE_LOCAL_MAX_SIZE: int = 10000
+
     # AI服务配置
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
@@ -47,6 +96,17 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     ALGORITHM: str = "HS256"
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_REVOCATION_SYNC_INTERVAL_SECONDS: float = 5.0
+    TOKEN_REVOCATION_BLOOM_CAPACITY: int = 100000
+    TOKEN_REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    
+    # 限流配置
+    RATE_LIMIT_LEASE_SIZE: int = 0
+    RATE_LIMIT_LEASE_TTL_SECONDS: float = 1.0
+    RATE_LIMIT_LEASE_MAX_OVERDRAFT: int = 0
     
     # 外部API配置
     SENDGRID_API_KEY: Optional[str] = None
@@ -76,6 +136,30 @@ class Settings(BaseSettings):
             raise ValueError("SECRET_KEY必须至少32个字符")
         return v
     
+    @validator("DATABASE_REPLICA_ROUTING")
+    def validate_replica_routing(cls, v):
+        valid_routings = ["round_robin", "least_busy"]
+        if v not in valid_routings:
+            raise ValueError(f"DATABASE_REPLICA_ROUTING必须是以下之一: {valid_routings}")
+        return v
+    
+    @property
+    def database_replica_urls(self) -> List[str]:
+        """只读副本连接串列表"""
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+    
+    @property
+    def redis_near_cache_prefixes(self) -> List[str]:
+        """客户端缓存键前缀列表"""
+        return [prefix.strip() for prefix in self.REDIS_NEAR_CACHE_PREFIXES.split(",") if prefix.strip()]
+    
+    @validator("REDIS_CODEC")
+    def validate_redis_codec(cls, v):
+        valid_codecs = ["orjson", "msgpack", "json"]
+        if v not in valid_codecs:
+            raise ValueError(f"REDIS_CODEC必须是以下之一: {valid_codecs}")
+        return v
+    
     @validator("LOG_LEVEL")
     def validate_log_level(cls, v):
         valid_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
@@ -4,97 +4,723 @@
 """
 
 import asyncio
-from typing import Any, Dict, List, Optional, Union
+import time
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    TYPE_CHECKING,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 import asyncpg
+from prometheus_client import Counter, Histogram
 import structlog
 
+from .database_instrumentation import QueryInstrumentation
+from .database_pool import PoolController
+from .pool_config import check_connection_budget, default_workers, get_pool_config
+from .database_replicas import (
+    DB_READ_ROUTES,
+    REPLICA_CONNECTION_ERRORS,
+    ROUND_ROBIN,
+    Replica,
+    ReplicaSet,
+    is_primary_sticky,
+    is_read_only_sql,
+    mark_write,
+    replica_name,
+)
+
+if TYPE_CHECKING:
+    from .config import Settings
+
 logger = structlog.get_logger()
 
+# Prometheus指标定义
+DB_COPY_ROWS = Counter(
+    "db_copy_rows_total",
+    "COPY批量写入行数",
+    ["table"]
+)
+
+DB_COPY_DURATION = Histogram(
+    "db_copy_duration_seconds",
+    "COPY批量写入耗时",
+    ["table"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+@dataclass(frozen=True)
+class NamedQuery:
+    """命名查询：SQL只声明一次，在每个连接上首次使用时预编译"""
+    
+    name: str
+    sql: str
+    prepare_on_connect: bool = False
+    
+    @property
+    def read_only(self) -> bool:
+        """是否可发往只读副本"""
+        return is_read_only_sql(self.sql)
+
+
+Query = Union[str, NamedQuery]
+
+# 返回结果集的执行方法
+_READ_METHODS = ("fetchrow", "fetch", "fetchval")
+
+# COPY输入：行元组序列/生成器，或按列组织的 {列名: 值序列}
+Records = Union[Iterable[Sequence[Any]], Mapping[str, Sequence[Any]]]
+
+
+@dataclass(frozen=True)
+class CopyResult:
+    """COPY批量写入结果"""
+    
+    table: str
+    rows: int
+    seconds: float
+    
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+
+# stream() 的行格式
+ROW_RECORD = "record"
+ROW_TUPLE = "tuple"
+ROW_ARROW = "arrow"
+
+
+def _to_arrow_batch(records: List[asyncpg.Record]):
+    """将一批记录按列转换为 pyarrow.RecordBatch"""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("arrow 行格式需要安装 pyarrow") from e
+    
+    names = list(records[0].keys())
+    columns = zip(*records)
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(column) for column in columns],
+        names=names
+    )
+
+
+def _quote_ident(name: str) -> str:
+    """引用SQL标识符"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _copied_rows(status: str) -> int:
+    """从 "COPY n" 状态中解析行数"""
+    try:
+        return int(status.rsplit(" ", 1)[-1])
+    except (AttributeError, ValueError):
+        return 0
+
+# 建立连接池时可重试的错误（数据库尚未就绪或网络抖动）
+CONNECT_RETRY_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.exceptions.PostgresConnectionError,
+    asyncpg.exceptions.CannotConnectNowError,
+)
+
+# 当前请求（asyncio上下文）的工作单元
+_current_unit: ContextVar[Optional["UnitOfWork"]] = ContextVar("db_unit_of_work", default=None)
+
+
+class NamedQueryConnection(asyncpg.Connection):
+    """缓存命名查询预编译语句的连接"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self._named_statements: Dict[str, asyncpg.prepared_stmt.PreparedStatement] = {}
+    
+    async def prepare_named(self, query: NamedQuery):
+        """获取命名查询的预编译语句，首次使用时在本连接上预编译"""
+        statement = self._named_statements.get(query.name)
+        if statement is None:
+            statement = await self.prepare(query.sql)
+            self._named_statements[query.name] = statement
+        return statement
+    
+    def forget_named(self, query: NamedQuery) -> None:
+        """丢弃失效的预编译语句（如表结构变更后）"""
+        self._named_statements.pop(query.name, None)
+
+
+class UnitOfWork:
+    """请求级工作单元
+    
+    首次需要主库连接时才从连接池检出，之后请求内的查询与事务复用该连接，
+    结束时归还连接池。嵌套的 transaction() 使用保存点。
+    """
+    
+    def __init__(self, controller: PoolController):
+        self._controller = controller
+        self._connection: Optional[NamedQueryConnection] = None
+        self._lock = asyncio.Lock()
+    
+    @property
+    def connection(self) -> Optional[NamedQueryConnection]:
+        """已检出的连接，尚未检出时为None"""
+        return self._connection
+    
+    async def get_connection(self) -> NamedQueryConnection:
+        """获取本工作单元的连接，首次调用时从连接池检出"""
+        if self._connection is None:
+            self._connection = await self._controller.acquire()
+        return self._connection
+    
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[NamedQueryConnection]:
+        """开启事务，已在事务中时创建保存点"""
+        connection = await self.get_connection()
+        async with connection.transaction():
+            yield connection
+    
+    @asynccontextmanager
+    async def locked_connection(self) -> AsyncIterator[NamedQueryConnection]:
+        """独占使用本工作单元的连接（同一连接上的操作串行执行）"""
+        connection = await self.get_connection()
+        async with self._lock:
+            yield connection
+    
+    async def run(self, method: str, query: Query, args: tuple) -> Any:
+        """在本工作单元的连接上执行查询"""
+        async with self.locked_connection() as connection:
+            return await Database._run(connection, method, query, args)
+    
+    async def release(self) -> None:
+        """归还连接（未结束的事务由连接池重置时回滚）"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await self._controller.release(connection)
+
 
 class Database:
     """数据库连接池管理类"""
     
     _pool: Optional[asyncpg.Pool] = None
+    _replicas: Optional[ReplicaSet] = None
+    _controllers: Dict[str, PoolController] = {}
+    _read_your_writes_seconds: float = 2.0
+    _ready: bool = False
+    _queries: Dict[str, NamedQuery] = {}
     
     @classmethod
-    async def connect(cls, database_url: str, pool_size: int = 10, max_overflow: int = 20):
-        """创建数据库连接池"""
+    async def connect(
+        cls,
+        database_url: str,
+        pool_size: int = 10,
+        max_overflow: int = 20,
+        pool_min_size: int = 1,
+        pool_recycle_seconds: float = 1800.0,
+        pool_idle_timeout: float = 60.0,
+        adaptive_pool: bool = True,
+        pool_control_interval: float = 5.0,
+        pool_target_wait_ms: float = 20.0,
+        server_connection_reserve: int = 5,
+        command_timeout: float = 60,
+        server_settings: Optional[Dict[str, str]] = None,
+        connect_retries: int = 0,
+        connect_retry_delay: float = 1.0,
+        replica_urls: Sequence[str] = (),
+        replica_routing: str = ROUND_ROBIN,
+        replica_max_lag_seconds: float = 5.0,
+        replica_check_interval: float = 2.0,
+        read_your_writes_seconds: float = 2.0,
+        slow_query_ms: float = 200.0,
+        slow_query_sample_rate: float = 1.0,
+        explain_threshold_ms: Optional[float] = None,
+    ):
+        """创建主库连接池及只读副本连接池
+        
+        连接池按 pool_size + max_overflow 创建，adaptive_pool=True 时由
+        PoolController 在 [pool_min_size, pool_size + max_overflow] 内调整实际检出上限
+        （初始为 pool_size）；存活超过 pool_recycle_seconds 的连接在归还时重建。
+        server_settings 随连接启动包发送，不产生额外的 SET 往返。
+        """
+        max_size = pool_size + max_overflow
+        min_size = min(max(pool_min_size, 1), max_size)
+        pool_options = {
+            "max_inactive_connection_lifetime": pool_idle_timeout,
+            "command_timeout": command_timeout,
+            # 对于小查询禁用JIT以提高性能
+            "server_settings": server_settings if server_settings is not None else {'jit': 'off'},
+        }
+        
+        def controller(pool: asyncpg.Pool, name: str) -> PoolController:
+            return PoolController(
+                pool,
+                name,
+                min_size=min_size,
+                max_size=max_size,
+                initial_size=pool_size,
+                recycle_seconds=pool_recycle_seconds,
+                adaptive=adaptive_pool,
+                interval=pool_control_interval,
+                target_wait_ms=pool_target_wait_ms,
+                server_reserve=server_connection_reserve,
+            )
+        
         try:
-            cls._pool = await asyncpg.create_pool(
+            cls._pool = await cls._create_pool(
                 database_url,
-                min_size=1,
-                max_size=pool_size,
-                command_timeout=60,
-                server_settings={
-                    'jit': 'off'  # 对于小查询禁用JIT以提高性能
-                }
+                min_size,
+                max_size,
+                retries=connect_retries,
+                retry_delay=connect_retry_delay,
+                **pool_options
             )
-            logger.info("数据库连接池创建成功", pool_size=pool_size)
+            logger.info("数据库连接池创建成功", pool_size=pool_size, max_size=max_size)
         except Exception as e:
             logger.error("数据库连接失败", error=str(e), exc_info=True)
             raise
+        
+        cls._controllers = {"primary": controller(cls._pool, "primary")}
+        
+        QueryInstrumentation.configure(
+            slow_query_ms=slow_query_ms,
+            sample_rate=slow_query_sample_rate,
+            explain_threshold_ms=explain_threshold_ms,
+            explain_controller=cls._controllers["primary"],
+        )
+        
+        cls._read_your_writes_seconds = read_your_writes_seconds
+        
+        replicas = []
+        for url in replica_urls:
+            name = replica_name(url)
+            try:
+                pool = await cls._create_pool(url, min_size, max_size, **pool_options)
+                replicas.append(Replica(name=name, pool=pool))
+                cls._controllers[name] = controller(pool, name)
+                logger.info("只读副本连接池创建成功", replica=name)
+            except Exception as e:
+                # 副本不可用不影响启动，读取回退到主库
+                logger.error("只读副本连接失败", replica=name, error=str(e))
+        
+        if replicas:
+            cls._replicas = ReplicaSet(
+                replicas,
+                routing=replica_routing,
+                max_lag_seconds=replica_max_lag_seconds,
+                check_interval=replica_check_interval,
+            )
+            await cls._replicas.start()
+        
+        for pool_controller in cls._controllers.values():
+            await pool_controller.start()
+    
+    @classmethod
+    async def connect_service(cls, service: str, settings: "Settings") -> None:
+        """按运行环境与服务的 PoolConfig 连接数据库并预热（各服务启动时调用）
+        
+        DATABASE_POOL_SIZE、DATABASE_POOL_MIN_SIZE、DATABASE_POOL_RECYCLE_SECONDS
+        未设置时使用 PoolConfig 中按服务系数调整后的值。连接前按
+        check_connection_budget 核算所有服务与worker合计的检出上限。
+        """
+        # 确保热点命名查询已注册，预热时随新连接预编译
+        from . import queries  # noqa: F401
+        
+        pool_config = get_pool_config(settings.ENVIRONMENT, service)
+        
+        # 连接预算超额：生产环境拒绝启动，其他环境（通常worker更少）仅告警
+        workers = settings.DATABASE_POOL_WORKERS or default_workers()
+        try:
+            check_connection_budget(
+                settings.ENVIRONMENT,
+                workers,
+                settings.DATABASE_SERVER_MAX_CONNECTIONS,
+                settings.DATABASE_SUPERUSER_RESERVED_CONNECTIONS,
+                pool_size=settings.DATABASE_POOL_SIZE,
+                max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            )
+        except ValueError as e:
+            if settings.ENVIRONMENT == "production":
+                raise
+            logger.warning("数据库连接预算超额", environment=settings.ENVIRONMENT, workers=workers, error=str(e))
+        
+        await cls.connect(
+            settings.DATABASE_URL,
+            pool_size=settings.DATABASE_POOL_SIZE or pool_config.max_size,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_min_size=settings.DATABASE_POOL_MIN_SIZE or pool_config.min_size,
+            pool_recycle_seconds=(
+                settings.DATABASE_POOL_RECYCLE_SECONDS
+                if settings.DATABASE_POOL_RECYCLE_SECONDS is not None
+                else pool_config.pool_recycle
+            ),
+            pool_idle_timeout=settings.DATABASE_POOL_IDLE_TIMEOUT_SECONDS,
+            adaptive_pool=settings.DATABASE_POOL_ADAPTIVE,
+            pool_control_interval=settings.DATABASE_POOL_CONTROL_INTERVAL_SECONDS,
+            pool_target_wait_ms=settings.DATABASE_POOL_TARGET_WAIT_MS,
+            server_connection_reserve=settings.DATABASE_SERVER_CONNECTION_RESERVE,
+            command_timeout=pool_config.command_timeout,
+            server_settings=pool_config.startup_settings(service),
+            connect_retries=pool_config.retry_attempts,
+            connect_retry_delay=pool_config.retry_delay,
+            replica_urls=settings.database_replica_urls,
+            replica_routing=settings.DATABASE_REPLICA_ROUTING,
+            replica_max_lag_seconds=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+            replica_check_interval=settings.DATABASE_REPLICA_CHECK_INTERVAL_SECONDS,
+            read_your_writes_seconds=settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+            slow_query_ms=settings.DATABASE_SLOW_QUERY_MS,
+            slow_query_sample_rate=settings.DATABASE_SLOW_QUERY_SAMPLE_RATE,
+            explain_threshold_ms=settings.DATABASE_EXPLAIN_THRESHOLD_MS,
+        )
+        await cls.warm_up()
+    
+    @classmethod
+    async def _create_pool(
+        cls,
+        database_url: str,
+        min_size: int,
+        max_size: int,
+        retries: int = 0,
+        retry_delay: float = 1.0,
+        **pool_options
+    ) -> asyncpg.Pool:
+        """创建连接池，数据库暂不可用时按 retries 重试"""
+        for attempt in range(retries + 1):
+            try:
+                return await asyncpg.create_pool(
+                    database_url,
+                    min_size=min_size,
+                    max_size=max_size,
+                    connection_class=NamedQueryConnection,
+                    init=cls._init_connection,
+                    **pool_options
+                )
+            except CONNECT_RETRY_ERRORS as e:
+                if attempt >= retries:
+                    raise
+                logger.warning("数据库连接失败，稍后重试", attempt=attempt + 1, error=str(e))
+                await asyncio.sleep(retry_delay)
+    
+    @classmethod
+    async def warm_up(cls) -> None:
+        """将各连接池预热到 min_size（新连接同时预编译热点查询），完成后 is_ready() 返回True"""
+        start_time = time.perf_counter()
+        names = list(cls._controllers)
+        results = await asyncio.gather(
+            *(cls._controllers[name].warm_up() for name in names),
+            return_exceptions=True
+        )
+        for name, result in zip(names, results):
+            if not isinstance(result, BaseException):
+                continue
+            if name == "primary":
+                raise result
+            # 副本预热失败不影响就绪，由延迟探测决定是否移出轮换
+            logger.warning("只读副本连接池预热失败", replica=name, error=str(result))
+        
+        cls._ready = True
+        logger.info(
+            "数据库连接池预热完成",
+            pools={name: cls._controllers[name].pool.get_size() for name in names},
+            elapsed_ms=round((time.perf_counter() - start_time) * 1000, 2)
+        )
+    
+    @classmethod
+    def is_ready(cls) -> bool:
+        """连接池是否已创建并完成预热"""
+        return cls._ready and cls._pool is not None
     
     @classmethod
     async def disconnect(cls):
         """关闭数据库连接池"""
+        cls._ready = False
+        for pool_controller in cls._controllers.values():
+            await pool_controller.stop()
+        cls._controllers = {}
+        
+        if cls._replicas:
+            await cls._replicas.stop()
+            cls._replicas = None
+            logger.info("只读副本连接池已关闭")
+        
         if cls._pool:
             await cls._pool.close()
             cls._pool = None
             logger.info("数据库连接池已关闭")
     
     @classmethod
-    async def fetch_one(cls, query: str, *args) -> Optional[Dict[str, Any]]:
+    def replica_status(cls) -> List[Dict[str, Any]]:
+        """只读副本状态"""
+        return cls._replicas.status() if cls._replicas else []
+    
+    @classmethod
+    def pool_status(cls) -> List[Dict[str, Any]]:
+        """各连接池容量及最近的调整决策"""
+        return [pool_controller.status() for pool_controller in cls._controllers.values()]
+    
+    @classmethod
+    def register_query(cls, name: str, sql: str, prepare_on_connect: bool = False) -> NamedQuery:
+        """注册命名查询
+        
+        prepare_on_connect=True 的热点查询在连接建立时（pool init钩子）即预编译，
+        其余查询在每个连接上首次使用时预编译。
+        """
+        existing = cls._queries.get(name)
+        if existing is not None:
+            if existing.sql != sql:
+                raise ValueError(f"命名查询重复注册且SQL不一致: {name}")
+            return existing
+        
+        query = NamedQuery(name=name, sql=sql, prepare_on_connect=prepare_on_connect)
+        cls._queries[name] = query
+        return query
+    
+    @classmethod
+    def get_query_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """获取各语句的调用次数与延迟统计"""
+        return QueryInstrumentation.stats()
+    
+    @classmethod
+    def get_slow_queries(cls) -> List[Dict[str, Any]]:
+        """获取最近的慢查询采样"""
+        return QueryInstrumentation.slow_queries()
+    
+    @classmethod
+    async def _init_connection(cls, connection: NamedQueryConnection):
+        """连接初始化钩子：预编译热点命名查询"""
+        for query in cls._queries.values():
+            if not query.prepare_on_connect:
+                continue
+            try:
+                await connection.prepare_named(query)
+            except Exception as e:
+                # 预编译失败不影响建连，首次使用时再重试
+                logger.warning("命名查询预编译失败", query=query.name, error=str(e))
+    
+    @classmethod
+    async def _run(cls, connection, method: str, query: Query, args: tuple) -> Any:
+        """在连接上执行查询并记录耗时，命名查询走预编译语句"""
+        named = isinstance(query, NamedQuery)
+        sql = query.sql if named else query
+        start_time = time.perf_counter()
+        failed = False
+        try:
+            if not named:
+                return await getattr(connection, method)(query, *args)
+            try:
+                return await cls._run_prepared(connection, method, query, args)
+            except (
+                asyncpg.exceptions.InvalidCachedStatementError,
+                asyncpg.exceptions.OutdatedSchemaCacheError,
+            ):
+                # 表结构变更导致预编译语句失效，重新预编译后重试一次（事务内已中止，不可重试）
+                if connection.is_in_transaction():
+                    raise
+                connection.forget_named(query)
+                return await cls._run_prepared(connection, method, query, args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            QueryInstrumentation.observe(
+                sql,
+                args,
+                time.perf_counter() - start_time,
+                failed,
+                name=query.name if named else None,
+                read_only=method in _READ_METHODS and (
+                    query.read_only if named else is_read_only_sql(sql)
+                )
+            )
+    
+    @staticmethod
+    async def _run_prepared(connection, method: str, query: NamedQuery, args: tuple) -> Any:
+        statement = await connection.prepare_named(query)
+        if method == "execute":
+            await statement.fetch(*args)
+            return statement.get_statusmsg()
+        return await getattr(statement, method)(*args)
+    
+    @classmethod
+    def _choose_replica(cls) -> Optional[Replica]:
+        """为只读查询选择副本，返回None时走主库"""
+        if cls._replicas is None:
+            return None
+        
+        if is_primary_sticky():
+            DB_READ_ROUTES.labels(target="primary_sticky").inc()
+            return None
+        
+        replica = cls._replicas.choose()
+        DB_READ_ROUTES.labels(target="replica" if replica else "primary_fallback").inc()
+        return replica
+    
+    @classmethod
+    async def _dispatch(cls, method: str, query: Query, args: tuple) -> Any:
+        """按读写性质路由：只读查询优先发往副本，写入走主库并开启读己之写窗口"""
+        read_only = method != "execute" and (
+            query.read_only if isinstance(query, NamedQuery) else is_read_only_sql(query)
+        )
+        unit = _current_unit.get()
+        
+        if read_only:
+            # 工作单元已持有连接（如事务中）时，读取也在该连接上执行
+            replica = cls._choose_replica() if unit is None or unit.connection is None else None
+            if replica is not None:
+                try:
+                    async with cls._acquire(replica.name) as connection:
+                        return await cls._run(connection, method, query, args)
+                except REPLICA_CONNECTION_ERRORS as e:
+                    # 副本连接异常：移出轮换，本次读取改走主库
+                    cls._replicas.take_out(replica, f"查询失败: {e}")
+                    DB_READ_ROUTES.labels(target="primary_fallback").inc()
+        else:
+            mark_write(cls._read_your_writes_seconds)
+        
+        if unit is not None:
+            return await unit.run(method, query, args)
+        
+        async with cls._acquire() as connection:
+            return await cls._run(connection, method, query, args)
+    
+    @staticmethod
+    def _describe(query: Query) -> str:
+        """日志中的查询标识"""
+        return query.name if isinstance(query, NamedQuery) else query
+    
+    @classmethod
+    async def fetch_one(cls, query: Query, *args) -> Optional[Dict[str, Any]]:
         """执行查询并返回单行结果"""
         if not cls._pool:
             raise RuntimeError("数据库连接池未初始化")
         
-        async with cls._pool.acquire() as connection:
-            try:
-                row = await connection.fetchrow(query, *args)
-                return dict(row) if row else None
-            except Exception as e:
-                logger.error("数据库查询失败", query=query, error=str(e))
-                raise
+        try:
+            row = await cls._dispatch("fetchrow", query, args)
+            return dict(row) if row else None
+        except Exception as e:
+            logger.error("数据库查询失败", query=cls._describe(query), error=str(e))
+            raise
     
     @classmethod
-    async def fetch_all(cls, query: str, *args) -> List[Dict[str, Any]]:
+    async def fetch_all(cls, query: Query, *args) -> List[Dict[str, Any]]:
         """执行查询并返回所有结果"""
         if not cls._pool:
             raise RuntimeError("数据库连接池未初始化")
         
-        async with cls._pool.acquire() as connection:
-            try:
-                rows = await connection.fetch(query, *args)
-                return [dict(row) for row in rows]
-            except Exception as e:
-                logger.error("数据库查询失败", query=query, error=str(e))
-                raise
+        try:
+            rows = await cls._dispatch("fetch", query, args)
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error("数据库查询失败", query=cls._describe(query), error=str(e))
+            raise
     
     @classmethod
-    async def fetch_val(cls, query: str, *args) -> Any:
+    async def fetch_val(cls, query: Query, *args) -> Any:
         """执行查询并返回单个值"""
         if not cls._pool:
             raise RuntimeError("数据库连接池未初始化")
         
-        async with cls._pool.acquire() as connection:
-            try:
-                return await connection.fetchval(query, *args)
-            except Exception as e:
-                logger.error("数据库查询失败", query=query, error=str(e))
-                raise
+        try:
+            return await cls._dispatch("fetchval", query, args)
+        except Exception as e:
+            logger.error("数据库查询失败", query=cls._describe(query), error=str(e))
+            raise
+    
+    @classmethod
+    async def stream(
+        cls,
+        query: Query,
+        *args,
+        prefetch: int = 500,
+        row_format: str = ROW_RECORD,
+    ) -> AsyncIterator[Any]:
+        """通过服务端游标流式读取结果，内存占用与结果集大小无关
+        
+        row_format 为 record 时逐行产出 asyncpg.Record，tuple 时产出元组，
+        arrow 时每 prefetch 行产出一个 pyarrow.RecordBatch。
+        只读查询在可重复读的只读事务中执行，可路由到副本。
+        """
+        if not cls._pool:
+            raise RuntimeError("数据库连接池未初始化")
+        if row_format not in (ROW_RECORD, ROW_TUPLE, ROW_ARROW):
+            raise ValueError(f"不支持的行格式: {row_format}")
+        
+        # 处于工作单元的事务中时，在该事务内读取
+        unit = _current_unit.get()
+        if unit is not None and unit.connection is not None and unit.connection.is_in_transaction():
+            async for item in cls._stream_rows(unit.connection, query, args, prefetch, row_format):
+                yield item
+            return
+        
+        read_only = query.read_only if isinstance(query, NamedQuery) else is_read_only_sql(query)
+        if read_only:
+            replica = cls._choose_replica()
+        else:
+            replica = None
+            mark_write(cls._read_your_writes_seconds)
+        
+        pool_name = replica.name if replica is not None else "primary"
+        try:
+            async with cls._acquire(pool_name) as connection:
+                async with connection.transaction(
+                    isolation="repeatable_read" if read_only else None,
+                    readonly=read_only
+                ):
+                    async for item in cls._stream_rows(connection, query, args, prefetch, row_format):
+                        yield item
+        except Exception as e:
+            logger.error("数据库流式查询失败", query=cls._describe(query), error=str(e))
+            raise
+    
+    @staticmethod
+    async def _stream_rows(
+        connection, query: Query, args: tuple, prefetch: int, row_format: str
+    ) -> AsyncIterator[Any]:
+        if isinstance(query, NamedQuery):
+            statement = await connection.prepare_named(query)
+            cursor = statement.cursor(*args, prefetch=prefetch)
+        else:
+            cursor = connection.cursor(query, *args, prefetch=prefetch)
+        
+        if row_format == ROW_ARROW:
+            batch: List[asyncpg.Record] = []
+            async for record in cursor:
+                batch.append(record)
+                if len(batch) >= prefetch:
+                    yield _to_arrow_batch(batch)
+                    batch = []
+            if batch:
+                yield _to_arrow_batch(batch)
+        elif row_format == ROW_TUPLE:
+            async for record in cursor:
+                yield tuple(record)
+        else:
+            async for record in cursor:
+                yield record
     
     @classmethod
-    async def execute(cls, query: str, *args) -> str:
+    async def execute(cls, query: Query, *args) -> str:
         """执行非查询SQL语句"""
         if not cls._pool:
             raise RuntimeError("数据库连接池未初始化")
         
-        async with cls._pool.acquire() as connection:
-            try:
-                return await connection.execute(query, *args)
-            except Exception as e:
-                logger.error("数据库执行失败", query=query, error=str(e))
-                raise
+        try:
+            return await cls._dispatch("execute", query, args)
+        except Exception as e:
+            logger.error("数据库执行失败", query=cls._describe(query), error=str(e))
+            raise
     
     @classmethod
     async def execute_many(cls, query: str, args_list: List[tuple]) -> None:
@@ -102,12 +728,176 @@ class Database:
         if not cls._pool:
             raise RuntimeError("数据库连接池未初始化")
         
-        async with cls._pool.acquire() as connection:
-            try:
-                await connection.executemany(query, args_list)
-            except Exception as e:
-                logger.error("数据库批量执行失败", query=query, error=str(e))
-                raise
+        mark_write(cls._read_your_writes_seconds)
+        unit = _current_unit.get()
+        try:
+            if unit is not None:
+                await unit.run("executemany", query, (args_list,))
+            else:
+                async with cls._acquire() as connection:
+                    await connection.executemany(query, args_list)
+        except Exception as e:
+            logger.error("数据库批量执行失败", query=query, error=str(e))
+            raise
+    
+    @classmethod
+    @asynccontextmanager
+    async def _acquire(cls, pool_name: str = "primary") -> AsyncIterator[NamedQueryConnection]:
+        """经容量控制器从连接池获取连接"""
+        pool_controller = cls._controllers[pool_name]
+        connection = await pool_controller.acquire()
+        try:
+            yield connection
+        finally:
+            await pool_controller.release(connection)
+    
+    @classmethod
+    @asynccontextmanager
+    async def _primary_connection(cls) -> AsyncIterator[NamedQueryConnection]:
+        """获取主库连接：工作单元内复用其连接，否则从连接池检出"""
+        unit = _current_unit.get()
+        if unit is not None:
+            async with unit.locked_connection() as connection:
+                yield connection
+        else:
+            async with cls._acquire() as connection:
+                yield connection
+    
+    @staticmethod
+    def _normalize_records(
+        records: Records, columns: Optional[Sequence[str]]
+    ) -> Tuple[Iterable[Sequence[Any]], Optional[Sequence[str]]]:
+        """将按列组织的输入转换为行迭代器"""
+        if isinstance(records, Mapping):
+            if columns is None:
+                columns = list(records.keys())
+            return zip(*(records[column] for column in columns)), columns
+        return records, columns
+    
+    @classmethod
+    async def _copy(
+        cls,
+        table: str,
+        records: Union[Iterable[Sequence[Any]], AsyncIterable[Sequence[Any]]],
+        columns: Optional[Sequence[str]],
+        schema: Optional[str],
+        metric_table: Optional[str] = None,
+    ) -> CopyResult:
+        """COPY写入，metric_table 为指标中的表名标签（写入暂存表时取目标表名，避免标签无限增长）"""
+        if not cls._pool:
+            raise RuntimeError("数据库连接池未初始化")
+        
+        metric_table = metric_table or table
+        mark_write(cls._read_your_writes_seconds)
+        start_time = time.perf_counter()
+        try:
+            async with cls._primary_connection() as connection:
+                status = await connection.copy_records_to_table(
+                    table,
+                    records=records,
+                    columns=columns,
+                    schema_name=schema
+                )
+        except Exception as e:
+            logger.error("COPY批量写入失败", table=table, error=str(e))
+            raise
+        
+        result = CopyResult(table, _copied_rows(status), time.perf_counter() - start_time)
+        DB_COPY_ROWS.labels(table=metric_table).inc(result.rows)
+        DB_COPY_DURATION.labels(table=metric_table).observe(result.seconds)
+        logger.info(
+            "COPY批量写入完成",
+            table=table,
+            rows=result.rows,
+            duration=round(result.seconds, 3),
+            rows_per_second=round(result.rows_per_second)
+        )
+        return result
+    
+    @classmethod
+    async def copy_records(
+        cls,
+        table: str,
+        records: Records,
+        columns: Optional[Sequence[str]] = None,
+        schema: Optional[str] = None,
+    ) -> CopyResult:
+        """通过二进制COPY批量写入行（元组列表、生成器或按列组织的字典）"""
+        records, columns = cls._normalize_records(records, columns)
+        return await cls._copy(table, records, columns, schema)
+    
+    @classmethod
+    async def copy_from_async_iterable(
+        cls,
+        table: str,
+        records: AsyncIterable[Sequence[Any]],
+        columns: Optional[Sequence[str]] = None,
+        schema: Optional[str] = None,
+    ) -> CopyResult:
+        """通过二进制COPY流式写入异步迭代器产生的行（无需整体加载到内存）"""
+        return await cls._copy(table, records, columns, schema)
+    
+    @classmethod
+    async def upsert_records(
+        cls,
+        table: str,
+        records: Records,
+        columns: Optional[Sequence[str]],
+        conflict_columns: Sequence[str],
+        update_columns: Optional[Sequence[str]] = None,
+        schema: Optional[str] = None,
+    ) -> CopyResult:
+        """经临时暂存表批量写入并按冲突列合并
+        
+        数据先COPY到与目标表同结构的临时表，再以一条
+        INSERT ... SELECT ... ON CONFLICT 合并；update_columns 默认为
+        除冲突列外的全部列，为空序列时冲突行保持不变。
+        暂存表名每次调用唯一并在合并后删除，同一事务或工作单元内可多次调用。
+        """
+        records, columns = cls._normalize_records(records, columns)
+        if not columns:
+            raise ValueError("批量合并需要指定写入列")
+        if update_columns is None:
+            update_columns = [column for column in columns if column not in conflict_columns]
+        
+        target = _quote_ident(table) if schema is None else f"{_quote_ident(schema)}.{_quote_ident(table)}"
+        # 标识符上限63字节，截断表名以保留唯一后缀
+        staging = f"_staging_{table[:40]}_{uuid.uuid4().hex[:12]}"
+        column_list = ", ".join(_quote_ident(column) for column in columns)
+        conflict_list = ", ".join(_quote_ident(column) for column in conflict_columns)
+        if update_columns:
+            action = "DO UPDATE SET " + ", ".join(
+                f"{_quote_ident(column)} = EXCLUDED.{_quote_ident(column)}"
+                for column in update_columns
+            )
+        else:
+            action = "DO NOTHING"
+        
+        start_time = time.perf_counter()
+        async with cls.transaction() as connection:
+            # 暂存表仅含写入列（不继承约束与默认值）；合并后立即删除，
+            # 长事务或工作单元内多次调用不会累积临时表
+            await connection.execute(
+                f"CREATE TEMP TABLE {_quote_ident(staging)} ON COMMIT DROP AS "
+                f"SELECT {column_list} FROM {target} WITH NO DATA"
+            )
+            copied = await cls._copy(staging, records, columns, None, metric_table=table)
+            status = await connection.execute(
+                f"INSERT INTO {target} ({column_list}) "
+                f"SELECT {column_list} FROM {_quote_ident(staging)} "
+                f"ON CONFLICT ({conflict_list}) {action}"
+            )
+            await connection.execute(f"DROP TABLE {_quote_ident(staging)}")
+        
+        result = CopyResult(table, copied.rows, time.perf_counter() - start_time)
+        logger.info(
+            "批量合并完成",
+            table=table,
+            rows=result.rows,
+            merged=_copied_rows(status),
+            rows_per_second=round(result.rows_per_second)
+        )
+        return result
     
     @classmethod
     async def execute_query(cls, query: str, *args) -> Union[List[Dict[str, Any]], str]:
@@ -118,20 +908,61 @@ class Database:
             return await cls.execute(query, *args)
     
     @classmethod
-    async def transaction(cls):
-        """返回事务上下文管理器"""
+    @asynccontextmanager
+    async def unit_of_work(cls) -> AsyncIterator[UnitOfWork]:
+        """开启工作单元，期间通过Database执行的查询复用同一连接（可重入）"""
         if not cls._pool:
             raise RuntimeError("数据库连接池未初始化")
         
-        return cls._pool.acquire()
+        unit = _current_unit.get()
+        if unit is not None:
+            yield unit
+            return
+        
+        unit = UnitOfWork(cls._controllers["primary"])
+        _current_unit.set(unit)
+        try:
+            yield unit
+        finally:
+            # 依赖的清理阶段可能运行在其他上下文中，这里不使用token重置
+            _current_unit.set(None)
+            await unit.release()
+    
+    @classmethod
+    @asynccontextmanager
+    async def transaction(cls) -> AsyncIterator[NamedQueryConnection]:
+        """事务上下文管理器
+        
+        在工作单元内使用其连接，嵌套调用时创建保存点；事务内通过Database
+        执行的查询均在该事务中执行。
+        """
+        async with cls.unit_of_work() as unit:
+            mark_write(cls._read_your_writes_seconds)
+            async with unit.transaction() as connection:
+                yield connection
     
     @classmethod
-    async def get_connection(cls):
-        """获取数据库连接（用于事务）"""
+    async def get_connection(cls, timeout: Optional[float] = None):
+        """获取数据库连接（用于事务，使用完毕需调用 release_connection 归还）
+        
+        timeout 内未能检出连接时抛出 asyncio.TimeoutError。
+        """
         if not cls._pool:
             raise RuntimeError("数据库连接池未初始化")
         
-        return await cls._pool.acquire()
+        return await cls._controllers["primary"].acquire(timeout=timeout)
+    
+    @classmethod
+    async def release_connection(cls, connection) -> None:
+        """归还 get_connection 获取的连接"""
+        if cls._pool:
+            await cls._controllers["primary"].release(connection)
+
+
+async def get_unit_of_work() -> AsyncIterator[UnitOfWork]:
+    """FastAPI依赖：为当前请求开启工作单元，请求结束后归还连接"""
+    async with Database.unit_of_work() as unit:
+        yield unit
 
 
 class DatabaseTransaction:
@@ -147,8 +978,11 @@ class DatabaseTransaction:
         return self.connection
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is None:
-            await self.transaction.commit()
-        else:
-            await self.transaction.rollback()
-        await self.connection.close()
\ No newline at end of file
+        try:
+            if exc_type is None:
+                await self.transaction.commit()
+            else:
+                await self.transaction.rollback()
+        finally:
+            # 归还连接池而不是关闭连接
+            await Database.release_connection(self.connection)
\ No newline at end of file
@@ -0,0 +1,358 @@
+"""
+数据库查询埋点模块
+分别统计连接池等待与语句执行耗时（按归一化语句聚合），
+对慢查询脱敏采样，并可对超过阈值的只读语句附加 EXPLAIN (ANALYZE, BUFFERS) 计划
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter, Histogram
+import structlog
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义（语句标签数量受 max_statements 约束）
+DB_QUERY_CALLS = Counter(
+    "db_query_calls_total",
+    "SQL语句调用次数",
+    ["statement", "status"]
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "SQL语句执行耗时（不含连接池等待）",
+    ["statement"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+DB_POOL_ACQUIRE_WAIT = Histogram(
+    "db_pool_acquire_wait_seconds",
+    "从连接池获取连接的等待耗时",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries_total",
+    "超过慢查询阈值的语句执行次数",
+    ["statement"]
+)
+
+# 超出语句标签上限的语句统一归入该标签
+OTHER_STATEMENT = "other"
+
+# 同一语句两次 EXPLAIN 之间的最小间隔
+EXPLAIN_COOLDOWN_SECONDS = 600
+
+# EXPLAIN 检出连接的最长等待，连接池繁忙时放弃本次分析
+EXPLAIN_ACQUIRE_TIMEOUT_SECONDS = 5.0
+
+# 保存的计划节点字段：只含结构与耗时，不含 Index Cond、Filter 等带参数字面量的条件
+PLAN_SUMMARY_KEYS = (
+    "Node Type",
+    "Relation Name",
+    "Index Name",
+    "Join Type",
+    "Strategy",
+    "Plan Rows",
+    "Actual Rows",
+    "Actual Loops",
+    "Actual Startup Time",
+    "Actual Total Time",
+    "Shared Hit Blocks",
+    "Shared Read Blocks",
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![$\w.])\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """归一化SQL：折叠空白并以 ? 替换字面量，使同构语句聚合到同一条目"""
+    normalized = _STRING_LITERAL.sub("?", sql)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def sql_fingerprint(sql: str) -> str:
+    """未命名语句的标签（归一化SQL的短哈希）"""
+    digest = hashlib.blake2b(normalize_sql(sql).encode("utf-8"), digest_size=4).hexdigest()
+    return f"sql_{digest}"
+
+
+def redact_params(args: Tuple[Any, ...]) -> List[str]:
+    """参数脱敏：仅保留类型和长度"""
+    redacted = []
+    for value in args:
+        if value is None:
+            redacted.append("NULL")
+        elif isinstance(value, (str, bytes, list, tuple, dict)):
+            redacted.append(f"<{type(value).__name__} len={len(value)}>")
+        else:
+            redacted.append(f"<{type(value).__name__}>")
+    return redacted
+
+
+async def explain_analyze(connection, sql: str, *params) -> Dict[str, Any]:
+    """获取语句的 EXPLAIN (ANALYZE, BUFFERS) 计划及耗时
+
+    与 tests/database/test_utilities.py 中 analyze_query_performance 的输出一致；
+    ANALYZE 会真实执行语句，调用方需保证语句只读。
+    """
+    explain_query = f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"
+    try:
+        explain_result = await connection.fetchval(explain_query, *params)
+        if isinstance(explain_result, str):
+            explain_result = json.loads(explain_result)
+        plan = explain_result[0] if explain_result else {}
+
+        # 提取关键性能指标
+        execution_time = plan.get("Execution Time", 0)
+        planning_time = plan.get("Planning Time", 0)
+
+        return {
+            "query": sql[:100] + "..." if len(sql) > 100 else sql,
+            "execution_time_ms": execution_time,
+            "planning_time_ms": planning_time,
+            "total_time_ms": execution_time + planning_time,
+            "plan": plan
+        }
+    except Exception as e:
+        return {
+            "query": sql[:100] + "..." if len(sql) > 100 else sql,
+            "error": str(e),
+            "execution_time_ms": None
+        }
+
+
+def summarize_plan(node: Dict[str, Any]) -> Dict[str, Any]:
+    """提取计划树的节点类型、行数与耗时
+
+    ANALYZE 以真实参数执行，定制计划的条件字段中含有参数字面量，
+    因此采样中只保存摘要，与参数脱敏保持一致。
+    """
+    summary = {key: node[key] for key in PLAN_SUMMARY_KEYS if key in node}
+    if "Plan" in node:
+        summary["Plan"] = summarize_plan(node["Plan"])
+    if node.get("Plans"):
+        summary["Plans"] = [summarize_plan(child) for child in node["Plans"]]
+    for key in ("Planning Time", "Execution Time"):
+        if key in node:
+            summary[key] = node[key]
+    return summary
+
+
+@dataclass
+class QueryStats:
+    """单条语句的进程内统计"""
+
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    sql: str = ""
+
+    def record(self, duration: float, failed: bool) -> None:
+        self.calls += 1
+        self.errors += int(failed)
+        self.total_seconds += duration
+        self.max_seconds = max(self.max_seconds, duration)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": self.total_seconds / self.calls * 1000 if self.calls else 0.0,
+            "max_ms": self.max_seconds * 1000,
+            "total_seconds": self.total_seconds,
+            "sql": self.sql,
+        }
+
+
+class QueryInstrumentation:
+    """查询埋点
+
+    执行耗时按语句聚合：命名查询使用其名称，其余语句使用归一化SQL的指纹。
+    超过 slow_query_ms 的执行按 sample_rate 采样进入慢查询环形缓冲区（参数脱敏）；
+    设置 explain_threshold_ms 后，超过该阈值的只读语句会在后台以原参数执行一次
+    EXPLAIN (ANALYZE, BUFFERS)，同一语句在冷却期内只分析一次；分析连接经主库的
+    容量控制器检出，采样中只保存计划摘要（见 summarize_plan）。
+    """
+
+    slow_query_ms: float = 200.0
+    sample_rate: float = 1.0
+    explain_threshold_ms: Optional[float] = None
+    max_statements: int = 200
+
+    _stats: Dict[str, QueryStats] = {}
+    _labels: Set[str] = set()
+    _slow_queries: Deque[Dict[str, Any]] = deque(maxlen=100)
+    _explain_controller = None
+    _explain_task: Optional[asyncio.Task] = None
+    _explained_at: Dict[str, float] = {}
+
+    @classmethod
+    def configure(
+        cls,
+        slow_query_ms: float = 200.0,
+        sample_rate: float = 1.0,
+        explain_threshold_ms: Optional[float] = None,
+        explain_controller=None,
+        max_samples: int = 100,
+    ) -> None:
+        """配置慢查询采样与EXPLAIN"""
+        cls.slow_query_ms = slow_query_ms
+        cls.sample_rate = sample_rate
+        cls.explain_threshold_ms = explain_threshold_ms
+        cls._explain_controller = explain_controller
+        if cls._slow_queries.maxlen != max_samples:
+            cls._slow_queries = deque(cls._slow_queries, maxlen=max_samples)
+
+    @classmethod
+    def _guard_cardinality(cls, label: str) -> str:
+        """限制语句标签数量，超出上限的新语句归入other"""
+        if label in cls._labels:
+            return label
+        if len(cls._labels) >= cls.max_statements:
+            return OTHER_STATEMENT
+        cls._labels.add(label)
+        return label
+
+    @classmethod
+    def statement_label(cls, sql: str, name: Optional[str] = None) -> str:
+        """语句标签（命名查询名称或SQL指纹）"""
+        return cls._guard_cardinality(name or sql_fingerprint(sql))
+
+    @classmethod
+    def observe_acquire(cls, pool_name: str, wait: float) -> None:
+        """记录连接池等待耗时"""
+        DB_POOL_ACQUIRE_WAIT.labels(pool=pool_name).observe(wait)
+
+    @classmethod
+    def observe(
+        cls,
+        sql: str,
+        args: Tuple[Any, ...],
+        duration: float,
+        failed: bool,
+        name: Optional[str] = None,
+        read_only: bool = False,
+    ) -> None:
+        """记录一次语句执行"""
+        label = cls.statement_label(sql, name)
+        stats = cls._stats.get(label)
+        if stats is None:
+            stats = cls._stats[label] = QueryStats(sql=normalize_sql(sql) if label != OTHER_STATEMENT else "")
+        stats.record(duration, failed)
+
+        DB_QUERY_CALLS.labels(statement=label, status="error" if failed else "ok").inc()
+        DB_QUERY_DURATION.labels(statement=label).observe(duration)
+
+        duration_ms = duration * 1000
+        if duration_ms < cls.slow_query_ms:
+            return
+
+        DB_SLOW_QUERIES.labels(statement=label).inc()
+        if random.random() >= cls.sample_rate:
+            return
+
+        sample = {
+            "statement": label,
+            "sql": normalize_sql(sql),
+            "params": redact_params(args),
+            "duration_ms": round(duration_ms, 2),
+            "failed": failed,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+        }
+        cls._slow_queries.append(sample)
+        logger.warning(
+            "慢查询",
+            statement=label,
+            sql=sample["sql"][:500],
+            params=sample["params"],
+            duration_ms=sample["duration_ms"]
+        )
+
+        if (
+            read_only
+            and not failed
+            and cls.explain_threshold_ms is not None
+            and duration_ms >= cls.explain_threshold_ms
+        ):
+            cls._schedule_explain(label, sql, args, sample)
+
+    @classmethod
+    def _schedule_explain(
+        cls, label: str, sql: str, args: Tuple[Any, ...], sample: Dict[str, Any]
+    ) -> None:
+        """后台执行EXPLAIN，同时最多一个，同一语句冷却期内只执行一次"""
+        if cls._explain_controller is None:
+            return
+        if cls._explain_task is not None and not cls._explain_task.done():
+            return
+
+        now = time.monotonic()
+        if now - cls._explained_at.get(label, -EXPLAIN_COOLDOWN_SECONDS) < EXPLAIN_COOLDOWN_SECONDS:
+            return
+        cls._explained_at[label] = now
+
+        try:
+            cls._explain_task = asyncio.get_running_loop().create_task(
+                cls._explain(label, sql, args, sample)
+            )
+        except RuntimeError:
+            # 无运行中的事件循环
+            return
+
+    @classmethod
+    async def _explain(
+        cls, label: str, sql: str, args: Tuple[Any, ...], sample: Dict[str, Any]
+    ) -> None:
+        try:
+            connection = await cls._explain_controller.acquire(timeout=EXPLAIN_ACQUIRE_TIMEOUT_SECONDS)
+            try:
+                # 在回滚的只读事务中分析，避免任何副作用
+                transaction = connection.transaction(readonly=True)
+                await transaction.start()
+                try:
+                    explain = await explain_analyze(connection, sql, *args)
+                finally:
+                    await transaction.rollback()
+            finally:
+                await cls._explain_controller.release(connection)
+        except Exception as e:
+            explain = {"error": str(e), "execution_time_ms": None}
+
+        explain["query"] = sample["sql"][:100]
+        if "plan" in explain:
+            explain["plan"] = summarize_plan(explain["plan"])
+        sample["explain"] = explain
+
+        logger.info(
+            "慢查询执行计划",
+            statement=label,
+            execution_time_ms=sample["explain"].get("execution_time_ms"),
+            planning_time_ms=sample["explain"].get("planning_time_ms")
+        )
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, Any]]:
+        """各语句的调用次数与延迟统计"""
+        return {label: stats.as_dict() for label, stats in cls._stats.items()}
+
+    @classmethod
+    def slow_queries(cls) -> List[Dict[str, Any]]:
+        """最近的慢查询采样（参数已脱敏）"""
+        return list(cls._slow_queries)
@@ -0,0 +1,358 @@
+"""
+连接池自适应容量模块
+根据连接池等待耗时、空闲连接数以及服务端 max_connections 余量，
+在 [min_size, pool_size + max_overflow] 区间内动态调整每个连接池的检出上限，
+并在归还时回收超过 pool_recycle 的连接
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+import asyncpg
+from prometheus_client import Counter, Gauge
+import structlog
+
+from .database_instrumentation import QueryInstrumentation
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义（各worker的连接数在多进程模式下求和）
+DB_POOL_LIMIT = Gauge(
+    "db_pool_limit",
+    "连接池当前检出上限",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "连接池连接数",
+    ["pool", "state"],
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_WAITING = Gauge(
+    "db_pool_waiting",
+    "等待检出许可的协程数",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_RESIZES = Counter(
+    "db_pool_resizes_total",
+    "连接池检出上限调整次数",
+    ["pool", "direction", "reason"]
+)
+
+DB_POOL_RECYCLED = Counter(
+    "db_pool_recycled_total",
+    "超过 pool_recycle 后关闭的连接数",
+    ["pool"]
+)
+
+DB_SERVER_CONNECTION_HEADROOM = Gauge(
+    "db_server_connection_headroom",
+    "服务端剩余可用连接数（max_connections 减去保留连接与已用连接）",
+    ["pool"],
+    multiprocess_mode="livemin"
+)
+
+# 调整方向与原因
+GROW = "grow"
+SHRINK = "shrink"
+REASON_ACQUIRE_WAIT = "acquire_wait"
+REASON_IDLE = "idle"
+REASON_SERVER_HEADROOM = "server_headroom"
+
+# 服务端连接余量：普通用户可用的连接数减去当前所有客户端连接
+SERVER_CONNECTIONS_QUERY = """
+    SELECT current_setting('max_connections')::int
+           - current_setting('superuser_reserved_connections')::int
+           - (SELECT count(*) FROM pg_stat_activity WHERE backend_type = 'client backend')
+"""
+
+
+class PoolController:
+    """单个连接池的容量控制器
+
+    asyncpg 连接池创建后无法调整 max_size，因此连接池按上限
+    (pool_size + max_overflow) 创建（未使用的槽位不会建立连接），
+    由控制器维护检出许可数 limit 作为实际容量：
+
+    - 窗口内 p95 等待耗时超过 target_wait_ms 或有协程排队时扩容，
+      扩容步长受服务端连接余量约束；
+    - 连续 shrink_after 个窗口内峰值占用低于 limit - 1 时逐个缩容，
+      多出的空闲连接由连接池的空闲超时关闭；
+    - 服务端余量低于 server_reserve 时主动缩容，为其他服务/worker 让出连接。
+
+    adaptive=False 时 limit 固定为上限，仅执行 pool_recycle。
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        name: str,
+        min_size: int,
+        max_size: int,
+        initial_size: int,
+        recycle_seconds: float = 0.0,
+        adaptive: bool = True,
+        interval: float = 5.0,
+        target_wait_ms: float = 20.0,
+        server_reserve: int = 5,
+        shrink_after: int = 6,
+    ):
+        if not 1 <= min_size <= max_size:
+            raise ValueError(f"连接池容量区间无效: [{min_size}, {max_size}]")
+
+        self.pool = pool
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.limit = min(max(initial_size, min_size), max_size) if adaptive else max_size
+        self.recycle_seconds = recycle_seconds
+        self.adaptive = adaptive
+        self.interval = interval
+        self.target_wait_ms = target_wait_ms
+        self.server_reserve = server_reserve
+        self.shrink_after = shrink_after
+        self.server_headroom: Optional[int] = None
+
+        self._in_use = 0
+        self._waiting = 0
+        self._peak_in_use = 0
+        self._idle_windows = 0
+        self._waits: List[float] = []
+        self._condition = asyncio.Condition()
+        self._decisions: Deque[Dict[str, Any]] = deque(maxlen=20)
+        self._control_task: Optional[asyncio.Task] = None
+
+        DB_POOL_LIMIT.labels(pool=name).set(self.limit)
+
+    async def acquire(self, timeout: Optional[float] = None) -> asyncpg.Connection:
+        """取得检出许可后从连接池获取连接，并记录总等待耗时
+
+        timeout 为排队等待许可与检出连接的总时限，超时抛出 asyncio.TimeoutError。
+        """
+        start_time = time.perf_counter()
+
+        # 有协程排队时新请求也排队，保证先来先得
+        if self._waiting or self._in_use >= self.limit:
+            self._waiting += 1
+            DB_POOL_WAITING.labels(pool=self.name).set(self._waiting)
+            try:
+                async with self._condition:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(lambda: self._in_use < self.limit),
+                        timeout
+                    )
+            except BaseException:
+                # 超时或取消前可能已被唤醒，将名额转交下一个等待者，避免唤醒丢失
+                async with self._condition:
+                    self._condition.notify()
+                raise
+            finally:
+                self._waiting -= 1
+                DB_POOL_WAITING.labels(pool=self.name).set(self._waiting)
+
+        if timeout is not None:
+            timeout = max(timeout - (time.perf_counter() - start_time), 0.0)
+
+        self._in_use += 1
+        self._peak_in_use = max(self._peak_in_use, self._in_use)
+        try:
+            connection = await self.pool.acquire(timeout=timeout)
+        except BaseException:
+            await self._leave()
+            raise
+
+        wait = time.perf_counter() - start_time
+        self._waits.append(wait)
+        QueryInstrumentation.observe_acquire(self.name, wait)
+        return connection
+
+    async def release(self, connection: asyncpg.Connection) -> None:
+        """归还连接，存活超过 recycle_seconds 的连接关闭后由连接池重建"""
+        try:
+            if self.recycle_seconds and not connection.is_closed():
+                age = time.monotonic() - getattr(connection, "created_at", time.monotonic())
+                if age >= self.recycle_seconds:
+                    DB_POOL_RECYCLED.labels(pool=self.name).inc()
+                    try:
+                        # 关闭检出中的连接会同时释放连接池槽位
+                        await connection.close(timeout=5)
+                    except Exception:
+                        connection.terminate()
+            await self.pool.release(connection)
+        finally:
+            await self._leave()
+
+    async def _leave(self) -> None:
+        self._in_use -= 1
+        if self._waiting:
+            async with self._condition:
+                self._condition.notify()
+
+    async def warm_up(self, timeout: float = 30.0) -> int:
+        """将连接池预热到 min_size，返回新建的连接数（仅在启动时调用）
+
+        只补足 min_size 与当前连接数之差；已连接的空闲槽位与未连接的槽位
+        位于同一个 LIFO 队列，因此同时检出 空闲数 + 差额 个槽位才能取到未连接的槽位。
+        新连接经连接池 init 钩子预编译热点查询。启动后空闲超过
+        max_inactive_connection_lifetime 的连接照常关闭，不再周期性补足，避免反复建连。
+        """
+        before = self.pool.get_size()
+        deficit = self.min_size - before
+        if deficit <= 0:
+            return 0
+
+        count = min(self.pool.get_idle_size() + deficit, self.max_size)
+        results = await asyncio.gather(
+            *(self.pool.acquire(timeout=timeout) for _ in range(count)),
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        for result in results:
+            if not isinstance(result, BaseException):
+                await self.pool.release(result)
+        if errors:
+            raise errors[0]
+
+        opened = self.pool.get_size() - before
+        self._export()
+        return opened
+
+    async def _set_limit(self, limit: int, reason: str) -> None:
+        """调整检出上限并记录决策"""
+        limit = min(max(limit, self.min_size), self.max_size)
+        if limit == self.limit:
+            return
+
+        direction = GROW if limit > self.limit else SHRINK
+        previous, self.limit = self.limit, limit
+        DB_POOL_LIMIT.labels(pool=self.name).set(limit)
+        DB_POOL_RESIZES.labels(pool=self.name, direction=direction, reason=reason).inc()
+        self._decisions.append({
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "direction": direction,
+            "reason": reason,
+            "from": previous,
+            "to": limit,
+        })
+        logger.info(
+            "连接池容量已调整",
+            pool=self.name,
+            direction=direction,
+            reason=reason,
+            previous=previous,
+            limit=limit
+        )
+
+        if direction == GROW and self._waiting:
+            async with self._condition:
+                self._condition.notify(limit - previous)
+
+    async def _check_server_headroom(self) -> None:
+        """查询服务端剩余连接数
+
+        探测占用一个检出许可，不会使连接数超过 limit；没有空闲许可时跳过本次探测，
+        不与请求争抢许可，也不计入等待耗时与峰值占用。
+        """
+        if self._waiting or self._in_use >= self.limit:
+            return
+
+        self._in_use += 1
+        try:
+            connection = await self.pool.acquire(timeout=self.interval)
+            try:
+                headroom = await connection.fetchval(SERVER_CONNECTIONS_QUERY, timeout=self.interval)
+            finally:
+                await self.pool.release(connection)
+        except Exception as e:
+            logger.warning("服务端连接余量探测失败", pool=self.name, error=str(e))
+            return
+        finally:
+            await self._leave()
+
+        self.server_headroom = int(headroom)
+        DB_SERVER_CONNECTION_HEADROOM.labels(pool=self.name).set(self.server_headroom)
+
+    async def adjust(self) -> None:
+        """根据上一窗口的观测值调整检出上限"""
+        waits, self._waits = sorted(self._waits), []
+        peak, self._peak_in_use = self._peak_in_use, self._in_use
+        p95_ms = waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0
+
+        await self._check_server_headroom()
+
+        if self.server_headroom is not None and self.server_headroom < self.server_reserve:
+            # 服务端即将耗尽：让出空闲的许可，但不低于当前占用
+            self._idle_windows = 0
+            await self._set_limit(max(self._in_use, self.limit - 1), REASON_SERVER_HEADROOM)
+        elif self._waiting or p95_ms >= self.target_wait_ms:
+            self._idle_windows = 0
+            step = max(1, math.ceil(self.limit / 4))
+            if self.server_headroom is not None:
+                step = min(step, self.server_headroom - self.server_reserve)
+            if step > 0:
+                await self._set_limit(self.limit + step, REASON_ACQUIRE_WAIT)
+        elif peak < self.limit - 1:
+            self._idle_windows += 1
+            if self._idle_windows >= self.shrink_after:
+                self._idle_windows = 0
+                await self._set_limit(self.limit - 1, REASON_IDLE)
+        else:
+            self._idle_windows = 0
+
+    def _export(self) -> None:
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        DB_POOL_CONNECTIONS.labels(pool=self.name, state="idle").set(idle)
+        DB_POOL_CONNECTIONS.labels(pool=self.name, state="in_use").set(size - idle)
+
+    async def start(self):
+        """启动容量控制任务（非自适应模式下仅导出连接数指标）"""
+        if self._control_task is None or self._control_task.done():
+            self._control_task = asyncio.create_task(self._control_loop())
+
+    async def stop(self):
+        """停止容量控制任务"""
+        if self._control_task:
+            self._control_task.cancel()
+            try:
+                await self._control_task
+            except asyncio.CancelledError:
+                pass
+            self._control_task = None
+
+    async def _control_loop(self):
+        """周期性评估并调整容量"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if self.adaptive:
+                    await self.adjust()
+                self._export()
+            except Exception as e:
+                logger.error("连接池容量调整失败", pool=self.name, error=str(e))
+
+    def status(self) -> Dict[str, Any]:
+        """容量与最近决策快照"""
+        return {
+            "name": self.name,
+            "adaptive": self.adaptive,
+            "limit": self.limit,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "server_headroom": self.server_headroom,
+            "recycle_seconds": self.recycle_seconds,
+            "decisions": list(self._decisions),
+        }
@@ -0,0 +1,227 @@
+"""
+只读副本路由模块
+管理PostgreSQL只读副本连接池，按轮询或最少繁忙策略分发只读查询，
+并根据复制延迟将副本移出/移回轮换
+"""
+
+import asyncio
+import itertools
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+import asyncpg
+from prometheus_client import Counter, Gauge
+import structlog
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义
+DB_READ_ROUTES = Counter(
+    "db_read_routes_total",
+    "只读查询路由次数",
+    ["target"]
+)
+
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "副本复制延迟",
+    ["replica"],
+    multiprocess_mode="livemax"
+)
+
+DB_REPLICA_IN_ROTATION = Gauge(
+    "db_replica_in_rotation",
+    "副本是否处于轮换中（1为是）",
+    ["replica"],
+    multiprocess_mode="livemin"
+)
+
+# 路由策略
+ROUND_ROBIN = "round_robin"
+LEAST_BUSY = "least_busy"
+
+# 副本连接类错误：出现时将副本移出轮换并回退主库
+REPLICA_CONNECTION_ERRORS = (
+    OSError,
+    asyncpg.exceptions.PostgresConnectionError,
+    asyncpg.exceptions.CannotConnectNowError,
+    asyncpg.exceptions.ConnectionDoesNotExistError,
+)
+
+# 副本的回放延迟：WAL接收进程处于streaming且已全部回放时视为0（避免主库空闲时误判延迟）；
+# 接收进程断开时已接收的WAL同样会回放完毕，此时按最近一次回放的事务时间计算，
+# 从未回放过事务则视为无限延迟
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming')
+            AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 'Infinity')
+    END
+"""
+
+_WRITE_KEYWORDS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|CREATE|ALTER|DROP|GRANT|REVOKE|LOCK|COPY|CALL"
+    r"|NEXTVAL|SETVAL|FOR\s+(?:NO\s+KEY\s+)?UPDATE|FOR\s+(?:KEY\s+)?SHARE)\b",
+    re.IGNORECASE
+)
+
+# 当前请求（asyncio上下文）内最近一次写入后，读取须回到主库的截止时间
+_primary_sticky_until: ContextVar[float] = ContextVar("db_primary_sticky_until", default=0.0)
+
+
+@lru_cache(maxsize=1024)
+def is_read_only_sql(sql: str) -> bool:
+    """判断SQL是否可发往只读副本（保守判断，无法确定时视为写入）"""
+    words = sql.lstrip().lstrip("(").split(None, 1)
+    if not words or words[0].upper() not in ("SELECT", "WITH", "VALUES", "SHOW", "TABLE"):
+        return False
+    return _WRITE_KEYWORDS.search(sql) is None
+
+
+def mark_write(window: float) -> None:
+    """记录一次写入，窗口期内当前请求的读取走主库（读己之写）"""
+    if window > 0:
+        _primary_sticky_until.set(time.monotonic() + window)
+
+
+def is_primary_sticky() -> bool:
+    """当前请求是否处于写后读主库窗口内"""
+    return time.monotonic() < _primary_sticky_until.get()
+
+
+def replica_name(url: str) -> str:
+    """副本标识（host:port/db，不含凭据）"""
+    parts = urlsplit(url)
+    return f"{parts.hostname}:{parts.port or 5432}{parts.path}"
+
+
+@dataclass
+class Replica:
+    """单个只读副本"""
+
+    name: str
+    pool: asyncpg.Pool
+    in_rotation: bool = True
+    lag_seconds: float = 0.0
+    last_error: Optional[str] = None
+
+    @property
+    def busy(self) -> int:
+        """正在使用中的连接数"""
+        return self.pool.get_size() - self.pool.get_idle_size()
+
+
+class ReplicaSet:
+    """只读副本集合
+
+    副本的复制延迟超过 max_lag_seconds 或探测失败时移出轮换，
+    下一次探测恢复正常后移回；没有可用副本时读取回退到主库。
+    """
+
+    def __init__(
+        self,
+        replicas: List[Replica],
+        routing: str = ROUND_ROBIN,
+        max_lag_seconds: float = 5.0,
+        check_interval: float = 2.0,
+    ):
+        if routing not in (ROUND_ROBIN, LEAST_BUSY):
+            raise ValueError(f"不支持的副本路由策略: {routing}")
+
+        self.replicas = replicas
+        self.routing = routing
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._cursor = itertools.count()
+        self._monitor_task: Optional[asyncio.Task] = None
+
+        for replica in replicas:
+            DB_REPLICA_IN_ROTATION.labels(replica=replica.name).set(1)
+
+    def choose(self) -> Optional[Replica]:
+        """选择一个处于轮换中的副本，没有可用副本时返回None"""
+        available = [replica for replica in self.replicas if replica.in_rotation]
+        if not available:
+            return None
+
+        if self.routing == LEAST_BUSY:
+            return min(available, key=lambda replica: replica.busy)
+        return available[next(self._cursor) % len(available)]
+
+    def take_out(self, replica: Replica, reason: str) -> None:
+        """将副本移出轮换"""
+        replica.last_error = reason
+        if replica.in_rotation:
+            replica.in_rotation = False
+            DB_REPLICA_IN_ROTATION.labels(replica=replica.name).set(0)
+            logger.warning("副本已移出轮换", replica=replica.name, reason=reason)
+
+    def put_back(self, replica: Replica) -> None:
+        """将副本移回轮换"""
+        replica.last_error = None
+        if not replica.in_rotation:
+            replica.in_rotation = True
+            DB_REPLICA_IN_ROTATION.labels(replica=replica.name).set(1)
+            logger.info("副本已恢复轮换", replica=replica.name, lag_seconds=replica.lag_seconds)
+
+    async def check(self, replica: Replica) -> None:
+        """探测副本复制延迟并更新轮换状态"""
+        try:
+            async with replica.pool.acquire(timeout=self.check_interval) as connection:
+                lag = await connection.fetchval(REPLICA_LAG_QUERY, timeout=self.check_interval)
+        except Exception as e:
+            self.take_out(replica, f"探测失败: {e}")
+            return
+
+        replica.lag_seconds = float(lag or 0.0)
+        DB_REPLICA_LAG.labels(replica=replica.name).set(replica.lag_seconds)
+
+        if replica.lag_seconds > self.max_lag_seconds:
+            self.take_out(replica, f"复制延迟 {replica.lag_seconds:.1f}s")
+        else:
+            self.put_back(replica)
+
+    async def start(self):
+        """启动延迟探测任务"""
+        if self.replicas and (self._monitor_task is None or self._monitor_task.done()):
+            self._monitor_task = asyncio.create_task(self._monitor_loop())
+
+    async def stop(self):
+        """停止探测任务并关闭副本连接池"""
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
+
+        await asyncio.gather(
+            *(replica.pool.close() for replica in self.replicas),
+            return_exceptions=True
+        )
+
+    async def _monitor_loop(self):
+        """周期性探测所有副本"""
+        while True:
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            await asyncio.sleep(self.check_interval)
+
+    def status(self) -> List[dict]:
+        """副本状态快照"""
+        return [
+            {
+                "name": replica.name,
+                "in_rotation": replica.in_rotation,
+                "lag_seconds": replica.lag_seconds,
+                "busy_connections": replica.busy,
+                "last_error": replica.last_error,
+            }
+            for replica in self.replicas
+        ]
@@ -0,0 +1,323 @@
+"""
+数据库统计采样模块
+在每个服务中周期性采样连接池、pg_stat_activity 与 pg_stat_statements
+（查询源自 scripts/postgres/connection-pool-configs.py 的 ConnectionPoolMonitor），
+在内存环形缓冲区保留最近的样本，并将区间增量导出为Prometheus指标；
+数据库级统计可只由选主胜出的副本采样
+"""
+
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import asyncpg
+from prometheus_client import Counter, Gauge, Histogram
+import structlog
+
+from .config import get_settings
+from .database import Database
+from .redis_lock import LeaderElection
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义（数据库级数值各worker采样结果相同，多进程模式下取最大值）
+DB_ACTIVITY_CONNECTIONS = Gauge(
+    "db_activity_connections",
+    "当前数据库的客户端连接数（pg_stat_activity）",
+    ["state"],
+    multiprocess_mode="livemax"
+)
+
+DB_LONGEST_TRANSACTION = Gauge(
+    "db_longest_transaction_seconds",
+    "当前最长的未结束事务时长",
+    multiprocess_mode="livemax"
+)
+
+DB_STATEMENT_CALLS_RATE = Gauge(
+    "db_statement_calls_per_second",
+    "采样区间内的语句执行速率（pg_stat_statements）",
+    multiprocess_mode="livemax"
+)
+
+DB_STATEMENT_EXEC_RATE = Gauge(
+    "db_statement_exec_seconds_per_second",
+    "采样区间内每秒的语句执行耗时（pg_stat_statements）",
+    multiprocess_mode="livemax"
+)
+
+DB_STATEMENT_CACHE_HIT_RATIO = Gauge(
+    "db_statement_cache_hit_ratio",
+    "采样区间内共享缓冲区命中率（pg_stat_statements）",
+    multiprocess_mode="livemax"
+)
+
+DB_SAMPLER_RUNS = Counter(
+    "db_sampler_runs_total",
+    "数据库统计采样次数",
+    ["status"]
+)
+
+DB_SAMPLER_DURATION = Histogram(
+    "db_sampler_duration_seconds",
+    "单次数据库统计采样耗时",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+ACTIVITY_QUERY = """
+    SELECT count(*) AS total,
+           count(*) FILTER (WHERE state = 'active') AS active,
+           count(*) FILTER (WHERE state = 'idle') AS idle,
+           count(*) FILTER (WHERE state = 'idle in transaction') AS idle_in_transaction,
+           count(*) FILTER (WHERE wait_event_type = 'Lock') AS waiting_on_lock,
+           COALESCE(EXTRACT(EPOCH FROM max(now() - xact_start)), 0) AS longest_transaction_seconds
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_type = 'client backend'
+"""
+
+STATEMENTS_AVAILABLE_QUERY = """
+    SELECT count(*) FROM pg_extension WHERE extname = 'pg_stat_statements'
+"""
+
+# 当前数据库所有语句的累计值（用于计算区间增量）
+STATEMENT_TOTALS_QUERY = """
+    SELECT COALESCE(sum(calls), 0) AS calls,
+           COALESCE(sum(total_exec_time), 0) AS exec_ms,
+           COALESCE(sum(shared_blks_hit), 0) AS blks_hit,
+           COALESCE(sum(shared_blks_read), 0) AS blks_read
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+"""
+
+# 累计耗时最高的语句（查询文本已由 pg_stat_statements 参数化）
+TOP_STATEMENTS_QUERY = """
+    SELECT queryid, calls, total_exec_time AS exec_ms, rows, left(query, 200) AS query
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+    ORDER BY total_exec_time DESC
+    LIMIT $1
+"""
+
+ACTIVITY_STATES = ("total", "active", "idle", "idle_in_transaction", "waiting_on_lock")
+
+
+class DatabaseSampler:
+    """数据库统计采样器
+
+    每个采样周期只占用一个连接、执行至多三条只读统计查询；连接池在
+    interval 内无法检出连接时跳过本次采样，避免与业务请求争抢连接。
+    pg_stat_statements 的累计值与上一样本相减得到区间增量，
+    统计被重置（增量为负）时本次不计算速率。
+
+    pg_stat_activity 与 pg_stat_statements 是数据库级视图，各副本采样结果相同；
+    启用 DATABASE_SAMPLER_LEADER_ONLY 后只有每个服务的领导者副本执行统计查询，其余副本的样本只含本进程连接池状态。
+    """
+
+    _samples: Deque[Dict[str, Any]] = deque(maxlen=120)
+    _sample_task: Optional[asyncio.Task] = None
+    _statements_available: Optional[bool] = None
+    _previous_totals: Optional[Tuple[float, Dict[str, float]]] = None
+    _previous_calls: Dict[int, Tuple[int, float]] = {}
+    _election: Optional[LeaderElection] = None
+
+    @classmethod
+    async def sample(cls) -> Optional[Dict[str, Any]]:
+        """采集一个样本并写入环形缓冲区，连接池繁忙时返回None"""
+        if not Database.is_ready():
+            return None
+
+        settings = get_settings()
+        timeout = settings.DATABASE_SAMPLER_INTERVAL_SECONDS
+        start_time = time.perf_counter()
+
+        activity, statements = None, None
+        if cls._election is None or cls._election.is_leader:
+            try:
+                # 经容量控制器检出，计入连接池占用与排队统计
+                connection = await Database.get_connection(timeout=timeout)
+            except asyncio.TimeoutError:
+                DB_SAMPLER_RUNS.labels(status="skipped").inc()
+                return None
+
+            try:
+                activity = await connection.fetchrow(ACTIVITY_QUERY, timeout=timeout)
+                statements = await cls._sample_statements(
+                    connection, settings.DATABASE_SAMPLER_TOP_STATEMENTS, timeout
+                )
+            finally:
+                await Database.release_connection(connection)
+        else:
+            # 再次当选时从新样本开始计算增量
+            cls._previous_totals = None
+            cls._previous_calls = {}
+            cls._reset_gauges()
+
+        duration = time.perf_counter() - start_time
+        DB_SAMPLER_DURATION.observe(duration)
+
+        sample = {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "duration_ms": round(duration * 1000, 2),
+            "pools": [
+                {key: status[key] for key in ("name", "size", "idle", "in_use", "waiting", "limit")}
+                for status in Database.pool_status()
+            ],
+            "activity": None,
+            "longest_transaction_seconds": None,
+            "statements": statements,
+        }
+
+        if activity is not None:
+            sample["activity"] = {state: activity[state] for state in ACTIVITY_STATES}
+            sample["longest_transaction_seconds"] = float(activity["longest_transaction_seconds"])
+            for state in ACTIVITY_STATES:
+                DB_ACTIVITY_CONNECTIONS.labels(state=state).set(activity[state])
+            DB_LONGEST_TRANSACTION.set(sample["longest_transaction_seconds"])
+
+        cls._samples.append(sample)
+        DB_SAMPLER_RUNS.labels(status="ok").inc()
+        return sample
+
+    @staticmethod
+    def _reset_gauges() -> None:
+        """非领导者清零数据库级仪表，livemax 聚合只反映当前领导者的采样值"""
+        for state in ACTIVITY_STATES:
+            DB_ACTIVITY_CONNECTIONS.labels(state=state).set(0)
+        DB_LONGEST_TRANSACTION.set(0)
+        DB_STATEMENT_CALLS_RATE.set(0)
+        DB_STATEMENT_EXEC_RATE.set(0)
+        DB_STATEMENT_CACHE_HIT_RATIO.set(0)
+
+    @classmethod
+    async def _sample_statements(
+        cls, connection, top: int, timeout: float
+    ) -> Optional[Dict[str, Any]]:
+        """采样 pg_stat_statements，扩展未安装时返回None"""
+        if cls._statements_available is None:
+            cls._statements_available = bool(
+                await connection.fetchval(STATEMENTS_AVAILABLE_QUERY, timeout=timeout)
+            )
+        if not cls._statements_available:
+            return None
+
+        try:
+            totals_row = await connection.fetchrow(STATEMENT_TOTALS_QUERY, timeout=timeout)
+            top_rows = await connection.fetch(TOP_STATEMENTS_QUERY, top, timeout=timeout) if top else []
+        except (asyncpg.exceptions.UndefinedTableError, asyncpg.exceptions.ObjectNotInPrerequisiteStateError):
+            # 扩展已卸载或未在 shared_preload_libraries 中加载
+            cls._statements_available = False
+            return None
+
+        now = time.monotonic()
+        totals = {key: float(totals_row[key]) for key in ("calls", "exec_ms", "blks_hit", "blks_read")}
+        rates = cls._rates(now, totals)
+        cls._previous_totals = (now, totals)
+
+        top_statements = []
+        previous_calls = {}
+        for row in top_rows:
+            calls, exec_ms = row["calls"], row["exec_ms"]
+            previous_calls[row["queryid"]] = (calls, exec_ms)
+            delta_calls, delta_ms = None, None
+            previous = cls._previous_calls.get(row["queryid"])
+            if previous is not None and calls >= previous[0]:
+                delta_calls, delta_ms = calls - previous[0], exec_ms - previous[1]
+            top_statements.append({
+                "queryid": row["queryid"],
+                "query": row["query"],
+                "calls": calls,
+                "mean_ms": round(exec_ms / calls, 3) if calls else 0.0,
+                "rows": row["rows"],
+                "delta_calls": delta_calls,
+                "delta_mean_ms": round(delta_ms / delta_calls, 3) if delta_calls else None,
+            })
+        cls._previous_calls = previous_calls
+
+        return {"totals": totals, "rates": rates, "top": top_statements}
+
+    @classmethod
+    def _rates(cls, now: float, totals: Dict[str, float]) -> Optional[Dict[str, float]]:
+        """与上一样本相比的区间速率，首个样本或统计被重置时返回None"""
+        if cls._previous_totals is None:
+            return None
+        previous_at, previous = cls._previous_totals
+        elapsed = now - previous_at
+        deltas = {key: totals[key] - previous[key] for key in totals}
+        if elapsed <= 0 or any(delta < 0 for delta in deltas.values()):
+            return None
+
+        blocks = deltas["blks_hit"] + deltas["blks_read"]
+        rates = {
+            "calls_per_second": deltas["calls"] / elapsed,
+            "exec_seconds_per_second": deltas["exec_ms"] / 1000 / elapsed,
+            "cache_hit_ratio": deltas["blks_hit"] / blocks if blocks else 1.0,
+        }
+        DB_STATEMENT_CALLS_RATE.set(rates["calls_per_second"])
+        DB_STATEMENT_EXEC_RATE.set(rates["exec_seconds_per_second"])
+        DB_STATEMENT_CACHE_HIT_RATIO.set(rates["cache_hit_ratio"])
+        return rates
+
+    @classmethod
+    def snapshot(cls, limit: int = 20) -> Dict[str, Any]:
+        """/debug/db 快照：连接池实时状态与最近的样本"""
+        samples = list(cls._samples)[-limit:] if limit > 0 else []
+        return {
+            "ready": Database.is_ready(),
+            "pools": Database.pool_status(),
+            "replicas": Database.replica_status(),
+            "sampler": {
+                "running": cls._sample_task is not None and not cls._sample_task.done(),
+                "interval_seconds": get_settings().DATABASE_SAMPLER_INTERVAL_SECONDS,
+                "buffered_samples": len(cls._samples),
+                "pg_stat_statements": cls._statements_available,
+                "leader": cls._election.is_leader if cls._election else None,
+            },
+            "samples": samples,
+        }
+
+    @classmethod
+    async def start(cls, service: Optional[str] = None):
+        """启动采样任务（需在Redis连接之后调用，service用于区分各服务的选举）"""
+        settings = get_settings()
+        if not settings.DATABASE_SAMPLER_ENABLED:
+            return
+        if settings.DATABASE_SAMPLER_LEADER_ONLY and service and cls._election is None:
+            cls._election = LeaderElection(
+                f"{service}:db-sampler", ttl=settings.LEADER_ELECTION_TTL_SECONDS
+            )
+            await cls._election.start()
+        if cls._samples.maxlen != settings.DATABASE_SAMPLER_BUFFER_SIZE:
+            cls._samples = deque(cls._samples, maxlen=settings.DATABASE_SAMPLER_BUFFER_SIZE)
+        if cls._sample_task is None or cls._sample_task.done():
+            cls._sample_task = asyncio.create_task(cls._sample_loop())
+            logger.info("数据库统计采样已启动", interval=settings.DATABASE_SAMPLER_INTERVAL_SECONDS)
+
+    @classmethod
+    async def stop(cls):
+        """停止采样任务"""
+        if cls._sample_task:
+            cls._sample_task.cancel()
+            try:
+                await cls._sample_task
+            except asyncio.CancelledError:
+                pass
+            cls._sample_task = None
+        if cls._election:
+            await cls._election.stop()
+            cls._election = None
+
+    @classmethod
+    async def _sample_loop(cls):
+        """周期性采样"""
+        interval = get_settings().DATABASE_SAMPLER_INTERVAL_SECONDS
+        while True:
+            try:
+                await cls.sample()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                DB_SAMPLER_RUNS.labels(status="error").inc()
+                logger.warning("数据库统计采样失败", error=str(e))
+            await asyncio.sleep(interval)
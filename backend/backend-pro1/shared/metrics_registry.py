@@ -0,0 +1,118 @@
+"""
+Prometheus指标导出模块
+支持gunicorn/uvicorn多worker部署下基于mmap文件的多进程指标聚合
+"""
+
+import glob
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.mmap_dict import MmapedDict
+import structlog
+
+logger = structlog.get_logger()
+
+# 多进程模式目录（必须在导入prometheus_client之前通过环境变量设置）
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# 可在worker退出后合并的累加型指标文件类型
+_ACCUMULATING_TYPES = ("counter", "histogram", "summary")
+
+
+def get_multiprocess_dir() -> Optional[str]:
+    """获取多进程指标目录，未启用时返回None"""
+    path = os.environ.get(MULTIPROC_DIR_ENV)
+    return path if path and os.path.isdir(path) else None
+
+
+def is_multiprocess_mode() -> bool:
+    """是否启用多进程指标模式"""
+    return get_multiprocess_dir() is not None
+
+
+def collect_latest() -> bytes:
+    """生成当前服务的指标文本（多进程模式下聚合所有worker）"""
+    if not is_multiprocess_mode():
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def metrics_response() -> Response:
+    """/metrics 端点响应"""
+    return Response(collect_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def cleanup_multiprocess_dir(path: Optional[str] = None) -> int:
+    """清理上次运行遗留的指标文件（仅在主进程启动、worker派生之前调用）"""
+    path = path or get_multiprocess_dir()
+    if not path:
+        return 0
+
+    removed = 0
+    for filename in glob.glob(os.path.join(path, "*.db")):
+        os.remove(filename)
+        removed += 1
+
+    logger.info("多进程指标目录已清理", path=path, removed=removed)
+    return removed
+
+
+def mark_worker_dead(pid: int, path: Optional[str] = None) -> None:
+    """worker退出时调用：删除其live*仪表文件，并将累加型指标文件合并到归档文件"""
+    path = path or get_multiprocess_dir()
+    if not path:
+        return
+
+    multiprocess.mark_process_dead(pid, path)
+    compact_worker_files([pid], path)
+
+
+def compact_worker_files(pids: Iterable[int], path: str) -> int:
+    """将已退出worker的计数器/直方图/摘要文件累加进 <类型>_archive.db
+
+    worker频繁重启（如 max_requests 回收）时，按pid分散的文件会持续增多，
+    拖慢每次抓取时的文件遍历与合并；归档后文件数与历史worker数量无关。
+    """
+    pid_suffixes = {f"_{pid}.db" for pid in pids}
+    compacted = 0
+
+    for typ in _ACCUMULATING_TYPES:
+        files = [
+            filename
+            for filename in glob.glob(os.path.join(path, f"{typ}_*.db"))
+            if any(filename.endswith(suffix) for suffix in pid_suffixes)
+        ]
+        if not files:
+            continue
+
+        totals: Dict[str, float] = defaultdict(float)
+        for filename in files:
+            for key, value, _timestamp, _pos in MmapedDict.read_all_values_from_file(filename):
+                totals[key] += value
+
+        archive = MmapedDict(os.path.join(path, f"{typ}_archive.db"))
+        try:
+            for key, value in totals.items():
+                current, _timestamp = archive.read_value(key)
+                archive.write_value(key, current + value, 0.0)
+        finally:
+            archive.close()
+
+        # 先写归档再删除，并发抓取最多短暂重复计数一次，不会丢失数据
+        for filename in files:
+            os.remove(filename)
+        compacted += len(files)
+
+    return compacted
@@ -3,10 +3,11 @@
 收集API请求的性能指标
 """
 
+import re
 import time
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Set
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from prometheus_client import Counter, Histogram, Gauge
 import structlog
 
@@ -28,33 +29,63 @@ REQUEST_DURATION = Histogram(
 ACTIVE_REQUESTS = Gauge(
     "http_active_requests",
     "当前活跃请求数",
+    ["project_id"],
+    multiprocess_mode="livesum"
+)
+
+ENDPOINT_LABEL_OVERFLOW = Counter(
+    "http_endpoint_label_overflow_total",
+    "超出端点标签上限而归入other的请求数",
     ["project_id"]
 )
 
+# 未匹配路由（如扫描流量）及超出标签上限的端点统一归入该标签
+OTHER_ENDPOINT = "other"
+
+# 非FastAPI路由的路径参数归一化（预编译）
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+_UUID_SEGMENT = re.compile(
+    r"/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(?=/|$)"
+)
+
 
-class MetricsMiddleware(BaseHTTPMiddleware):
-    """指标收集中间件"""
+class MetricsMiddleware:
+    """指标收集中间件（纯ASGI实现）"""
     
-    def __init__(self, app, project_id: str = "unknown"):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, project_id: str = "unknown", max_endpoints: int = 200):
+        self.app = app
         self.project_id = project_id
+        self.max_endpoints = max_endpoints
+        self._endpoints: Set[str] = set()
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request = Request(scope)
+        
         # 记录开始时间
         start_time = time.time()
+        status_code = 500
+        
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
         
         # 增加活跃请求计数
         ACTIVE_REQUESTS.labels(project_id=self.project_id).inc()
         
         try:
             # 调用下一个中间件或路由处理器
-            response: Response = await call_next(request)
+            await self.app(scope, receive, send_wrapper)
             
             # 记录指标
             duration = time.time() - start_time
             method = request.method
-            endpoint = self._get_endpoint_name(request)
-            status_code = response.status_code
+            endpoint = self._get_endpoint_name(scope)
             
             REQUEST_COUNT.labels(
                 method=method,
@@ -80,13 +111,11 @@ class MetricsMiddleware(BaseHTTPMiddleware):
                     request_id=getattr(request.state, "request_id", None)
                 )
             
-            return response
-            
         except Exception as e:
             # 记录错误指标
             REQUEST_COUNT.labels(
                 method=request.method,
-                endpoint=self._get_endpoint_name(request),
+                endpoint=self._get_endpoint_name(scope),
                 status_code=500,
                 project_id=self.project_id
             ).inc()
@@ -105,18 +134,31 @@ class MetricsMiddleware(BaseHTTPMiddleware):
             # 减少活跃请求计数
             ACTIVE_REQUESTS.labels(project_id=self.project_id).dec()
     
-    def _get_endpoint_name(self, request: Request) -> str:
-        """获取端点名称"""
-        # 尝试获取路由名称
-        if hasattr(request.scope, "route") and hasattr(request.scope["route"], "name"):
-            return request.scope["route"].name
+    def _get_endpoint_name(self, scope: Scope) -> str:
+        """获取端点名称（需在路由匹配之后调用）"""
+        # 使用路由匹配后写入scope的路由模板
+        route = scope.get("route")
+        path = getattr(route, "path_format", None) or getattr(route, "path", None)
         
-        # 简化路径（替换路径参数）
-        path = request.url.path
+        if path is None:
+            if "endpoint" not in scope:
+                # 未匹配任何路由
+                return OTHER_ENDPOINT
+            
+            # 非FastAPI路由：简化路径（替换路径参数）
+            path = _NUMERIC_SEGMENT.sub("/{id}", scope["path"])
+            path = _UUID_SEGMENT.sub("/{uuid}", path)
+        
+        return self._guard_cardinality(path)
+    
+    def _guard_cardinality(self, endpoint: str) -> str:
+        """限制端点标签数量，超出上限的新端点归入other"""
+        if endpoint in self._endpoints:
+            return endpoint
         
-        # 常见的路径参数替换
-        import re
-        path = re.sub(r'/\d+', '/{id}', path)
-        path = re.sub(r'/[a-f0-9-]{36}', '/{uuid}', path)  # UUID
+        if len(self._endpoints) >= self.max_endpoints:
+            ENDPOINT_LABEL_OVERFLOW.labels(project_id=self.project_id).inc()
+            return OTHER_ENDPOINT
         
-        return path
\ No newline at end of file
+        self._endpoints.add(endpoint)
+        return endpoint
@@ -1,61 +1,214 @@
 """
 限流中间件
-基于Redis的分布式限流
+基于Redis Lua脚本的分布式限流，支持令牌桶和滑动窗口日志两种算法，
+按路由、方法和用户套餐解析限流策略
 """
 
 import time
-from typing import Optional
-from starlette.middleware.base import BaseHTTPMiddleware
+import uuid
+from contextlib import nullcontext
+from typing import List, Optional, Sequence
+from redis.exceptions import NoScriptError
+from starlette.datastructures import MutableHeaders
 from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import structlog
 
+from ..auth import verify_token
+from ..circuit_breaker import CircuitOpenError
+from ..token_revocation import TokenRevocationList
+from .rate_limit_lease import QuotaLeaseManager
+from .rate_limit_policy import (
+    DEFAULT_PLAN,
+    RateLimitPolicy,
+    RateLimitPolicyTable,
+    RateLimitRule,
+)
+
 logger = structlog.get_logger()
 
+# 令牌桶算法：按时间线性补充令牌，容量即窗口内允许的请求数
+# KEYS[1]=桶键  ARGV: 容量, 窗口毫秒, 申请令牌数, 是否允许部分授予
+# 返回: {授予令牌数(0表示拒绝), 剩余令牌数, 重置时间戳(秒)}
+TOKEN_BUCKET_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local capacity = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local partial = tonumber(ARGV[4]) == 1
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rate = capacity / window_ms
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local granted = 0
+if tokens >= cost then
+    granted = cost
+elseif partial and tokens >= 1 then
+    granted = math.floor(tokens)
+end
+
+local wait_ms
+if granted > 0 then
+    tokens = tokens - granted
+    wait_ms = (capacity - tokens) / rate
+elseif partial then
+    wait_ms = (1 - tokens) / rate
+else
+    wait_ms = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], window_ms)
+return {granted, math.floor(tokens), math.ceil((now + wait_ms) / 1000)}
+"""
+
+# 滑动窗口日志算法：记录窗口内每次请求的时间戳
+# KEYS[1]=有序集合键  ARGV: 限额, 窗口毫秒, 申请次数, 是否允许部分授予, 成员唯一前缀
+# 返回: {授予次数(0表示拒绝), 剩余次数, 重置时间戳(秒)}
+SLIDING_WINDOW_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local partial = tonumber(ARGV[4]) == 1
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window_ms)
+local count = redis.call('ZCARD', KEYS[1])
+
+local granted = 0
+if count + cost <= limit then
+    granted = cost
+elseif partial and count < limit then
+    granted = limit - count
+end
+for i = 1, granted do
+    redis.call('ZADD', KEYS[1], now, ARGV[5] .. ':' .. i)
+end
+count = count + granted
+redis.call('PEXPIRE', KEYS[1], window_ms)
+
+local reset_ms = now + window_ms
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset_ms = tonumber(oldest[2]) + window_ms
+end
+return {granted, math.max(0, limit - count), math.ceil(reset_ms / 1000)}
+"""
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """限流中间件"""
+
+class RateLimitScript:
+    """通过SCRIPT LOAD/EVALSHA执行的限流Lua脚本"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha: Optional[str] = None
+
+    async def __call__(self, client, keys: List[str], args: List) -> List[int]:
+        if self.sha is None:
+            self.sha = await client.script_load(self.source)
+
+        try:
+            return await client.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            # Redis重启或执行过SCRIPT FLUSH后需要重新加载
+            self.sha = await client.script_load(self.source)
+            return await client.evalsha(self.sha, len(keys), *keys, *args)
+
+
+RATE_LIMIT_SCRIPTS = {
+    "token_bucket": RateLimitScript(TOKEN_BUCKET_SCRIPT),
+    "sliding_window": RateLimitScript(SLIDING_WINDOW_SCRIPT),
+}
+
+
+class RateLimitMiddleware:
+    """限流中间件（纯ASGI实现）"""
     
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         redis_url: str,
         default_rate_limit: int = 100,  # 每分钟请求数
         window_size: int = 60,  # 时间窗口（秒）
+        algorithm: str = "token_bucket",  # token_bucket 或 sliding_window
+        rules: Sequence[RateLimitRule] = (),  # 按路由/方法/套餐声明的限流规则
+        lease_size: int = 0,  # 每次从Redis租借的配额数，0表示不启用租约模式
+        lease_ttl: float = 1.0,  # 租约有效期（秒）
+        lease_max_overdraft: int = 0,  # 续租期间允许透支放行的请求数（精度上界）
     ):
-        super().__init__(app)
+        self.app = app
+        default_policy = RateLimitPolicy(
+            name="default",
+            limit=default_rate_limit,
+            window=window_size,
+            algorithm=algorithm,
+        )
+        for policy in [default_policy] + [r.policy for r in rules if r.policy]:
+            if policy.algorithm not in RATE_LIMIT_SCRIPTS:
+                raise ValueError(f"不支持的限流算法: {policy.algorithm}")
+        
         self.redis_url = redis_url
-        self.default_rate_limit = default_rate_limit
-        self.window_size = window_size
+        self.policies = RateLimitPolicyTable(rules, default_policy)
         self._redis_client = None
+        self._circuit = None
+        self._leases: Optional[QuotaLeaseManager] = None
+        if lease_size > 0:
+            self._leases = QuotaLeaseManager(lease_size, lease_ttl, lease_max_overdraft)
     
     async def _get_redis_client(self):
         """获取Redis客户端"""
         if self._redis_client is None:
             from ..redis_client import RedisClient
-            # 使用全局Redis客户端
+            # 使用全局Redis客户端及其熔断器
             self._redis_client = RedisClient._client
+            self._circuit = RedisClient._circuit
         return self._redis_client
     
-    async def dispatch(self, request: Request, call_next):
-        # 获取客户端标识
-        client_id = self._get_client_id(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request = Request(scope, receive)
+        
+        # 获取客户端标识和套餐
+        client_id, plan = self._get_client_identity(request)
+        
+        # 解析适用的限流策略
+        resolved = self.policies.resolve(request.method, request.url.path, plan)
+        if resolved.exempt:
+            await self.app(scope, receive, send)
+            return
+        policy = resolved.policy
         
         # 检查限流
         is_allowed, remaining_requests, reset_time = await self._check_rate_limit(
-            client_id, request
+            client_id, policy
         )
         
         if not is_allowed:
             logger.warning(
                 "请求被限流",
                 client_id=client_id,
+                policy=policy.name,
                 path=str(request.url),
                 method=request.method,
                 request_id=getattr(request.state, "request_id", None)
             )
             
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=429,
                 content={
                     "success": False,
@@ -69,29 +222,47 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                     }
                 },
                 headers={
-                    "X-RateLimit-Limit": str(self.default_rate_limit),
+                    "X-RateLimit-Limit": str(policy.limit),
                     "X-RateLimit-Remaining": "0",
                     "X-RateLimit-Reset": str(reset_time),
-                    "Retry-After": str(int(reset_time - time.time()))
+                    "X-RateLimit-Policy": policy.name,
+                    "Retry-After": str(max(1, int(reset_time - time.time())))
                 }
             )
+            await response(scope, receive, send)
+            return
+        
+        async def send_wrapper(message: Message):
+            # 在响应头中添加限流信息
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(policy.limit)
+                headers["X-RateLimit-Remaining"] = str(remaining_requests)
+                headers["X-RateLimit-Reset"] = str(reset_time)
+                headers["X-RateLimit-Policy"] = policy.name
+            await send(message)
         
         # 处理请求
-        response = await call_next(request)
+        await self.app(scope, receive, send_wrapper)
+    
+    def _get_client_identity(self, request: Request) -> tuple[str, str]:
+        """获取客户端标识和用户套餐"""
+        # 优先使用认证用户ID
+        if hasattr(request.state, "user_id"):
+            return f"user:{request.state.user_id}", DEFAULT_PLAN
         
-        # 在响应头中添加限流信息
-        response.headers["X-RateLimit-Limit"] = str(self.default_rate_limit)
-        response.headers["X-RateLimit-Remaining"] = str(remaining_requests)
-        response.headers["X-RateLimit-Reset"] = str(reset_time)
+        # 限流在认证依赖之前执行，直接从JWT中提取用户（签名校验命中令牌缓存，不查库）；
+        # 已登出（布隆过滤器可能命中）的令牌不再计入其用户与套餐，按IP限流
+        authorization = request.headers.get("Authorization")
+        if authorization and authorization[:7].lower() == "bearer ":
+            payload = verify_token(authorization[7:].strip())
+            if payload and payload.get("sub") and not TokenRevocationList.might_be_revoked(payload):
+                return f"user:{payload['sub']}", payload.get("plan") or DEFAULT_PLAN
         
-        return response
+        return self._get_client_id(request), DEFAULT_PLAN
     
     def _get_client_id(self, request: Request) -> str:
         """获取客户端标识"""
-        # 优先使用认证用户ID
-        if hasattr(request.state, "user_id"):
-            return f"user:{request.state.user_id}"
-        
         # 使用IP地址
         client_ip = request.client.host if request.client else "unknown"
         
@@ -109,7 +280,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     async def _check_rate_limit(
         self, 
         client_id: str, 
-        request: Request
+        policy: RateLimitPolicy
     ) -> tuple[bool, int, int]:
         """检查限流状态"""
         try:
@@ -117,34 +288,28 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             if not redis_client:
                 # Redis不可用时跳过限流
                 logger.warning("Redis不可用，跳过限流检查")
-                return True, self.default_rate_limit, int(time.time()) + self.window_size
-            
-            current_time = int(time.time())
-            window_start = current_time - (current_time % self.window_size)
+                return True, policy.limit, int(time.time()) + policy.window
             
             # 限流键
-            rate_limit_key = f"rate_limit:{client_id}:{window_start}"
-            
-            # 获取当前请求计数
-            current_count = await redis_client.get(rate_limit_key, deserialize_json=False)
-            current_count = int(current_count) if current_count else 0
-            
-            # 检查是否超过限制
-            if current_count >= self.default_rate_limit:
-                reset_time = window_start + self.window_size
-                return False, 0, reset_time
-            
-            # 增加计数
-            pipe = redis_client.pipeline()
-            pipe.incr(rate_limit_key)
-            pipe.expire(rate_limit_key, self.window_size)
-            await pipe.execute()
+            rate_limit_key = f"rate_limit:{policy.algorithm}:{policy.name}:{client_id}"
             
-            remaining_requests = max(0, self.default_rate_limit - current_count - 1)
-            reset_time = window_start + self.window_size
+            if self._leases is not None:
+                # 租约模式：优先消耗本地租借的配额
+                async def fetch(requested: int):
+                    return await self._consume(
+                        redis_client, rate_limit_key, policy, requested, partial=True
+                    )
+                
+                return await self._leases.acquire(rate_limit_key, fetch)
             
-            return True, remaining_requests, reset_time
+            granted, remaining_requests, reset_time = await self._consume(
+                redis_client, rate_limit_key, policy, 1
+            )
+            return granted > 0, remaining_requests, reset_time
             
+        except CircuitOpenError:
+            # Redis已熔断：不等待超时，直接放行
+            return True, policy.limit, int(time.time()) + policy.window
         except Exception as e:
             logger.error(
                 "限流检查失败，允许请求通过",
@@ -153,4 +318,23 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 exc_info=True
             )
             # 发生错误时允许请求通过
-            return True, self.default_rate_limit, int(time.time()) + self.window_size
\ No newline at end of file
+            return True, policy.limit, int(time.time()) + policy.window
+    
+    async def _consume(
+        self,
+        redis_client,
+        rate_limit_key: str,
+        policy: RateLimitPolicy,
+        cost: int,
+        partial: bool = False
+    ) -> tuple[int, int, int]:
+        """单次往返内原子完成检查与扣减，返回 (授予配额数, 剩余配额, 重置时间戳)"""
+        args = [policy.limit, policy.window * 1000, cost, int(partial)]
+        if policy.algorithm == "sliding_window":
+            args.append(uuid.uuid4().hex)
+        
+        with self._circuit or nullcontext():
+            granted, remaining, reset_time = await RATE_LIMIT_SCRIPTS[policy.algorithm](
+                redis_client, [rate_limit_key], args
+            )
+        return int(granted), int(remaining), int(reset_time)
@@ -0,0 +1,203 @@
+"""
+限流配额租约模块
+每个worker一次从Redis租借一批配额并在本地内存中消耗，
+仅在租约耗尽或过期时才回到Redis续租
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter
+import structlog
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义
+RATE_LIMIT_LEASE_REQUESTS = Counter(
+    "rate_limit_lease_requests_total",
+    "租约模式下的限流判定次数",
+    ["result"]
+)
+
+RATE_LIMIT_LEASE_RENEWALS = Counter(
+    "rate_limit_lease_renewals_total",
+    "向Redis续租配额的次数",
+    ["mode"]
+)
+
+RATE_LIMIT_LEASE_OVERADMITTED = Counter(
+    "rate_limit_lease_overadmitted_total",
+    "透支放行但续租时未能获得配额补偿的请求数（超额放行）"
+)
+
+RATE_LIMIT_LEASE_STRANDED = Counter(
+    "rate_limit_lease_stranded_tokens_total",
+    "租约过期或被淘汰时未使用的配额数"
+)
+
+# 续租回调：参数为申请的配额数，返回 (获得配额数, Redis剩余配额, 重置时间戳)
+LeaseFetcher = Callable[[int], Awaitable[Tuple[int, int, int]]]
+RateLimitResult = Tuple[bool, int, int]
+
+
+@dataclass
+class QuotaLease:
+    """单个客户端的本地配额租约"""
+
+    tokens: int = 0
+    overdraft: int = 0
+    expires_at: float = 0.0
+    remote_remaining: int = 0
+    reset_time: int = 0
+    exhausted: bool = False
+
+    def is_expired(self, now: float) -> bool:
+        return self.expires_at <= now
+
+
+class QuotaLeaseManager:
+    """本地配额租约管理器
+
+    精度上界：每个worker对每个客户端最多超额放行 max_overdraft 个请求
+    （租约耗尽后在后台续租期间透支放行），最多滞留 lease_size 个未使用配额。
+    max_overdraft 为0时严格不超额，租约耗尽的请求会同步等待续租。
+    """
+
+    def __init__(
+        self,
+        lease_size: int,
+        lease_ttl: float,
+        max_overdraft: int = 0,
+        max_clients: int = 10000,
+    ):
+        self.lease_size = max(1, lease_size)
+        self.lease_ttl = lease_ttl
+        self.max_overdraft = max(0, max_overdraft)
+        self.max_clients = max_clients
+        self._leases: "OrderedDict[str, QuotaLease]" = OrderedDict()
+        self._renewals: Dict[str, asyncio.Task] = {}
+
+    async def acquire(self, key: str, fetch: LeaseFetcher) -> RateLimitResult:
+        """消耗一个配额，返回 (是否允许, 剩余配额估计, 重置时间戳)"""
+        lease = self._leases.get(key)
+        if lease is not None:
+            result = self._consume(key, lease, fetch)
+            if result is not None:
+                return result
+
+            # 上次续租已无配额，租约有效期内直接在本地拒绝
+            if lease.exhausted and not lease.is_expired(time.monotonic()):
+                RATE_LIMIT_LEASE_REQUESTS.labels(result="denied").inc()
+                return False, 0, lease.reset_time
+
+        while True:
+            lease = await self._renew(key, fetch, mode="sync")
+            result = self._consume(key, lease, fetch, allow_overdraft=False)
+            if result is not None:
+                return result
+
+            # 续租得到的配额已被并发请求耗尽时再次续租，直到Redis也无配额
+            if lease.exhausted:
+                RATE_LIMIT_LEASE_REQUESTS.labels(result="denied").inc()
+                return False, 0, lease.reset_time
+
+    def _consume(
+        self,
+        key: str,
+        lease: QuotaLease,
+        fetch: LeaseFetcher,
+        allow_overdraft: bool = True,
+    ) -> Optional[RateLimitResult]:
+        """尝试从本地租约中消耗配额"""
+        if lease.is_expired(time.monotonic()):
+            if lease.tokens:
+                RATE_LIMIT_LEASE_STRANDED.inc(lease.tokens)
+                lease.tokens = 0
+            return None
+
+        self._leases.move_to_end(key)
+
+        if lease.tokens > 0:
+            lease.tokens -= 1
+            RATE_LIMIT_LEASE_REQUESTS.labels(result="local").inc()
+            # 租约耗尽前在后台预取下一批配额
+            if lease.tokens == 0 and self.max_overdraft:
+                self._renew_in_background(key, fetch)
+            return True, lease.remote_remaining + lease.tokens, lease.reset_time
+
+        if allow_overdraft and not lease.exhausted and lease.overdraft < self.max_overdraft:
+            lease.overdraft += 1
+            RATE_LIMIT_LEASE_REQUESTS.labels(result="overdraft").inc()
+            self._renew_in_background(key, fetch)
+            return True, 0, lease.reset_time
+
+        return None
+
+    def _renew_in_background(self, key: str, fetch: LeaseFetcher) -> None:
+        """后台续租（不阻塞当前请求）"""
+        if key not in self._renewals:
+            self._start_renewal(key, fetch, mode="background")
+
+    def _start_renewal(self, key: str, fetch: LeaseFetcher, mode: str) -> asyncio.Task:
+        task = asyncio.create_task(self._do_renew(key, fetch, mode))
+        self._renewals[key] = task
+        task.add_done_callback(lambda _: self._renewals.pop(key, None))
+        return task
+
+    async def _renew(self, key: str, fetch: LeaseFetcher, mode: str) -> QuotaLease:
+        """同步续租，同一客户端的并发续租合并为一次Redis调用"""
+        task = self._renewals.get(key)
+        if task is None:
+            task = self._start_renewal(key, fetch, mode)
+        return await asyncio.shield(task)
+
+    async def _do_renew(self, key: str, fetch: LeaseFetcher, mode: str) -> QuotaLease:
+        lease = self._leases.get(key)
+        if lease is None:
+            lease = QuotaLease()
+
+        RATE_LIMIT_LEASE_RENEWALS.labels(mode=mode).inc()
+        # 申请量包含已透支部分，获得的配额优先用于抵扣透支
+        requested = self.lease_size + lease.overdraft
+        try:
+            granted, remote_remaining, reset_time = await fetch(requested)
+        except Exception as e:
+            if mode == "background":
+                logger.warning("限流配额后台续租失败", key=key, error=str(e))
+                return lease
+            raise
+
+        now = time.monotonic()
+        if lease.is_expired(now) and lease.tokens:
+            RATE_LIMIT_LEASE_STRANDED.inc(lease.tokens)
+            lease.tokens = 0
+
+        # 续租期间可能产生新的透支，按当前透支量抵扣
+        covered = min(granted, lease.overdraft)
+        lease.overdraft -= covered
+        lease.tokens += granted - covered
+        lease.exhausted = lease.tokens == 0
+
+        # Redis已无法足额授予时，剩余透支再无补偿机会，计为超额放行
+        if lease.overdraft and granted < requested:
+            RATE_LIMIT_LEASE_OVERADMITTED.inc(lease.overdraft)
+            lease.overdraft = 0
+
+        lease.expires_at = now + self.lease_ttl
+        lease.remote_remaining = remote_remaining
+        lease.reset_time = reset_time
+
+        self._store(key, lease)
+        return lease
+
+    def _store(self, key: str, lease: QuotaLease) -> None:
+        """保存租约，超出容量时淘汰最久未使用的客户端"""
+        self._leases[key] = lease
+        self._leases.move_to_end(key)
+        while len(self._leases) > self.max_clients:
+            _, evicted = self._leases.popitem(last=False)
+            if evicted.tokens:
+                RATE_LIMIT_LEASE_STRANDED.inc(evicted.tokens)
@@ -0,0 +1,146 @@
+"""
+限流策略模块
+按路由模式、HTTP方法和用户套餐声明限流策略，启动时预编译为查找表
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence
+
+# 未携带套餐声明的请求（含匿名请求）使用的默认套餐
+DEFAULT_PLAN = "free"
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """限流策略"""
+
+    name: str
+    limit: int  # 窗口内允许的请求数
+    window: int = 60  # 时间窗口（秒）
+    algorithm: str = "token_bucket"  # token_bucket 或 sliding_window
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """限流规则
+
+    pattern 按路径段匹配：字面量段精确匹配，{param} 匹配任意单段，
+    末尾的 * 匹配零个或多个剩余段。policy 为 None 表示豁免限流。
+    methods/plans 为 None 表示不限。
+    """
+
+    pattern: str
+    policy: Optional[RateLimitPolicy]
+    methods: Optional[FrozenSet[str]] = None
+    plans: Optional[FrozenSet[str]] = None
+
+    def applies_to(self, method: str, plan: str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        if self.plans is not None and plan not in self.plans:
+            return False
+        return True
+
+
+def rule(
+    pattern: str,
+    policy: Optional[RateLimitPolicy],
+    methods: Optional[Iterable[str]] = None,
+    plans: Optional[Iterable[str]] = None,
+) -> RateLimitRule:
+    """构造限流规则"""
+    return RateLimitRule(
+        pattern=pattern,
+        policy=policy,
+        methods=frozenset(m.upper() for m in methods) if methods else None,
+        plans=frozenset(plans) if plans else None,
+    )
+
+
+def _split_path(path: str) -> List[str]:
+    return [segment for segment in path.split("/") if segment]
+
+
+@dataclass
+class _TrieNode:
+    literals: Dict[str, "_TrieNode"] = field(default_factory=dict)
+    param: Optional["_TrieNode"] = None
+    rules: List[RateLimitRule] = field(default_factory=list)
+    wildcard_rules: List[RateLimitRule] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class ResolvedPolicy:
+    """策略解析结果"""
+
+    policy: Optional[RateLimitPolicy]
+    pattern: Optional[str]
+
+    @property
+    def exempt(self) -> bool:
+        return self.policy is None
+
+
+class RateLimitPolicyTable:
+    """预编译的路由-策略查找表
+
+    无参数的模式编入精确路径字典（O(1)查找），其余编入路径段前缀树，
+    请求时按段遍历而不执行正则。匹配优先级：字面量段 > {param} > *，
+    同一模式下按声明顺序取第一条适用的规则，均不适用时回退到默认策略。
+    """
+
+    def __init__(self, rules: Sequence[RateLimitRule], default_policy: RateLimitPolicy):
+        self.default = ResolvedPolicy(policy=default_policy, pattern=None)
+        self._exact: Dict[str, List[RateLimitRule]] = {}
+        self._root = _TrieNode()
+
+        for item in rules:
+            segments = _split_path(item.pattern)
+            if not any(s == "*" or s.startswith("{") for s in segments):
+                self._exact.setdefault("/" + "/".join(segments), []).append(item)
+                continue
+
+            node = self._root
+            for index, segment in enumerate(segments):
+                if segment == "*":
+                    if index != len(segments) - 1:
+                        raise ValueError(f"通配符 * 只能出现在模式末尾: {item.pattern}")
+                    node.wildcard_rules.append(item)
+                    break
+                if segment.startswith("{") and segment.endswith("}"):
+                    if node.param is None:
+                        node.param = _TrieNode()
+                    node = node.param
+                else:
+                    node = node.literals.setdefault(segment, _TrieNode())
+            else:
+                node.rules.append(item)
+
+    def resolve(self, method: str, path: str, plan: str = DEFAULT_PLAN) -> ResolvedPolicy:
+        """解析请求适用的限流策略"""
+        segments = _split_path(path)
+        normalized = "/" + "/".join(segments)
+
+        for item in self._exact.get(normalized, ()):
+            if item.applies_to(method, plan):
+                return ResolvedPolicy(policy=item.policy, pattern=item.pattern)
+
+        for item in self._candidates(self._root, segments, 0):
+            if item.applies_to(method, plan):
+                return ResolvedPolicy(policy=item.policy, pattern=item.pattern)
+
+        return self.default
+
+    def _candidates(
+        self, node: _TrieNode, segments: List[str], index: int
+    ) -> Iterator[RateLimitRule]:
+        """按优先级产出匹配路径的规则"""
+        if index == len(segments):
+            yield from node.rules
+        else:
+            child = node.literals.get(segments[index])
+            if child is not None:
+                yield from self._candidates(child, segments, index + 1)
+            if node.param is not None:
+                yield from self._candidates(node.param, segments, index + 1)
+        yield from node.wildcard_rules
@@ -4,25 +4,34 @@
 """
 
 import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """请求ID中间件"""
+class RequestIDMiddleware:
+    """请求ID中间件（纯ASGI实现）"""
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         # 生成或获取请求ID
-        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
+        request_id = Headers(scope=scope).get("X-Request-ID")
+        if request_id is None:
+            request_id = str(uuid.uuid4())
         
         # 将请求ID存储在request state中
-        request.state.request_id = request_id
+        scope.setdefault("state", {})["request_id"] = request_id
         
-        # 调用下一个中间件或路由处理器
-        response: Response = await call_next(request)
+        async def send_wrapper(message: Message):
+            # 在响应头中添加请求ID
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
         
-        # 在响应头中添加请求ID
-        response.headers["X-Request-ID"] = request_id
-        
-        return response
\ No newline at end of file
+        # 调用下一个中间件或路由处理器
+        await self.app(scope, receive, send_wrapper)
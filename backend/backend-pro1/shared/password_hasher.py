@@ -0,0 +1,139 @@
+"""
+密码哈希执行器模块
+在独立的有界线程池中执行bcrypt运算，避免阻塞事件循环
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from fastapi import HTTPException, status
+from prometheus_client import Counter, Gauge, Histogram
+import structlog
+
+from .config import get_settings
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Prometheus指标定义
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "等待执行的密码哈希任务数",
+    multiprocess_mode="livesum"
+)
+
+PASSWORD_HASH_IN_PROGRESS = Gauge(
+    "password_hash_in_progress",
+    "正在执行的密码哈希任务数",
+    multiprocess_mode="livesum"
+)
+
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "因队列饱和被拒绝的密码哈希任务数",
+    ["operation"]
+)
+
+PASSWORD_HASH_WAIT = Histogram(
+    "password_hash_wait_seconds",
+    "密码哈希任务排队等待时间",
+    ["operation"]
+)
+
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "密码哈希任务执行时间",
+    ["operation"]
+)
+
+
+class PasswordHasher:
+    """密码哈希执行器
+
+    并发上限为 PASSWORD_HASH_MAX_WORKERS，排队任务超过
+    PASSWORD_HASH_MAX_QUEUE 时直接返回503，防止登录风暴拖垮网关。
+    """
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _queued: int = 0
+    _running: int = 0
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """获取（惰性创建）线程池"""
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=get_settings().PASSWORD_HASH_MAX_WORKERS,
+                thread_name_prefix="password-hash"
+            )
+        return cls._executor
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        """获取（惰性创建）并发信号量"""
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(get_settings().PASSWORD_HASH_MAX_WORKERS)
+        return cls._semaphore
+
+    @classmethod
+    def _update_gauges(cls) -> None:
+        """更新队列指标"""
+        PASSWORD_HASH_QUEUE_DEPTH.set(cls._queued)
+        PASSWORD_HASH_IN_PROGRESS.set(cls._running)
+
+    @classmethod
+    async def run(cls, operation: str, func: Callable[..., T], *args: Any) -> T:
+        """在线程池中执行密码哈希函数"""
+        semaphore = cls._get_semaphore()
+
+        if semaphore.locked() and cls._queued >= get_settings().PASSWORD_HASH_MAX_QUEUE:
+            PASSWORD_HASH_REJECTED.labels(operation=operation).inc()
+            logger.warning(
+                "密码哈希队列已满，拒绝请求",
+                operation=operation,
+                queued=cls._queued,
+                running=cls._running
+            )
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="认证服务繁忙，请稍后重试",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted_at = time.perf_counter()
+        cls._queued += 1
+        cls._update_gauges()
+        try:
+            await semaphore.acquire()
+        finally:
+            cls._queued -= 1
+            cls._update_gauges()
+
+        cls._running += 1
+        cls._update_gauges()
+        started_at = time.perf_counter()
+        PASSWORD_HASH_WAIT.labels(operation=operation).observe(started_at - submitted_at)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(cls._get_executor(), func, *args)
+        finally:
+            PASSWORD_HASH_DURATION.labels(operation=operation).observe(
+                time.perf_counter() - started_at
+            )
+            cls._running -= 1
+            cls._update_gauges()
+            semaphore.release()
+
+    @classmethod
+    def shutdown(cls):
+        """关闭线程池"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+            cls._semaphore = None
+            logger.info("密码哈希线程池已关闭")
@@ -0,0 +1,167 @@
+"""
+连接池配置模块
+按运行环境与服务给出连接池容量、超时及会话参数（源自 scripts/postgres/connection-pool-configs.py）
+
+会话参数全部通过 server_settings 随连接启动包一次性发送，不再在每个新连接上
+逐条执行 SET；只能在服务端配置文件中设置的参数（如 shared_preload_libraries）
+以及需要超级用户权限的参数（log_*、track_*、auto_explain.*）不属于会话参数，已移除。
+
+容量均为每个 worker 进程的值。三个服务共用同一个主库，检出上限合计为
+Σ(max_size + DATABASE_MAX_OVERFLOW) × worker数，必须低于
+max_connections - superuser_reserved_connections。gunicorn 默认 2·CPU+1 个 worker，
+以 4 核生产节点为例（9 个 worker，scripts/postgres/performance-optimized.conf 中
+max_connections = 150，保留 3 个）：(3 + 4 + 2 + 3 × 2) × 9 = 135 ≤ 147。
+connect_service 启动时经 check_connection_budget 核算，生产环境超额时拒绝启动；
+worker 数或副本数增加时应调低 DATABASE_POOL_SIZE / DATABASE_MAX_OVERFLOW 或在前面部署 PgBouncer。
+"""
+
+import multiprocessing
+import os
+from dataclasses import dataclass, field, replace
+from typing import Dict, Optional
+
+# 各环境共用的会话参数
+SESSION_SETTINGS = {
+    'timezone': 'UTC',
+    'standard_conforming_strings': 'on',
+}
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """单个环境的连接池配置"""
+
+    min_size: int
+    max_size: int
+    command_timeout: int
+    query_timeout: int
+    server_settings: Dict[str, str] = field(default_factory=dict)
+    pool_recycle: int = 1800  # 连接存活超过该秒数后在归还时重建
+    retry_attempts: int = 3
+    retry_delay: float = 1.0
+
+    def startup_settings(self, service: str) -> Dict[str, str]:
+        """连接启动包中的会话参数（application_name 附加服务名）"""
+        settings = {**SESSION_SETTINGS, **self.server_settings}
+        settings['statement_timeout'] = f"{self.query_timeout}s"
+        if service:
+            settings['application_name'] = f"{settings.get('application_name', 'saascontrol')}_{service}"
+        return settings
+
+
+# 各环境的连接池配置
+POOL_CONFIGS = {
+    "development": PoolConfig(
+        min_size=2,
+        max_size=3,
+        command_timeout=30,
+        query_timeout=60,
+        server_settings={
+            'application_name': 'saascontrol_dev',
+            'lock_timeout': '30s',
+            'jit': 'off',  # 开发环境关闭JIT（小查询更快）
+            'work_mem': '16MB',
+            'temp_buffers': '32MB'
+        },
+        pool_recycle=3600,  # 1小时
+        retry_attempts=3,
+        retry_delay=1.0
+    ),
+
+    "staging": PoolConfig(
+        min_size=2,
+        max_size=3,
+        command_timeout=45,
+        query_timeout=120,
+        server_settings={
+            'application_name': 'saascontrol_stage',
+            'lock_timeout': '45s',
+            'jit': 'on',
+            'jit_above_cost': '100000',
+            'work_mem': '24MB',
+            'temp_buffers': '48MB',
+            'maintenance_work_mem': '128MB'
+        },
+        pool_recycle=1800,  # 30分钟
+        retry_attempts=5,
+        retry_delay=2.0
+    ),
+
+    "production": PoolConfig(
+        min_size=2,
+        max_size=3,
+        command_timeout=60,
+        query_timeout=300,
+        server_settings={
+            'application_name': 'saascontrol_prod',
+            'lock_timeout': '60s',
+            'jit': 'on',
+            'jit_above_cost': '50000',
+            'work_mem': '32MB',
+            'temp_buffers': '64MB',
+            'maintenance_work_mem': '256MB'
+        },
+        pool_recycle=1200,  # 20分钟
+        retry_attempts=10,
+        retry_delay=5.0
+    )
+}
+
+# 各服务的连接池容量系数
+SERVICE_MULTIPLIERS = {
+    "api_gateway": 1.2,  # 前端请求多，负载较高
+    "data_service": 1.5,  # 数据库密集型操作
+    "ai_service": 0.8     # 运行时间长但并发较少
+}
+
+
+def get_pool_config(environment: str, service: str) -> PoolConfig:
+    """获取服务在指定环境下的连接池配置（容量已按服务系数调整）"""
+    config = POOL_CONFIGS.get(environment, POOL_CONFIGS["development"])
+    multiplier = SERVICE_MULTIPLIERS.get(service, 1.0)
+    return replace(
+        config,
+        min_size=max(1, int(config.min_size * multiplier)),
+        max_size=max(1, int(config.max_size * multiplier))
+    )
+
+
+def default_workers() -> int:
+    """每个服务的worker进程数（与 gunicorn.conf.py 的取值一致）"""
+    return int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+
+
+def connection_budget(
+    environment: str,
+    workers: int,
+    pool_size: Optional[int] = None,
+    max_overflow: int = 0
+) -> int:
+    """各服务合计的检出上限：Σ(max_size + max_overflow) × workers
+
+    pool_size 对应 DATABASE_POOL_SIZE，设置后覆盖所有服务的 max_size。
+    """
+    per_worker = sum(
+        (pool_size or get_pool_config(environment, service).max_size) + max_overflow
+        for service in SERVICE_MULTIPLIERS
+    )
+    return per_worker * workers
+
+
+def check_connection_budget(
+    environment: str,
+    workers: int,
+    max_connections: int,
+    superuser_reserved: int = 3,
+    pool_size: Optional[int] = None,
+    max_overflow: int = 0
+) -> int:
+    """核算连接预算，超出服务端可用连接数时抛出 ValueError，返回检出上限合计"""
+    budget = connection_budget(environment, workers, pool_size, max_overflow)
+    available = max_connections - superuser_reserved
+    if budget > available:
+        raise ValueError(
+            f"连接池容量超出服务端可用连接数: 检出上限合计 {budget} "
+            f"(worker数 {workers}) > max_connections - superuser_reserved_connections = {available}"
+        )
+    return budget
@@ -0,0 +1,99 @@
+"""
+命名查询模块
+集中声明各服务共用的SQL，经 Database.register_query 注册后按连接预编译
+"""
+
+from .database import Database
+
+# 用户及档案的公开列（不含 password_hash，结果可写入用户缓存）
+_USER_COLUMNS = """
+    u.id, u.email, u.email_verified, u.is_active, u.plan, u.created_at, u.updated_at, u.last_login_at,
+    p.first_name, p.last_name, p.avatar_url
+"""
+
+# 用户及档案联合查询的公共部分
+_USER_WITH_PROFILE = f"""
+    SELECT {_USER_COLUMNS}
+    FROM users u
+    LEFT JOIN user_profiles p ON u.id = p.user_id
+"""
+
+# 认证热点查询：连接建立时即预编译
+ACTIVE_USER_BY_ID = Database.register_query(
+    "active_user_by_id",
+    _USER_WITH_PROFILE + "WHERE u.id = $1 AND u.is_active = true",
+    prepare_on_connect=True
+)
+
+# 登录凭据查询：只在密码校验时使用，结果不得写入缓存
+ACTIVE_USER_BY_EMAIL = Database.register_query(
+    "active_user_by_email",
+    f"""
+    SELECT {_USER_COLUMNS}, u.password_hash
+    FROM users u
+    LEFT JOIN user_profiles p ON u.id = p.user_id
+    WHERE u.email = $1 AND u.is_active = true
+    """,
+    prepare_on_connect=True
+)
+
+USER_BY_ID = Database.register_query(
+    "user_by_id",
+    _USER_WITH_PROFILE + "WHERE u.id = $1"
+)
+
+USER_ID_BY_EMAIL = Database.register_query(
+    "user_id_by_email",
+    "SELECT id FROM users WHERE email = $1"
+)
+
+INSERT_USER = Database.register_query(
+    "insert_user",
+    """
+    INSERT INTO users (email, password_hash, is_active, email_verified)
+    VALUES ($1, $2, true, false)
+    RETURNING id
+    """
+)
+
+INSERT_USER_PROFILE = Database.register_query(
+    "insert_user_profile",
+    """
+    INSERT INTO user_profiles (user_id, first_name, last_name)
+    VALUES ($1, $2, $3)
+    """
+)
+
+UPDATE_LAST_LOGIN = Database.register_query(
+    "update_last_login",
+    "UPDATE users SET last_login_at = NOW() WHERE id = $1"
+)
+
+# 档案字段为 NULL 时保留原值
+UPDATE_USER_PROFILE = Database.register_query(
+    "update_user_profile",
+    """
+    UPDATE user_profiles
+    SET first_name = COALESCE($2, first_name),
+        last_name = COALESCE($3, last_name),
+        avatar_url = COALESCE($4, avatar_url)
+    WHERE user_id = $1
+    """
+)
+
+DEACTIVATE_USER = Database.register_query(
+    "deactivate_user",
+    "UPDATE users SET is_active = false WHERE id = $1 AND is_active = true"
+)
+
+DATASETS_BY_OWNER = Database.register_query(
+    "datasets_by_owner",
+    """
+    SELECT d.id, d.project_id, d.name, d.file_type, d.file_size,
+           d.upload_status, d.created_at, d.processed_at
+    FROM datasets d
+    JOIN projects p ON p.id = d.project_id
+    WHERE p.user_id = $1 AND p.status <> 'deleted'
+    ORDER BY d.id
+    """
+)
@@ -3,36 +3,140 @@ Redis客户端管理模块
 用于缓存、会话管理和分布式锁
 """
 
-import json
-from typing import Any, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Sequence, Union
 import redis.asyncio as redis
+from redis.asyncio.cluster import RedisCluster
+from redis.exceptions import MaxConnectionsError
 import structlog
 
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .redis_codec import TaggedSerializer
+from .redis_near_cache import NearCache
+from .redis_pipeline import AutoPipeline
+from .redis_topology import (
+    MODE_CLUSTER,
+    MODE_STANDALONE,
+    RedisPoolExhaustedError,
+    RedisTopology,
+    create_client,
+    create_pubsub_client,
+)
+
+if TYPE_CHECKING:
+    from .redis_lock import RedisLock
+
 logger = structlog.get_logger()
 
 
 class RedisClient:
-    """Redis客户端管理类"""
+    """Redis客户端管理类
+    
+    _client 自动解码UTF-8，供发布订阅、Lua脚本等文本场景直接使用；
+    set/get/hset/hget/hgetall 经二进制安全的 _binary_client 读写带类型标签的值。
+    
+    连接串可以是单机、Sentinel（redis+sentinel://）或 Cluster（redis+cluster://），
+    见 redis_topology 模块。Cluster 模式下多键命令按哈希槽拆分，流水线按节点分组发送。
+    
+    本类的命令经熔断器执行：连续出现连接错误或超时后熔断，熔断期间立即抛出
+    CircuitOpenError，而不是让每个请求等待套接字超时；连接池耗尽不计为失败。
+    
+    启用 auto_pipeline 后，本类的单键命令经 AutoPipeline 发送，
+    同一事件循环轮次内的并发命令合并为一次往返；直接使用 _client 的代码不受影响。
+    
+    启用 near_cache 后（仅单机模式），get 对匹配前缀的键先查进程内副本，由服务端失效消息保持一致；
+    本类的写命令同时删除本进程副本，保证本进程写后即可读到新值。
+    
+    lock() 创建分布式锁，单例后台任务的领导者选举见 redis_lock.LeaderElection。
+    """
     
-    _client: Optional[redis.Redis] = None
+    _client: Optional[Union[redis.Redis, RedisCluster]] = None
+    _binary_client: Optional[Union[redis.Redis, RedisCluster]] = None
+    _pubsub_client: Optional[redis.Redis] = None
+    _topology: Optional[RedisTopology] = None
+    _pipeline: Optional[AutoPipeline] = None
+    _binary_pipeline: Optional[AutoPipeline] = None
+    _near_cache: Optional[NearCache] = None
+    _serializer: TaggedSerializer = TaggedSerializer("json")
+    _circuit: CircuitBreaker = CircuitBreaker(
+        "redis",
+        failure_types=(redis.ConnectionError, redis.TimeoutError),
+        # 连接池耗尽（Cluster模式为 MaxConnectionsError）说明Redis可达，不计为失败
+        ignore_types=(RedisPoolExhaustedError, MaxConnectionsError)
+    )
     
     @classmethod
-    async def connect(cls, redis_url: str):
-        """创建Redis连接"""
+    async def connect(
+        cls,
+        redis_url: str,
+        codec: str = "orjson",
+        max_connections: int = 50,
+        pool_timeout: float = 2.0,
+        socket_timeout: float = 5.0,
+        socket_connect_timeout: float = 5.0,
+        circuit_failure_threshold: int = 5,
+        circuit_reset_seconds: float = 10.0,
+        auto_pipeline: bool = False,
+        auto_pipeline_max_batch: int = 256,
+        near_cache: bool = False,
+        near_cache_prefixes: Sequence[str] = (),
+        near_cache_max_size: int = 10000,
+        near_cache_ttl: float = 300.0
+    ):
+        """创建Redis连接
+        
+        _client、_binary_client 与客户端缓存的跟踪连接池各自以 max_connections 为上限，
+        连接全部检出时最多等待 pool_timeout 秒。
+        """
         try:
-            cls._client = redis.from_url(
-                redis_url,
-                encoding="utf-8",
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5,
-                retry_on_timeout=True,
-                health_check_interval=30
+            cls._serializer = TaggedSerializer(codec)
+            cls._topology = RedisTopology.from_url(redis_url)
+            cls._circuit.failure_threshold = circuit_failure_threshold
+            cls._circuit.reset_timeout = circuit_reset_seconds
+            
+            client_options = dict(
+                max_connections=max_connections,
+                pool_timeout=pool_timeout,
+                socket_timeout=socket_timeout,
+                socket_connect_timeout=socket_connect_timeout
+            )
+            cls._client = create_client(cls._topology, "text", decode_responses=True, **client_options)
+            cls._binary_client = create_client(cls._topology, "binary", decode_responses=False, **client_options)
+            
+            cls._pipeline = AutoPipeline(cls._client, "text", auto_pipeline_max_batch) if auto_pipeline else None
+            cls._binary_pipeline = (
+                AutoPipeline(cls._binary_client, "binary", auto_pipeline_max_batch) if auto_pipeline else None
             )
             
             # 测试连接
             await cls._client.ping()
-            logger.info("Redis连接成功")
+            
+            if cls._topology.mode == MODE_CLUSTER:
+                cls._pubsub_client = create_pubsub_client(cls._client, cls._topology)
+            
+            if near_cache and cls._topology.mode != MODE_STANDALONE:
+                logger.warning("Redis客户端缓存仅支持单机模式，已禁用", mode=cls._topology.mode)
+            elif near_cache:
+                cls._near_cache = NearCache(
+                    redis_url,
+                    near_cache_prefixes,
+                    max_size=near_cache_max_size,
+                    ttl=near_cache_ttl,
+                    max_connections=max_connections,
+                    pool_timeout=pool_timeout,
+                    socket_timeout=socket_timeout,
+                    socket_connect_timeout=socket_connect_timeout,
+                    retry_on_timeout=True
+                )
+                await cls._near_cache.start()
+            
+            logger.info(
+                "Redis连接成功",
+                mode=cls._topology.mode,
+                codec=codec,
+                max_connections=max_connections,
+                auto_pipeline=auto_pipeline,
+                near_cache=cls._near_cache is not None
+            )
         except Exception as e:
             logger.error("Redis连接失败", error=str(e), exc_info=True)
             raise
@@ -40,10 +144,28 @@ class RedisClient:
     @classmethod
     async def disconnect(cls):
         """关闭Redis连接"""
+        if cls._near_cache:
+            await cls._near_cache.stop()
+            cls._near_cache = None
+        
+        for pipeline in (cls._pipeline, cls._binary_pipeline):
+            if pipeline:
+                await pipeline.close()
+        cls._pipeline = None
+        cls._binary_pipeline = None
+        
+        if cls._pubsub_client:
+            await cls._pubsub_client.close()
+            cls._pubsub_client = None
+        
         if cls._client:
             await cls._client.close()
             cls._client = None
             logger.info("Redis连接已关闭")
+        
+        if cls._binary_client:
+            await cls._binary_client.close()
+            cls._binary_client = None
     
     @classmethod
     async def ping(cls) -> bool:
@@ -57,23 +179,89 @@ class RedisClient:
         except Exception:
             return False
     
+    @classmethod
+    def pubsub(cls) -> redis.client.PubSub:
+        """创建发布订阅对象（Cluster模式下订阅任一节点）"""
+        if not cls._client:
+            raise RuntimeError("Redis客户端未初始化")
+        return (cls._pubsub_client or cls._client).pubsub()
+    
+    @classmethod
+    def lock(
+        cls,
+        name: str,
+        ttl: float = 30.0,
+        blocking_timeout: Optional[float] = None,
+        auto_extend: bool = True
+    ) -> "RedisLock":
+        """创建带防护令牌、自动续期的分布式锁，见 redis_lock 模块"""
+        from .redis_lock import RedisLock
+        return RedisLock(name, ttl=ttl, blocking_timeout=blocking_timeout, auto_extend=auto_extend)
+    
+    @classmethod
+    def is_cluster(cls) -> bool:
+        return cls._topology is not None and cls._topology.mode == MODE_CLUSTER
+    
+    @classmethod
+    def status(cls) -> Dict[str, Any]:
+        """连接池与熔断器状态快照"""
+        pools = {}
+        for name, client in (("text", cls._client), ("binary", cls._binary_client)):
+            pool = getattr(client, "connection_pool", None)
+            if pool is not None and hasattr(pool, "stats"):
+                pools[name] = pool.stats()
+        if cls._near_cache:
+            pools["near_cache"] = cls._near_cache.client.connection_pool.stats()
+        return {
+            "mode": cls._topology.mode if cls._topology else None,
+            "pools": pools,
+            "circuit": cls._circuit.status(),
+            "near_cache": cls._near_cache.tracking if cls._near_cache else None,
+        }
+    
+    @classmethod
+    def _executor(cls, binary: bool = False) -> Union[redis.Redis, RedisCluster, AutoPipeline]:
+        """命令执行者：启用自动流水线时为 AutoPipeline，否则为客户端本身"""
+        client = cls._binary_client if binary else cls._client
+        if not client:
+            raise RuntimeError("Redis客户端未初始化")
+        
+        pipeline = cls._binary_pipeline if binary else cls._pipeline
+        return pipeline or client
+    
+    @classmethod
+    async def _execute(cls, *args: Any, binary: bool = False) -> Any:
+        """经熔断器执行单条命令"""
+        executor = cls._executor(binary)
+        with cls._circuit:
+            return await executor.execute_command(*args)
+    
+    @classmethod
+    def _evict_near_cache(cls, *keys: str) -> None:
+        """本进程写入后删除客户端缓存副本（其他进程由服务端失效消息处理）"""
+        if cls._near_cache:
+            cls._near_cache.invalidate(keys)
+    
     @classmethod
     async def set(
         cls, 
         key: str, 
         value: Any, 
         expire: Optional[int] = None,
-        serialize_json: bool = True
+        serialize: bool = True,
+        nx: bool = False
     ) -> bool:
-        """设置键值"""
-        if not cls._client:
-            raise RuntimeError("Redis客户端未初始化")
-        
+        """设置键值（serialize=False 时原样写入，不加类型标签；nx=True 时仅在键不存在时写入）"""
         try:
-            if serialize_json and not isinstance(value, str):
-                value = json.dumps(value, ensure_ascii=False)
+            if serialize:
+                value = cls._serializer.dumps(value)
             
-            return await cls._client.set(key, value, ex=expire)
+            args = ("SET", key, value) + (("EX", expire) if expire else ()) + (("NX",) if nx else ())
+            result = bool(await cls._execute(*args, binary=True))
+            cls._evict_near_cache(key)
+            return result
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error("Redis设置失败", key=key, error=str(e))
             raise
@@ -82,36 +270,130 @@ class RedisClient:
     async def get(
         cls, 
         key: str, 
-        deserialize_json: bool = True
+        deserialize: bool = True
     ) -> Optional[Any]:
-        """获取键值"""
-        if not cls._client:
+        """获取键值（deserialize=False 时返回原始字节）"""
+        try:
+            if cls._near_cache and cls._near_cache.matches(key):
+                try:
+                    with cls._circuit:
+                        value = await cls._near_cache.get(key)
+                except CircuitOpenError:
+                    raise
+                except (redis.ConnectionError, redis.TimeoutError) as e:
+                    # 跟踪连接不可用（如监听正在重连）时回退到普通GET
+                    logger.warning("Redis客户端缓存读取失败，回退到普通GET", key=key, error=str(e))
+                    value = await cls._execute("GET", key, binary=True)
+            else:
+                value = await cls._execute("GET", key, binary=True)
+            if value is None or not deserialize:
+                return value
+            
+            return cls._serializer.loads(value)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.error("Redis获取失败", key=key, error=str(e))
+            raise
+    
+    @classmethod
+    async def mget_many(
+        cls,
+        keys: Iterable[str],
+        deserialize: bool = True
+    ) -> Dict[str, Any]:
+        """一次 MGET 批量获取，返回存在的键及其值（不存在的键不出现在结果中）"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        
+        try:
+            if cls.is_cluster():
+                # 按哈希槽拆分为多条 MGET 并发送到各自节点
+                with cls._circuit:
+                    values = await cls._binary_client.mget_nonatomic(keys)
+            else:
+                values = await cls._execute("MGET", *keys, binary=True)
+            return {
+                key: cls._serializer.loads(value) if deserialize else value
+                for key, value in zip(keys, values)
+                if value is not None
+            }
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.error("Redis批量获取失败", keys=len(keys), error=str(e))
+            raise
+    
+    @classmethod
+    async def mset_many(
+        cls,
+        mapping: Dict[str, Any],
+        expire: Union[int, Dict[str, Optional[int]], None] = None,
+        serialize: bool = True
+    ) -> bool:
+        """批量设置键值，一次往返完成
+        
+        expire 可为统一的过期秒数，或按键给出过期秒数的字典（未给出的键不过期）。
+        没有过期时间时使用原子的 MSET；否则以非事务流水线逐键 SET ... EX，
+        各键独立生效。Cluster 模式下按哈希槽拆分，MSET 只在同一槽内原子。
+        """
+        if not mapping:
+            return True
+        
+        if not cls._binary_client:
             raise RuntimeError("Redis客户端未初始化")
         
+        if isinstance(expire, dict):
+            ttls = expire
+        else:
+            ttls = dict.fromkeys(mapping, expire)
+        
         try:
-            value = await cls._client.get(key)
-            if value is None:
-                return None
+            values = {
+                key: cls._serializer.dumps(value) if serialize else value
+                for key, value in mapping.items()
+            }
             
-            if deserialize_json:
-                try:
-                    return json.loads(value)
-                except (json.JSONDecodeError, TypeError):
-                    return value
+            if not any(ttls.get(key) for key in values):
+                if cls.is_cluster():
+                    with cls._circuit:
+                        result = all(await cls._binary_client.mset_nonatomic(values))
+                else:
+                    args = []
+                    for key, value in values.items():
+                        args.extend((key, value))
+                    result = await cls._execute("MSET", *args, binary=True)
+            else:
+                # Cluster 模式下流水线按节点分组，各节点并行发送
+                pipe = cls._binary_client.pipeline(transaction=False)
+                for key, value in values.items():
+                    pipe.set(key, value, ex=ttls.get(key) or None)
+                with cls._circuit:
+                    result = all(await pipe.execute())
             
-            return value
+            cls._evict_near_cache(*values)
+            return result
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            logger.error("Redis获取失败", key=key, error=str(e))
+            logger.error("Redis批量设置失败", keys=len(mapping), error=str(e))
             raise
     
     @classmethod
     async def delete(cls, *keys: str) -> int:
         """删除键"""
-        if not cls._client:
-            raise RuntimeError("Redis客户端未初始化")
-        
         try:
-            return await cls._client.delete(*keys)
+            if cls.is_cluster() and len(keys) > 1:
+                # 按哈希槽拆分为多条 DEL
+                with cls._circuit:
+                    result = await cls._client.delete(*keys)
+            else:
+                result = await cls._execute("DEL", *keys)
+            cls._evict_near_cache(*keys)
+            return result
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error("Redis删除失败", keys=keys, error=str(e))
             raise
@@ -119,11 +401,10 @@ class RedisClient:
     @classmethod
     async def exists(cls, key: str) -> bool:
         """检查键是否存在"""
-        if not cls._client:
-            raise RuntimeError("Redis客户端未初始化")
-        
         try:
-            return bool(await cls._client.exists(key))
+            return bool(await cls._execute("EXISTS", key))
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error("Redis检查失败", key=key, error=str(e))
             raise
@@ -131,11 +412,10 @@ class RedisClient:
     @classmethod
     async def expire(cls, key: str, seconds: int) -> bool:
         """设置键的过期时间"""
-        if not cls._client:
-            raise RuntimeError("Redis客户端未初始化")
-        
         try:
-            return await cls._client.expire(key, seconds)
+            return await cls._execute("EXPIRE", key, seconds)
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error("Redis过期设置失败", key=key, error=str(e))
             raise
@@ -143,11 +423,12 @@ class RedisClient:
     @classmethod
     async def incr(cls, key: str, amount: int = 1) -> int:
         """递增计数器"""
-        if not cls._client:
-            raise RuntimeError("Redis客户端未初始化")
-        
         try:
-            return await cls._client.incrby(key, amount)
+            result = await cls._execute("INCRBY", key, amount)
+            cls._evict_near_cache(key)
+            return result
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error("Redis递增失败", key=key, error=str(e))
             raise
@@ -155,31 +436,26 @@ class RedisClient:
     @classmethod
     async def decr(cls, key: str, amount: int = 1) -> int:
         """递减计数器"""
-        if not cls._client:
-            raise RuntimeError("Redis客户端未初始化")
-        
         try:
-            return await cls._client.decrby(key, amount)
+            result = await cls._execute("DECRBY", key, amount)
+            cls._evict_near_cache(key)
+            return result
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error("Redis递减失败", key=key, error=str(e))
             raise
     
     @classmethod
     async def hset(cls, name: str, mapping: dict) -> int:
-        """设置哈希表"""
-        if not cls._client:
-            raise RuntimeError("Redis客户端未初始化")
-        
+        """设置哈希表（每个字段值单独编码）"""
         try:
-            # 序列化复杂对象
-            serialized_mapping = {}
+            args = []
             for k, v in mapping.items():
-                if isinstance(v, (dict, list)):
-                    serialized_mapping[k] = json.dumps(v, ensure_ascii=False)
-                else:
-                    serialized_mapping[k] = v
-            
-            return await cls._client.hset(name, mapping=serialized_mapping)
+                args.extend((k, cls._serializer.dumps(v)))
+            return await cls._execute("HSET", name, *args, binary=True)
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error("Redis哈希设置失败", name=name, error=str(e))
             raise
@@ -187,19 +463,14 @@ class RedisClient:
     @classmethod
     async def hget(cls, name: str, key: str) -> Optional[Any]:
         """获取哈希表字段"""
-        if not cls._client:
-            raise RuntimeError("Redis客户端未初始化")
-        
         try:
-            value = await cls._client.hget(name, key)
+            value = await cls._execute("HGET", name, key, binary=True)
             if value is None:
                 return None
             
-            # 尝试反序列化JSON
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            return cls._serializer.loads(value)
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error("Redis哈希获取失败", name=name, key=key, error=str(e))
             raise
@@ -207,21 +478,14 @@ class RedisClient:
     @classmethod
     async def hgetall(cls, name: str) -> dict:
         """获取整个哈希表"""
-        if not cls._client:
-            raise RuntimeError("Redis客户端未初始化")
-        
         try:
-            data = await cls._client.hgetall(name)
-            
-            # 反序列化值
-            result = {}
-            for k, v in data.items():
-                try:
-                    result[k] = json.loads(v)
-                except (json.JSONDecodeError, TypeError):
-                    result[k] = v
-            
-            return result
+            data = await cls._execute("HGETALL", name, binary=True)
+            return {
+                k.decode("utf-8"): cls._serializer.loads(v)
+                for k, v in data.items()
+            }
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error("Redis哈希全量获取失败", name=name, error=str(e))
             raise
\ No newline at end of file
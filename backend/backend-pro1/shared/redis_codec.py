@@ -0,0 +1,149 @@
+"""
+Redis值编解码模块
+写入的值以一个类型标签字节开头，读取时按标签选择解码方式，不再逐个尝试 json.loads；
+结构化对象可使用 orjson 或 msgpack 编码，bytes 原样存储
+"""
+
+import json
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Any, Dict
+
+# 类型标签（均为控制字符，不会与 INCR 等命令写入的未标记数值或普通文本冲突）
+TAG_BYTES = 0x01
+TAG_STR = 0x02
+TAG_JSON = 0x03
+TAG_ORJSON = 0x04
+TAG_MSGPACK = 0x05
+
+
+def _default(value: Any) -> Any:
+    """序列化数据库记录等对象中的非原生类型"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class Codec(ABC):
+    """结构化对象编解码器"""
+
+    name = ""
+    tag = 0
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        """编码为字节串"""
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        """从字节串解码"""
+
+
+class JsonCodec(Codec):
+    """标准库json（无额外依赖时的兜底实现）"""
+
+    name = "json"
+    tag = TAG_JSON
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """orjson：原生支持 datetime/UUID/dataclass，非字符串键自动转换"""
+
+    name = "orjson"
+    tag = TAG_ORJSON
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def encode(self, value: Any) -> bytes:
+        return self._orjson.dumps(value, default=_default, option=self._options)
+
+    def decode(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """msgpack：二进制格式，体积更小，bytes 字段无需转义"""
+
+    name = "msgpack"
+    tag = TAG_MSGPACK
+
+    def __init__(self):
+        import msgpack
+
+        self._packb = msgpack.packb
+        self._unpackb = msgpack.unpackb
+
+    def encode(self, value: Any) -> bytes:
+        return self._packb(value, default=_default, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return self._unpackb(data, raw=False, strict_map_key=False)
+
+
+CODEC_CLASSES = {
+    JsonCodec.name: JsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+CODEC_TAGS = {codec_class.tag: codec_class for codec_class in CODEC_CLASSES.values()}
+
+
+class TaggedSerializer:
+    """带类型标签的序列化器
+
+    str 与 bytes 分别以独立标签原样存储，其余对象使用配置的编解码器；
+    解码时按标签分派，因此切换编解码器后仍可读取旧编码写入的值。
+    没有标签的值（如 INCR 写入的计数器或外部写入的字符串）按原始内容返回。
+    """
+
+    def __init__(self, codec: str = "orjson"):
+        if codec not in CODEC_CLASSES:
+            raise ValueError(f"不支持的Redis编解码器: {codec}")
+
+        self.codec = CODEC_CLASSES[codec]()
+        self._decoders: Dict[int, Codec] = {self.codec.tag: self.codec}
+
+    def _decoder(self, tag: int) -> Codec:
+        """按标签获取解码器，其他编解码器在首次遇到时才加载"""
+        decoder = self._decoders.get(tag)
+        if decoder is None:
+            decoder = self._decoders[tag] = CODEC_TAGS[tag]()
+        return decoder
+
+    def dumps(self, value: Any) -> bytes:
+        """编码为带标签的字节串"""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes((TAG_BYTES,)) + bytes(value)
+        if isinstance(value, str):
+            return bytes((TAG_STR,)) + value.encode("utf-8")
+        return bytes((self.codec.tag,)) + self.codec.encode(value)
+
+    def loads(self, data: bytes) -> Any:
+        """按标签解码"""
+        if not data:
+            return ""
+
+        tag = data[0]
+        if tag == TAG_BYTES:
+            return data[1:]
+        if tag == TAG_STR:
+            return data[1:].decode("utf-8")
+        if tag in CODEC_TAGS:
+            return self._decoder(tag).decode(data[1:])
+
+        # 未标记的值：可解码为UTF-8时返回字符串，否则返回原始字节
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            return data
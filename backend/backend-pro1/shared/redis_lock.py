@@ -0,0 +1,440 @@
+"""
+Redis分布式锁模块
+带防护令牌（fencing token）的互斥锁：持有期间后台自动续期，释放时发布通知，
+等待方收到通知立即重试而不是轮询；LeaderElection 基于同一把锁保证
+每个服务同一时刻只有一个副本运行某个后台任务
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from prometheus_client import Counter, Gauge, Histogram
+from redis.exceptions import NoScriptError
+import structlog
+
+from .redis_client import RedisClient
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义（当选状态按worker求和，即该副本是否为领导者）
+REDIS_LOCK_ACQUIRE = Histogram(
+    "redis_lock_acquire_seconds",
+    "获取分布式锁的耗时（含等待）",
+    ["name", "result"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0)
+)
+
+REDIS_LOCK_LOST = Counter(
+    "redis_lock_lost_total",
+    "持有期间续期失败而失去的锁",
+    ["name"]
+)
+
+LEADER_ELECTION_LEADER = Gauge(
+    "leader_election_leader",
+    "本进程是否为领导者（1为是）",
+    ["election"],
+    multiprocess_mode="livesum"
+)
+
+LOCK_KEY_PREFIX = "lock:"
+LOCK_RELEASE_CHANNEL = "lock:released"
+
+# 获取成功返回 {防护令牌, 0}，失败返回 {0, 锁剩余毫秒}
+ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return {redis.call('INCR', KEYS[2]), 0}
+end
+return {0, redis.call('PTTL', KEYS[1])}
+"""
+
+EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('PUBLISH', ARGV[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class LockError(RuntimeError):
+    """分布式锁错误"""
+
+
+class LockNotAcquiredError(LockError):
+    """在等待时限内未能获取锁"""
+
+
+class LockScript:
+    """通过SCRIPT LOAD/EVALSHA经熔断器执行的锁脚本"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha: Optional[str] = None
+
+    async def __call__(self, keys: List[str], args: List) -> Any:
+        client = RedisClient._client
+        if client is None:
+            raise RuntimeError("Redis客户端未初始化")
+
+        with RedisClient._circuit:
+            if self.sha is None:
+                self.sha = await client.script_load(self.source)
+            try:
+                return await client.evalsha(self.sha, len(keys), *keys, *args)
+            except NoScriptError:
+                # Redis重启或执行过SCRIPT FLUSH后需要重新加载
+                self.sha = await client.script_load(self.source)
+                return await client.evalsha(self.sha, len(keys), *keys, *args)
+
+
+LOCK_SCRIPTS = {
+    "acquire": LockScript(ACQUIRE_SCRIPT),
+    "extend": LockScript(EXTEND_SCRIPT),
+    "release": LockScript(RELEASE_SCRIPT),
+}
+
+
+class LockReleaseListener:
+    """锁释放通知监听
+
+    每个进程共用一个订阅连接，按锁名唤醒本进程的等待方。
+    未启动或重连期间等待方退化为按锁的剩余有效期重试；
+    重新订阅成功后唤醒全部等待方，弥补断线期间错过的通知。
+    """
+
+    _waiters: Dict[str, Set[asyncio.Event]] = {}
+    _listener_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def register(cls, name: str) -> asyncio.Event:
+        """登记等待方（应在尝试获取之前登记，避免错过两者之间的释放通知）"""
+        event = asyncio.Event()
+        cls._waiters.setdefault(name, set()).add(event)
+        return event
+
+    @classmethod
+    def unregister(cls, name: str, event: asyncio.Event) -> None:
+        events = cls._waiters.get(name)
+        if events is not None:
+            events.discard(event)
+            if not events:
+                del cls._waiters[name]
+
+    @classmethod
+    def _wake(cls, name: Optional[str] = None) -> None:
+        """唤醒某把锁的等待方，name为None时唤醒全部"""
+        groups = cls._waiters.values() if name is None else [cls._waiters.get(name, ())]
+        for events in groups:
+            for event in events:
+                event.set()
+
+    @classmethod
+    async def start(cls):
+        """启动释放通知监听任务"""
+        if cls._listener_task is None or cls._listener_task.done():
+            cls._listener_task = asyncio.create_task(cls._listen())
+            logger.info("分布式锁释放通知监听已启动")
+
+    @classmethod
+    async def stop(cls):
+        """停止释放通知监听任务"""
+        if cls._listener_task:
+            cls._listener_task.cancel()
+            try:
+                await cls._listener_task
+            except asyncio.CancelledError:
+                pass
+            cls._listener_task = None
+
+    @classmethod
+    async def _listen(cls):
+        """订阅释放频道，连接断开后自动重连"""
+        while True:
+            try:
+                if not RedisClient._client:
+                    await asyncio.sleep(1)
+                    continue
+
+                pubsub = RedisClient.pubsub()
+                await pubsub.subscribe(LOCK_RELEASE_CHANNEL)
+                cls._wake()
+                try:
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            cls._wake(message["data"])
+                finally:
+                    await pubsub.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("分布式锁释放通知监听中断，稍后重连", error=str(e))
+                await asyncio.sleep(1)
+
+
+class RedisLock:
+    """带防护令牌的分布式锁
+
+        async with RedisLock("partition-maintenance", ttl=30) as lock:
+            await run_maintenance(fence=lock.fence)
+
+    获取成功时 fence 为单调递增的防护令牌。持有者可能因长时间停顿（GC、
+    事件循环阻塞、网络分区）在不知情的情况下失去锁，此时另一持有者已拿到
+    更大的令牌；写入外部存储时应携带 fence，由存储拒绝较小的令牌。
+
+    持有期间每 ttl/3 秒续期一次。续期被拒（锁已过期并被他人获取）或直到
+    本地估算的有效期结束仍无法续期时视为失去锁：locked() 返回False，
+    wait_lost() 返回。释放时在 lock:released 频道发布锁名，
+    等待方经 LockReleaseListener 收到后立即重试。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float = 30.0,
+        blocking_timeout: Optional[float] = None,
+        auto_extend: bool = True,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.blocking_timeout = blocking_timeout
+        self.auto_extend = auto_extend
+
+        # 哈希标签保证锁与令牌计数器在Cluster模式下位于同一槽
+        self.key = f"{LOCK_KEY_PREFIX}{{{name}}}"
+        self.fence_key = f"{self.key}:fence"
+
+        self.token: Optional[str] = None
+        self.fence: Optional[int] = None
+        self._expires_at = 0.0
+        self._lost = asyncio.Event()
+        self._extend_task: Optional[asyncio.Task] = None
+
+    def locked(self) -> bool:
+        """本实例是否仍持有锁"""
+        return self.token is not None and not self._lost.is_set() and time.monotonic() < self._expires_at
+
+    async def wait_lost(self):
+        """等待直到失去锁（主动释放不算失去）"""
+        await self._lost.wait()
+
+    async def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        """获取锁，blocking=False 时只尝试一次；timeout 默认取 blocking_timeout，为None时一直等待"""
+        if self.token is not None:
+            raise LockError(f"锁 {self.name} 已由本实例持有")
+
+        timeout = self.blocking_timeout if timeout is None else timeout
+        start_time = time.monotonic()
+        deadline = None if timeout is None else start_time + timeout
+        token = uuid.uuid4().hex
+        ttl_ms = int(self.ttl * 1000)
+
+        while True:
+            event = LockReleaseListener.register(self.name)
+            try:
+                sent_at = time.monotonic()
+                fence, pttl = await LOCK_SCRIPTS["acquire"]([self.key, self.fence_key], [token, ttl_ms])
+                if fence:
+                    self._hold(token, int(fence), sent_at)
+                    REDIS_LOCK_ACQUIRE.labels(name=self.name, result="acquired").observe(
+                        time.monotonic() - start_time
+                    )
+                    return True
+
+                now = time.monotonic()
+                if not blocking or (deadline is not None and now >= deadline):
+                    REDIS_LOCK_ACQUIRE.labels(name=self.name, result="timeout").observe(now - start_time)
+                    return False
+
+                # 持有者崩溃时锁到期不会发布通知，最多等到剩余有效期结束
+                wait = pttl / 1000 if pttl > 0 else 0.05
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                LockReleaseListener.unregister(self.name, event)
+
+    def _hold(self, token: str, fence: int, sent_at: float) -> None:
+        self.token = token
+        self.fence = fence
+        self._expires_at = sent_at + self.ttl
+        self._lost = asyncio.Event()
+        if self.auto_extend:
+            self._extend_task = asyncio.create_task(self._extend_loop())
+
+    async def extend(self, ttl: Optional[float] = None) -> bool:
+        """把有效期重置为 ttl 秒（默认为创建时的ttl），锁已不属于本实例时返回False"""
+        if self.token is None:
+            return False
+
+        ttl = self.ttl if ttl is None else ttl
+        sent_at = time.monotonic()
+        extended = await LOCK_SCRIPTS["extend"]([self.key], [self.token, int(ttl * 1000)])
+        if extended:
+            self._expires_at = sent_at + ttl
+        return bool(extended)
+
+    async def _extend_loop(self):
+        """周期性续期，续期被拒或有效期耗尽时标记失去锁"""
+        interval = self.ttl / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await self.extend():
+                    interval = self.ttl / 3
+                    continue
+                reason = "锁已过期并被其他持有者获取"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                remaining = self._expires_at - time.monotonic()
+                if remaining > 0:
+                    # 连接抖动时在有效期内加快重试
+                    interval = min(self.ttl / 10, remaining / 2)
+                    logger.warning("分布式锁续期失败，稍后重试", name=self.name, error=str(e))
+                    continue
+                reason = str(e)
+
+            REDIS_LOCK_LOST.labels(name=self.name).inc()
+            logger.error("分布式锁已失去", name=self.name, fence=self.fence, reason=reason)
+            self._lost.set()
+            return
+
+    async def release(self) -> bool:
+        """释放锁并通知等待方，锁已不属于本实例时返回False"""
+        if self.token is None:
+            return False
+
+        if self._extend_task:
+            self._extend_task.cancel()
+            try:
+                await self._extend_task
+            except asyncio.CancelledError:
+                pass
+            self._extend_task = None
+
+        token, self.token = self.token, None
+        try:
+            released = await LOCK_SCRIPTS["release"](
+                [self.key], [token, LOCK_RELEASE_CHANNEL, self.name]
+            )
+        except Exception as e:
+            # 未释放的锁在ttl后自动过期
+            logger.warning("分布式锁释放失败", name=self.name, error=str(e))
+            return False
+
+        if not released:
+            logger.warning("释放分布式锁时锁已不属于本实例", name=self.name, fence=self.fence)
+        return bool(released)
+
+    async def __aenter__(self) -> "RedisLock":
+        if not await self.acquire():
+            raise LockNotAcquiredError(f"{self.blocking_timeout}秒内未能获取锁 {self.name}")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        await self.release()
+        return False
+
+
+class LeaderElection:
+    """基于分布式锁的领导者选举
+
+        election = LeaderElection("data_service:partition-maintenance")
+        await election.start(job)   # job(fence) 只在领导者上运行
+        ...
+        await election.stop()
+
+    各副本持续竞选同一把锁，持有者即为领导者。传入 job 时当选后以防护令牌
+    调用 job，失去领导权时取消 job；job 应一直运行直到被取消，返回或抛出异常
+    时释放领导权并在 retry_interval 秒后重新竞选。不传 job 时调用方
+    通过 is_leader 判断是否执行各自的周期任务。
+
+    领导者崩溃后最迟 ttl 秒由其他副本接任；正常停止时释放锁，
+    其他副本经释放通知立即接任。
+    """
+
+    def __init__(self, name: str, ttl: float = 15.0, retry_interval: float = 1.0):
+        self.name = name
+        self.retry_interval = retry_interval
+        self.lock = RedisLock(f"leader:{name}", ttl=ttl)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.locked()
+
+    @property
+    def fence(self) -> Optional[int]:
+        """当前任期的防护令牌，非领导者时为None"""
+        return self.lock.fence if self.is_leader else None
+
+    async def start(self, job: Optional[Callable[[int], Awaitable[Any]]] = None):
+        """启动竞选任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._campaign(job))
+            logger.info("领导者选举已启动", election=self.name)
+
+    async def stop(self):
+        """停止竞选，领导者释放锁"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _campaign(self, job: Optional[Callable[[int], Awaitable[Any]]]):
+        """竞选循环"""
+        while True:
+            try:
+                await self.lock.acquire()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("领导者竞选失败，稍后重试", election=self.name, error=str(e))
+                await asyncio.sleep(self.retry_interval)
+                continue
+
+            LEADER_ELECTION_LEADER.labels(election=self.name).set(1)
+            logger.info("当选领导者", election=self.name, fence=self.lock.fence)
+            try:
+                await self._lead(job)
+            finally:
+                LEADER_ELECTION_LEADER.labels(election=self.name).set(0)
+                await self.lock.release()
+                logger.info("卸任领导者", election=self.name, fence=self.lock.fence)
+            await asyncio.sleep(self.retry_interval)
+
+    async def _lead(self, job: Optional[Callable[[int], Awaitable[Any]]]):
+        """任期内运行 job，直到失去锁或 job 结束"""
+        lost = asyncio.create_task(self.lock.wait_lost())
+        tasks = {lost}
+        if job is not None:
+            tasks.add(asyncio.create_task(job(self.lock.fence)))
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done - {lost}:
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error(
+                        "领导者任务异常退出", election=self.name, error=str(task.exception()),
+                        exc_info=task.exception()
+                    )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,246 @@
+"""
+Redis客户端缓存模块
+利用服务端辅助的客户端缓存（CLIENT TRACKING ... REDIRECT）在进程内保留热点键的副本，
+键被修改、删除或淘汰时服务端发送失效消息，本地副本随即删除
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+import redis.asyncio as redis
+from prometheus_client import Counter, Gauge
+import structlog
+
+from .redis_topology import InstrumentedBlockingPool
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义
+NEAR_CACHE_REQUESTS = Counter(
+    "redis_near_cache_requests_total",
+    "Redis客户端缓存查询次数",
+    ["result"]
+)
+
+NEAR_CACHE_INVALIDATIONS = Counter(
+    "redis_near_cache_invalidations_total",
+    "Redis客户端缓存失效次数",
+    ["kind"]
+)
+
+NEAR_CACHE_ENTRIES = Gauge(
+    "redis_near_cache_entries",
+    "Redis客户端缓存条目数",
+    multiprocess_mode="livesum"
+)
+
+NEAR_CACHE_TRACKING = Gauge(
+    "redis_near_cache_tracking",
+    "服务端键跟踪是否生效（1为生效，0为已回退到普通GET）",
+    multiprocess_mode="livemin"
+)
+
+# 服务端发送失效消息的频道（RESP2 重定向模式）
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+
+class NearCache:
+    """服务端辅助的客户端缓存
+
+    专用监听连接订阅 __redis__:invalidate，缓存读取走独立的连接池，
+    池中每个连接建立时执行 CLIENT TRACKING ON REDIRECT <监听连接ID>，
+    服务端据此记录这些连接读过的键（包括不存在的键），在键变化时
+    向监听连接发送失效消息；收到空消息（FLUSHDB 或跟踪表溢出）时清空本地缓存。
+
+    监听连接断开后跟踪失效：本地缓存清空、跟踪连接池断开重建，
+    重连成功前 matches() 返回False，调用方回退到普通GET。
+    条目另有 ttl 上限，防止失效消息丢失时长期返回旧值。
+
+    跟踪连接池与主客户端一样是有界阻塞连接池（max_connections、pool_timeout），
+    以 client="near_cache" 标签计入 redis_pool_* 指标。
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        prefixes: Iterable[str],
+        max_size: int = 10000,
+        ttl: float = 300.0,
+        health_check_interval: float = 30.0,
+        max_connections: int = 50,
+        pool_timeout: float = 2.0,
+        **connection_options: Any
+    ):
+        self.prefixes = tuple(prefixes)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.health_check_interval = health_check_interval
+        self.redirect_id: Optional[int] = None
+        self.tracking = False
+
+        self._entries: "OrderedDict[str, Tuple[float, Optional[bytes]]]" = OrderedDict()
+        self._fetching: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._ready = asyncio.Event()
+        self._listener_task: Optional[asyncio.Task] = None
+
+        # 失效监听连接：阻塞读取，不做客户端健康检查（由本类发送PING）
+        listener_options = dict(connection_options)
+        listener_options.update(socket_timeout=None, health_check_interval=0)
+        self._listener_pool = redis.ConnectionPool.from_url(
+            redis_url, encoding="utf-8", decode_responses=True, **listener_options
+        )
+
+        # 跟踪连接池：按URL选择的连接类上追加开启跟踪的握手
+        tracking_pool = InstrumentedBlockingPool.from_url(
+            redis_url,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            decode_responses=False,
+            **connection_options
+        )
+        tracking_pool.client_name = "near_cache"
+        tracking_pool.connection_class = self._tracking_connection_class(tracking_pool.connection_class)
+        self.client = redis.Redis(connection_pool=tracking_pool)
+
+    def _tracking_connection_class(self, base: type) -> type:
+        near_cache = self
+
+        class TrackingConnection(base):
+            async def on_connect(self) -> None:
+                await super().on_connect()
+                if near_cache.redirect_id is None:
+                    raise redis.ConnectionError("客户端缓存失效监听未就绪")
+                await self.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", near_cache.redirect_id)
+                response = await self.read_response()
+                if response not in (b"OK", "OK"):
+                    raise redis.ConnectionError(f"开启客户端缓存跟踪失败: {response!r}")
+
+        return TrackingConnection
+
+    def matches(self, key: str) -> bool:
+        """键是否经客户端缓存读取"""
+        return self.tracking and key.startswith(self.prefixes)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """读取原始值，本地未命中时经跟踪连接读取并缓存（不存在的键同样缓存）"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                NEAR_CACHE_REQUESTS.labels(result="hit").inc()
+                return entry[1]
+            self._entries.pop(key, None)
+        NEAR_CACHE_REQUESTS.labels(result="miss").inc()
+
+        self._fetching[key] = self._fetching.get(key, 0) + 1
+        try:
+            value = await self.client.get(key)
+        finally:
+            remaining = self._fetching[key] - 1
+            # 读取期间收到该键的失效消息时，读到的值可能已过期，不写入本地缓存
+            stale = key in self._dirty
+            if remaining:
+                self._fetching[key] = remaining
+            else:
+                del self._fetching[key]
+                self._dirty.discard(key)
+
+        if not stale and self.tracking:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            NEAR_CACHE_ENTRIES.set(len(self._entries))
+        return value
+
+    def invalidate(self, keys: Optional[Iterable[Any]]) -> None:
+        """删除本地副本，keys为None时清空全部"""
+        if keys is None:
+            self._entries.clear()
+            self._dirty.update(self._fetching)
+            NEAR_CACHE_INVALIDATIONS.labels(kind="flush").inc()
+        else:
+            for key in keys:
+                if isinstance(key, bytes):
+                    key = key.decode("utf-8")
+                self._entries.pop(key, None)
+                if key in self._fetching:
+                    self._dirty.add(key)
+                NEAR_CACHE_INVALIDATIONS.labels(kind="key").inc()
+        NEAR_CACHE_ENTRIES.set(len(self._entries))
+
+    def _set_tracking(self, tracking: bool) -> None:
+        if not tracking:
+            self.redirect_id = None
+            self.invalidate(None)
+        self.tracking = tracking
+        NEAR_CACHE_TRACKING.set(1 if tracking else 0)
+
+    async def start(self, timeout: float = 5.0):
+        """启动失效监听，等待首次跟踪探测完成"""
+        if self._listener_task is None or self._listener_task.done():
+            self._ready.clear()
+            self._listener_task = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Redis客户端缓存启动超时，暂时回退到普通GET")
+
+    async def stop(self):
+        """停止失效监听并关闭连接"""
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        self._set_tracking(False)
+        await self.client.close(close_connection_pool=True)
+        await self._listener_pool.disconnect()
+
+    async def _listen(self):
+        """订阅失效消息，连接断开或跟踪不可用时定期重试"""
+        while True:
+            connection = self._listener_pool.make_connection()
+            try:
+                await connection.connect()
+                await connection.send_command("CLIENT", "ID")
+                self.redirect_id = int(await connection.read_response())
+                await connection.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+                await connection.read_response()
+
+                # 重定向目标变更：旧跟踪连接的失效消息不再送达，断开后按新ID重建
+                await self.client.connection_pool.disconnect()
+                await self.client.ping()
+                self._set_tracking(True)
+                self._ready.set()
+                logger.info("Redis客户端缓存已启用", redirect_id=self.redirect_id, prefixes=self.prefixes)
+
+                awaiting_pong = False
+                while True:
+                    message = await connection.read_response(timeout=self.health_check_interval)
+                    if message is None:
+                        if awaiting_pong:
+                            raise redis.ConnectionError("失效监听连接无响应")
+                        await connection.send_command("PING")
+                        awaiting_pong = True
+                        continue
+
+                    awaiting_pong = False
+                    if message[0] == "message" and message[1] == INVALIDATE_CHANNEL:
+                        self.invalidate(message[2])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 包括不支持 CLIENT TRACKING 的服务端（Redis 6 之前或被ACL禁止）
+                if self.tracking or not self._ready.is_set():
+                    logger.warning("Redis客户端缓存不可用，回退到普通GET", error=str(e))
+                self._set_tracking(False)
+                self._ready.set()
+                await asyncio.sleep(self.health_check_interval)
+            finally:
+                await connection.disconnect()
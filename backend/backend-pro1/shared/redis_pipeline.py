@@ -0,0 +1,110 @@
+"""
+Redis自动流水线模块
+将同一事件循环轮次内并发发出的命令合并为一个非事务流水线发送，
+N 个并发请求只产生一次网络往返
+"""
+
+import asyncio
+from typing import Any, List, Set, Tuple
+
+import redis.asyncio as redis
+from prometheus_client import Histogram
+import structlog
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义（样本数即往返次数，样本和即命令数）
+REDIS_PIPELINE_BATCH_SIZE = Histogram(
+    "redis_auto_pipeline_batch_size",
+    "自动流水线每次往返合并的命令数",
+    ["client"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+
+
+class AutoPipeline:
+    """自动流水线
+
+    execute_command 只将命令放入待发送队列，首个命令入队时通过
+    loop.call_soon 安排一次发送，因此当前轮次内所有已就绪协程发出的命令
+    都会进入同一批；队列达到 max_batch 时立即发送。
+    批内只有一条命令时直接执行，不经过流水线。
+
+    各命令的响应或错误按顺序回填给各自的调用方，单条命令出错不影响同批其他命令；
+    连接错误会传播给整批调用方。
+    """
+
+    def __init__(self, client: redis.Redis, name: str, max_batch: int = 256):
+        if max_batch < 1:
+            raise ValueError(f"自动流水线批大小无效: {max_batch}")
+
+        self.client = client
+        self.name = name
+        self.max_batch = max_batch
+        self.commands = 0
+        self.round_trips = 0
+
+        self._pending: List[Tuple[tuple, dict, asyncio.Future]] = []
+        self._flush_scheduled = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        """排入下一批并等待该命令的响应"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((args, options, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """取出当前队列并在后台发送"""
+        self._flush_scheduled = False
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[tuple, dict, asyncio.Future]]) -> None:
+        self.commands += len(batch)
+        self.round_trips += 1
+        REDIS_PIPELINE_BATCH_SIZE.labels(client=self.name).observe(len(batch))
+
+        try:
+            if len(batch) == 1:
+                args, options, _ = batch[0]
+                results = [await self.client.execute_command(*args, **options)]
+            else:
+                pipe = self.client.pipeline(transaction=False)
+                for args, options, _ in batch:
+                    pipe.execute_command(*args, **options)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.warning("Redis自动流水线发送失败", client=self.name, commands=len(batch), error=str(e))
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            # 调用方已取消时丢弃响应
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """发送剩余命令并等待进行中的批次完成"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
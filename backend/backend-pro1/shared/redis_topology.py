@@ -0,0 +1,267 @@
+"""
+Redis部署拓扑模块
+解析单机、Sentinel 与 Cluster 连接串，创建带容量上限、阻塞等待与检出耗时指标的客户端
+
+连接串格式:
+    redis://[:password@]host:port/db                      单机（rediss:// 为TLS，unix:// 为套接字）
+    redis+sentinel://[:password@]h1:26379,h2:26379/mymaster/db   Sentinel（password用于主节点）
+    redis+cluster://[:password@]h1:6379,h2:6379           Cluster（rediss+ 前缀为TLS）
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import redis.asyncio as redis
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.sentinel import Sentinel, SentinelConnectionPool
+from prometheus_client import Counter, Gauge, Histogram
+
+# Prometheus指标定义（各worker的连接数在多进程模式下求和）
+REDIS_POOL_WAIT = Histogram(
+    "redis_pool_wait_seconds",
+    "从Redis连接池检出连接的耗时（含新建连接）",
+    ["client"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+REDIS_POOL_CONNECTIONS = Gauge(
+    "redis_pool_connections",
+    "Redis连接池连接数",
+    ["client", "state"],
+    multiprocess_mode="livesum"
+)
+
+REDIS_POOL_EXHAUSTED = Counter(
+    "redis_pool_exhausted_total",
+    "等待 pool_timeout 后仍无可用连接的次数",
+    ["client"]
+)
+
+# 部署模式
+MODE_STANDALONE = "standalone"
+MODE_SENTINEL = "sentinel"
+MODE_CLUSTER = "cluster"
+
+SCHEME_MODES = {
+    "redis": MODE_STANDALONE,
+    "rediss": MODE_STANDALONE,
+    "unix": MODE_STANDALONE,
+    "redis+sentinel": MODE_SENTINEL,
+    "rediss+sentinel": MODE_SENTINEL,
+    "redis+cluster": MODE_CLUSTER,
+    "rediss+cluster": MODE_CLUSTER,
+}
+
+
+class RedisPoolExhaustedError(redis.ConnectionError):
+    """连接池已满且等待超时（Redis本身可达，不应触发熔断）"""
+
+
+@dataclass(frozen=True)
+class RedisTopology:
+    """解析后的Redis部署拓扑"""
+
+    mode: str
+    url: str
+    nodes: Tuple[Tuple[str, int], ...] = ()
+    service_name: Optional[str] = None
+    db: int = 0
+    username: Optional[str] = None
+    password: Optional[str] = None
+    ssl: bool = False
+    sentinel_password: Optional[str] = None
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisTopology":
+        """解析连接串"""
+        parts = urlsplit(url)
+        mode = SCHEME_MODES.get(parts.scheme)
+        if mode is None:
+            raise ValueError(f"不支持的Redis连接串协议: {parts.scheme}")
+        if mode == MODE_STANDALONE:
+            return cls(mode=mode, url=url)
+
+        # 多主机的 netloc 无法由 urlsplit 解析端口，手动拆分
+        userinfo, _, hosts = parts.netloc.rpartition("@")
+        username, _, password = userinfo.partition(":") if userinfo else ("", "", "")
+        default_port = 26379 if mode == MODE_SENTINEL else 6379
+        nodes = []
+        for host in hosts.split(","):
+            name, _, port = host.strip().rpartition(":") if ":" in host else (host.strip(), "", "")
+            nodes.append((name, int(port) if port else default_port))
+        if not nodes or not nodes[0][0]:
+            raise ValueError(f"Redis连接串缺少节点地址: {url}")
+
+        path = [segment for segment in parts.path.split("/") if segment]
+        query = parse_qs(parts.query)
+        service_name = None
+        db = 0
+        if mode == MODE_SENTINEL:
+            if not path:
+                raise ValueError("Sentinel连接串缺少主节点服务名，例如 redis+sentinel://h1:26379/mymaster/0")
+            service_name = path[0]
+            db = int(path[1]) if len(path) > 1 else 0
+        elif path and path[0] != "0":
+            raise ValueError("Cluster模式只支持0号数据库")
+
+        return cls(
+            mode=mode,
+            url=url,
+            nodes=tuple(nodes),
+            service_name=service_name,
+            db=db,
+            username=unquote(username) or None,
+            password=unquote(password) or None,
+            ssl=parts.scheme.startswith("rediss"),
+            sentinel_password=query.get("sentinel_password", [None])[0],
+        )
+
+
+class _InstrumentedPoolMixin:
+    """记录连接检出耗时与连接数的阻塞连接池
+
+    redis-py 5.0.1 的 BlockingConnectionPool 在持有条件锁时建立连接，连接失败后
+    在锁内调用 release() 再次请求同一把锁，导致一直阻塞到 pool_timeout、
+    错误被报告为连接池耗尽且槽位泄漏。这里只在锁内占用槽位，在锁外建立连接。
+    """
+
+    client_name = "default"
+
+    async def get_connection(self, command_name, *keys, **options):
+        start_time = time.perf_counter()
+        try:
+            async with self._condition:
+                await asyncio.wait_for(self._condition.wait_for(self.can_get_connection), self.timeout)
+                try:
+                    connection = self._available_connections.pop()
+                except IndexError:
+                    connection = self.make_connection()
+                self._in_use_connections.add(connection)
+        except asyncio.TimeoutError:
+            REDIS_POOL_EXHAUSTED.labels(client=self.client_name).inc()
+            raise RedisPoolExhaustedError(
+                f"Redis连接池已满（max_connections={self.max_connections}）"
+            ) from None
+
+        try:
+            await self.ensure_connection(connection)
+        except BaseException:
+            await self.release(connection)
+            raise
+
+        REDIS_POOL_WAIT.labels(client=self.client_name).observe(time.perf_counter() - start_time)
+        self._export()
+        return connection
+
+    async def release(self, connection):
+        await super().release(connection)
+        self._export()
+
+    def _export(self) -> None:
+        REDIS_POOL_CONNECTIONS.labels(client=self.client_name, state="in_use").set(len(self._in_use_connections))
+        REDIS_POOL_CONNECTIONS.labels(client=self.client_name, state="idle").set(len(self._available_connections))
+
+    def stats(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "in_use": len(self._in_use_connections),
+            "idle": len(self._available_connections),
+        }
+
+
+class InstrumentedBlockingPool(_InstrumentedPoolMixin, redis.BlockingConnectionPool):
+    """单机模式连接池"""
+
+
+class InstrumentedSentinelPool(_InstrumentedPoolMixin, SentinelConnectionPool, redis.BlockingConnectionPool):
+    """Sentinel模式连接池（主节点切换后连接自动指向新主节点）"""
+
+
+def create_client(
+    topology: RedisTopology,
+    client_name: str,
+    decode_responses: bool,
+    max_connections: int,
+    pool_timeout: float,
+    socket_timeout: float,
+    socket_connect_timeout: float,
+    health_check_interval: int = 30,
+) -> Union[redis.Redis, RedisCluster]:
+    """按拓扑创建客户端
+
+    单机与Sentinel模式使用阻塞连接池：连接数达到 max_connections 后
+    最多等待 pool_timeout 秒。Cluster模式的 max_connections 为每个节点的上限，
+    达到上限时立即报错（redis-py 的集群连接池不支持阻塞等待）。
+    """
+    options: Dict[str, Any] = dict(
+        decode_responses=decode_responses,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=socket_connect_timeout,
+        health_check_interval=health_check_interval,
+    )
+    if decode_responses:
+        options["encoding"] = "utf-8"
+
+    if topology.mode == MODE_CLUSTER:
+        return RedisCluster(
+            startup_nodes=[ClusterNode(host, port) for host, port in topology.nodes],
+            max_connections=max_connections,
+            username=topology.username,
+            password=topology.password,
+            ssl=topology.ssl,
+            **options
+        )
+
+    if topology.mode == MODE_SENTINEL:
+        sentinel = Sentinel(
+            topology.nodes,
+            sentinel_kwargs=dict(
+                socket_timeout=socket_timeout,
+                socket_connect_timeout=socket_connect_timeout,
+                password=topology.sentinel_password,
+            ),
+        )
+        pool = InstrumentedSentinelPool(
+            topology.service_name,
+            sentinel,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            db=topology.db,
+            username=topology.username,
+            password=topology.password,
+            ssl=topology.ssl,
+            retry_on_timeout=True,
+            **options
+        )
+    else:
+        pool = InstrumentedBlockingPool.from_url(
+            topology.url,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            retry_on_timeout=True,
+            **options
+        )
+
+    pool.client_name = client_name
+    return redis.Redis.from_pool(pool)
+
+
+def create_pubsub_client(cluster: RedisCluster, topology: RedisTopology) -> redis.Redis:
+    """Cluster模式的发布订阅客户端
+
+    redis-py 的异步集群客户端不支持 pubsub()；集群内 PUBLISH 会广播到所有节点，
+    因此订阅任一节点即可收到全部消息。
+    """
+    node = cluster.get_default_node()
+    return redis.Redis(
+        host=node.host,
+        port=node.port,
+        username=topology.username,
+        password=topology.password,
+        ssl=topology.ssl,
+        decode_responses=True,
+        encoding="utf-8",
+    )
@@ -0,0 +1,86 @@
+"""
+流式响应模块
+将 Database.stream() 等异步行迭代器以NDJSON或JSON数组形式边查边发，
+避免在内存中物化整个结果集
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Optional
+
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# 每次向客户端发送的行数，减少小块写入的开销
+DEFAULT_CHUNK_ROWS = 100
+
+
+def _json_default(value: Any) -> Any:
+    """序列化数据库记录中的非JSON类型"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode_row(row: Any) -> str:
+    """Record/映射按对象编码，元组按数组编码"""
+    if not isinstance(row, (dict, tuple, list)) and hasattr(row, "items"):
+        row = dict(row.items())
+    return json.dumps(row, ensure_ascii=False, default=_json_default)
+
+
+async def _ndjson_chunks(rows: AsyncIterable[Any], chunk_rows: int) -> AsyncIterator[bytes]:
+    lines = []
+    async for row in rows:
+        lines.append(_encode_row(row))
+        if len(lines) >= chunk_rows:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def _json_array_chunks(rows: AsyncIterable[Any], chunk_rows: int) -> AsyncIterator[bytes]:
+    yield b"["
+    lines = []
+    first = True
+    async for row in rows:
+        lines.append(_encode_row(row))
+        if len(lines) >= chunk_rows:
+            yield (("" if first else ",") + ",".join(lines)).encode("utf-8")
+            first = False
+            lines = []
+    if lines:
+        yield (("" if first else ",") + ",".join(lines)).encode("utf-8")
+    yield b"]"
+
+
+def ndjson_response(
+    rows: AsyncIterable[Any],
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> StreamingResponse:
+    """以NDJSON（每行一个JSON对象）流式返回结果"""
+    return StreamingResponse(
+        _ndjson_chunks(rows, chunk_rows),
+        status_code=status_code,
+        headers=headers,
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+def json_array_response(
+    rows: AsyncIterable[Any],
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> StreamingResponse:
+    """以JSON数组流式返回结果（适用于不支持NDJSON的客户端）"""
+    return StreamingResponse(
+        _json_array_chunks(rows, chunk_rows),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json"
+    )
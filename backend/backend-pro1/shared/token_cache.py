@@ -0,0 +1,105 @@
+"""
+令牌验证缓存模块
+缓存已通过签名校验的JWT载荷，避免对同一令牌重复执行HMAC校验
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from prometheus_client import Counter
+import structlog
+
+from .config import get_settings
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义
+TOKEN_CACHE_REQUESTS = Counter(
+    "token_cache_requests_total",
+    "令牌验证缓存查询次数",
+    ["result"]
+)
+
+# 撤销检查钩子：接收令牌载荷，返回True表示令牌（可能）已被撤销
+RevocationHook = Callable[[dict], bool]
+
+
+class TokenVerificationCache:
+    """已验证令牌的有界LRU缓存
+
+    以令牌摘要为键，条目在令牌 exp 时刻过期。命中时依次调用已注册的
+    撤销钩子，任一钩子判定撤销则淘汰条目并视为未命中，判定撤销的载荷也不写入缓存；
+    登出时 evict() 只淘汰本worker的条目，其他worker经钩子感知撤销。
+    钩子只需廉价的本地判断（允许误判），权威的撤销检查仍由 get_current_user
+    与刷新令牌接口经 TokenRevocationList 完成。
+    """
+
+    _entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+    _revocation_hooks: List[RevocationHook] = []
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        """计算令牌摘要"""
+        return hashlib.blake2b(token.encode("utf-8"), digest_size=20).digest()
+
+    @classmethod
+    def get(cls, token: str) -> Optional[dict]:
+        """获取已验证的令牌载荷"""
+        key = cls._digest(token)
+        entry = cls._entries.get(key)
+        if entry is None:
+            TOKEN_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+
+        expires_at, payload = entry
+        if expires_at <= time.time():
+            cls._entries.pop(key, None)
+            TOKEN_CACHE_REQUESTS.labels(result="expired").inc()
+            return None
+
+        if cls.is_revoked(payload):
+            cls._entries.pop(key, None)
+            TOKEN_CACHE_REQUESTS.labels(result="revoked").inc()
+            return None
+
+        cls._entries.move_to_end(key)
+        TOKEN_CACHE_REQUESTS.labels(result="hit").inc()
+        return dict(payload)
+
+    @classmethod
+    def put(cls, token: str, payload: dict) -> None:
+        """缓存已验证的令牌载荷（无exp声明或判定撤销的令牌不缓存）"""
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)) or cls.is_revoked(payload):
+            return
+
+        key = cls._digest(token)
+        cls._entries[key] = (float(exp), dict(payload))
+        cls._entries.move_to_end(key)
+
+        max_size = get_settings().TOKEN_CACHE_MAX_SIZE
+        while len(cls._entries) > max_size:
+            cls._entries.popitem(last=False)
+
+    @classmethod
+    def evict(cls, token: str) -> None:
+        """淘汰指定令牌（登出时调用，仅影响本worker）"""
+        cls._entries.pop(cls._digest(token), None)
+
+    @classmethod
+    def is_revoked(cls, payload: dict) -> bool:
+        """任一撤销钩子判定撤销时返回True"""
+        return any(hook(payload) for hook in cls._revocation_hooks)
+
+    @classmethod
+    def add_revocation_hook(cls, hook: RevocationHook) -> None:
+        """注册撤销检查钩子"""
+        if hook not in cls._revocation_hooks:
+            cls._revocation_hooks.append(hook)
+
+    @classmethod
+    def clear(cls) -> None:
+        """清空缓存"""
+        cls._entries.clear()
@@ -0,0 +1,206 @@
+"""
+令牌撤销模块
+Redis存储已撤销的令牌JTI，各worker维护定期同步的本地布隆过滤器，
+仅在过滤器判定可能命中时才查询Redis
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from typing import Iterable, Optional
+
+from prometheus_client import Counter, Gauge
+import structlog
+
+from .config import get_settings
+from .redis_client import RedisClient
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义
+TOKEN_REVOCATION_CHECKS = Counter(
+    "token_revocation_checks_total",
+    "令牌撤销检查次数",
+    ["result"]
+)
+
+TOKEN_REVOCATION_SYNC_ENTRIES = Gauge(
+    "token_revocation_bloom_entries",
+    "本地布隆过滤器中的已撤销令牌数",
+    multiprocess_mode="livemax"
+)
+
+# Redis键
+REVOKED_TOKEN_KEY_PREFIX = "revoked_token:"
+REVOKED_TOKEN_INDEX_KEY = "revoked_tokens"
+
+
+class BloomFilter:
+    """基于双重哈希的布隆过滤器"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class TokenRevocationList:
+    """令牌撤销列表
+
+    撤销的JTI以令牌剩余有效期为TTL写入Redis，同时记录在按过期时间排序的
+    索引中，各worker据此周期性重建本地布隆过滤器。其他worker撤销的令牌
+    最多在一个同步周期后生效。
+    """
+
+    _bloom: Optional[BloomFilter] = None
+    _sync_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def _new_bloom(cls) -> BloomFilter:
+        settings = get_settings()
+        return BloomFilter(
+            settings.TOKEN_REVOCATION_BLOOM_CAPACITY,
+            settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE
+        )
+
+    @classmethod
+    def _get_bloom(cls) -> BloomFilter:
+        if cls._bloom is None:
+            cls._bloom = cls._new_bloom()
+        return cls._bloom
+
+    @classmethod
+    async def revoke(cls, payload: dict) -> bool:
+        """撤销令牌，返回是否写入撤销列表"""
+        jti = payload.get("jti")
+        exp = payload.get("exp")
+        if not jti or not isinstance(exp, (int, float)):
+            logger.warning("令牌缺少jti或exp声明，无法撤销", sub=payload.get("sub"))
+            return False
+
+        ttl = int(math.ceil(exp - time.time()))
+        if ttl <= 0:
+            return False
+
+        if not RedisClient._client:
+            raise RuntimeError("Redis客户端未初始化")
+
+        try:
+            pipe = RedisClient._client.pipeline(transaction=False)
+            pipe.set(f"{REVOKED_TOKEN_KEY_PREFIX}{jti}", "1", ex=ttl)
+            pipe.zadd(REVOKED_TOKEN_INDEX_KEY, {jti: exp})
+            await pipe.execute()
+        except Exception as e:
+            logger.error("令牌撤销写入失败", jti=jti, error=str(e))
+            raise
+
+        cls._get_bloom().add(jti)
+        TOKEN_REVOCATION_SYNC_ENTRIES.set(cls._get_bloom().count)
+        return True
+
+    @classmethod
+    def might_be_revoked(cls, payload: dict) -> bool:
+        """仅查询本地布隆过滤器（无IO）：False表示确定未撤销，True可能为误判"""
+        jti = payload.get("jti")
+        return bool(jti) and jti in cls._get_bloom()
+
+    @classmethod
+    async def is_revoked(cls, payload: dict) -> bool:
+        """检查令牌是否已撤销"""
+        jti = payload.get("jti")
+        if not jti:
+            TOKEN_REVOCATION_CHECKS.labels(result="no_jti").inc()
+            return False
+
+        if jti not in cls._get_bloom():
+            TOKEN_REVOCATION_CHECKS.labels(result="bloom_negative").inc()
+            return False
+
+        try:
+            revoked = await RedisClient.exists(f"{REVOKED_TOKEN_KEY_PREFIX}{jti}")
+        except Exception as e:
+            # 布隆过滤器已判定可能撤销，Redis不可用时按已撤销处理
+            logger.error("令牌撤销状态查询失败", jti=jti, error=str(e))
+            TOKEN_REVOCATION_CHECKS.labels(result="error").inc()
+            return True
+
+        TOKEN_REVOCATION_CHECKS.labels(
+            result="revoked" if revoked else "false_positive"
+        ).inc()
+        return revoked
+
+    @classmethod
+    async def sync(cls) -> None:
+        """从Redis重建本地布隆过滤器，同时清理索引中已过期的条目"""
+        if not RedisClient._client:
+            return
+
+        now = time.time()
+        pipe = RedisClient._client.pipeline(transaction=False)
+        pipe.zremrangebyscore(REVOKED_TOKEN_INDEX_KEY, "-inf", now)
+        pipe.zrange(REVOKED_TOKEN_INDEX_KEY, 0, -1)
+        _, jtis = await pipe.execute()
+
+        bloom = cls._new_bloom()
+        for jti in jtis:
+            bloom.add(jti)
+
+        if bloom.count > get_settings().TOKEN_REVOCATION_BLOOM_CAPACITY:
+            logger.warning(
+                "已撤销令牌数超过布隆过滤器容量，误判率将上升",
+                entries=bloom.count
+            )
+
+        cls._bloom = bloom
+        TOKEN_REVOCATION_SYNC_ENTRIES.set(bloom.count)
+
+    @classmethod
+    async def start(cls):
+        """启动同步任务"""
+        if cls._sync_task is None or cls._sync_task.done():
+            cls._sync_task = asyncio.create_task(cls._sync_loop())
+            logger.info("令牌撤销列表同步已启动")
+
+    @classmethod
+    async def stop(cls):
+        """停止同步任务"""
+        if cls._sync_task:
+            cls._sync_task.cancel()
+            try:
+                await cls._sync_task
+            except asyncio.CancelledError:
+                pass
+            cls._sync_task = None
+
+    @classmethod
+    async def _sync_loop(cls):
+        """周期性同步"""
+        interval = get_settings().TOKEN_REVOCATION_SYNC_INTERVAL_SECONDS
+        while True:
+            try:
+                await cls.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("令牌撤销列表同步失败", error=str(e))
+            await asyncio.sleep(interval)
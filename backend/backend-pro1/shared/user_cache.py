@@ -0,0 +1,222 @@
+"""
+用户缓存模块
+为认证依赖提供进程内LRU + Redis两级用户缓存
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+import structlog
+
+from .config import get_settings
+from .redis_client import RedisClient
+
+logger = structlog.get_logger()
+
+# Prometheus指标定义
+USER_CACHE_REQUESTS = Counter(
+    "user_cache_requests_total",
+    "用户缓存查询次数",
+    ["tier", "result"]
+)
+
+USER_CACHE_INVALIDATIONS = Counter(
+    "user_cache_invalidations_total",
+    "用户缓存失效次数",
+    ["source"]
+)
+
+USER_CACHE_LOCAL_ENTRIES = Gauge(
+    "user_cache_local_entries",
+    "进程内用户缓存条目数",
+    multiprocess_mode="livesum"
+)
+
+# Redis键前缀和失效广播频道
+USER_CACHE_KEY_PREFIX = "user_cache:"
+USER_CACHE_INVALIDATION_CHANNEL = "user_cache:invalidate"
+
+UserRecord = Dict[str, Any]
+UserLoader = Callable[[int], Awaitable[Optional[UserRecord]]]
+
+# 缓存记录中不允许出现的凭据列（加载器应使用不含这些列的查询）
+SENSITIVE_COLUMNS = ("password_hash",)
+
+
+def _cacheable(record: UserRecord) -> UserRecord:
+    """转换为可序列化的普通字典：日期时间转为ISO字符串，剔除凭据列
+
+    本地与Redis两级返回相同的结构，不依赖Redis编解码器对日期时间的处理。
+    """
+    return {
+        key: value.isoformat() if isinstance(value, (datetime, date)) else value
+        for key, value in record.items()
+        if key not in SENSITIVE_COLUMNS
+    }
+
+
+class UserCache:
+    """两级用户缓存
+
+    第一级为进程内有界LRU（短TTL），第二级为Redis共享缓存。
+    用户被禁用或档案更新时需调用 invalidate()，失效消息通过Redis
+    发布订阅广播到所有worker；shared.users 中的写操作已在提交后调用。
+    绕过这些写操作直接修改数据库时，各worker最多在
+    USER_CACHE_REDIS_TTL_SECONDS + USER_CACHE_LOCAL_TTL_SECONDS 秒（默认330秒）内仍读到旧记录。
+    """
+
+    _local: "OrderedDict[int, Tuple[float, UserRecord]]" = OrderedDict()
+    _listener_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def _local_get(cls, user_id: int) -> Optional[UserRecord]:
+        """读取进程内缓存"""
+        entry = cls._local.get(user_id)
+        if entry is None:
+            return None
+
+        expires_at, record = entry
+        if expires_at <= time.monotonic():
+            cls._local.pop(user_id, None)
+            USER_CACHE_LOCAL_ENTRIES.set(len(cls._local))
+            return None
+
+        cls._local.move_to_end(user_id)
+        return record
+
+    @classmethod
+    def _local_set(cls, user_id: int, record: UserRecord) -> None:
+        """写入进程内缓存，超出容量时淘汰最久未使用的条目"""
+        settings = get_settings()
+        cls._local[user_id] = (
+            time.monotonic() + settings.USER_CACHE_LOCAL_TTL_SECONDS,
+            record
+        )
+        cls._local.move_to_end(user_id)
+
+        while len(cls._local) > settings.USER_CACHE_LOCAL_MAX_SIZE:
+            cls._local.popitem(last=False)
+
+        USER_CACHE_LOCAL_ENTRIES.set(len(cls._local))
+
+    @classmethod
+    def _local_evict(cls, user_id: int) -> None:
+        """删除进程内缓存条目"""
+        cls._local.pop(user_id, None)
+        USER_CACHE_LOCAL_ENTRIES.set(len(cls._local))
+
+    @classmethod
+    async def get_or_load(cls, user_id: int, loader: UserLoader) -> Optional[UserRecord]:
+        """按 本地 -> Redis -> 数据库 顺序获取用户记录"""
+        record = cls._local_get(user_id)
+        if record is not None:
+            USER_CACHE_REQUESTS.labels(tier="local", result="hit").inc()
+            return record
+        USER_CACHE_REQUESTS.labels(tier="local", result="miss").inc()
+
+        key = f"{USER_CACHE_KEY_PREFIX}{user_id}"
+
+        try:
+            record = await RedisClient.get(key)
+        except Exception as e:
+            # Redis不可用时直接回源数据库
+            logger.warning("用户缓存读取Redis失败", user_id=user_id, error=str(e))
+            record = None
+
+        if isinstance(record, dict):
+            USER_CACHE_REQUESTS.labels(tier="redis", result="hit").inc()
+            cls._local_set(user_id, record)
+            return record
+        USER_CACHE_REQUESTS.labels(tier="redis", result="miss").inc()
+
+        record = await loader(user_id)
+        if record is None:
+            return None
+
+        record = _cacheable(record)
+        cls._local_set(user_id, record)
+
+        try:
+            await RedisClient.set(
+                key,
+                record,
+                expire=get_settings().USER_CACHE_REDIS_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.warning("用户缓存写入Redis失败", user_id=user_id, error=str(e))
+
+        return record
+
+    @classmethod
+    async def invalidate(cls, user_id: int) -> None:
+        """使用户缓存失效（用户被禁用或档案更新后调用）"""
+        cls._local_evict(user_id)
+        USER_CACHE_INVALIDATIONS.labels(source="local").inc()
+
+        try:
+            await RedisClient.delete(f"{USER_CACHE_KEY_PREFIX}{user_id}")
+            if RedisClient._client:
+                await RedisClient._client.publish(
+                    USER_CACHE_INVALIDATION_CHANNEL, str(user_id)
+                )
+        except Exception as e:
+            logger.error("用户缓存失效广播失败", user_id=user_id, error=str(e))
+
+    @classmethod
+    def clear(cls) -> None:
+        """清空进程内缓存"""
+        cls._local.clear()
+        USER_CACHE_LOCAL_ENTRIES.set(0)
+
+    @classmethod
+    async def start(cls):
+        """启动失效广播监听任务"""
+        if cls._listener_task is None or cls._listener_task.done():
+            cls._listener_task = asyncio.create_task(cls._listen_invalidations())
+            logger.info("用户缓存失效监听已启动")
+
+    @classmethod
+    async def stop(cls):
+        """停止失效广播监听任务"""
+        if cls._listener_task:
+            cls._listener_task.cancel()
+            try:
+                await cls._listener_task
+            except asyncio.CancelledError:
+                pass
+            cls._listener_task = None
+        cls.clear()
+
+    @classmethod
+    async def _listen_invalidations(cls):
+        """订阅失效频道并淘汰本地条目，连接断开后自动重连"""
+        while True:
+            try:
+                if not RedisClient._client:
+                    await asyncio.sleep(1)
+                    continue
+
+                pubsub = RedisClient.pubsub()
+                await pubsub.subscribe(USER_CACHE_INVALIDATION_CHANNEL)
+                try:
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        try:
+                            cls._local_evict(int(message["data"]))
+                            USER_CACHE_INVALIDATIONS.labels(source="broadcast").inc()
+                        except (TypeError, ValueError):
+                            continue
+                finally:
+                    await pubsub.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 重连期间无法收到广播，清空本地缓存以保证一致性
+                logger.warning("用户缓存失效监听中断，准备重连", error=str(e))
+                cls.clear()
+                await asyncio.sleep(1)
@@ -0,0 +1,54 @@
+"""
+用户写操作模块
+修改用户记录的写路径，提交后使用户缓存失效
+"""
+
+from typing import Optional
+
+import structlog
+
+from .database import Database
+from .queries import DEACTIVATE_USER, UPDATE_LAST_LOGIN, UPDATE_USER_PROFILE
+from .user_cache import UserCache
+
+logger = structlog.get_logger()
+
+
+def _affected_rows(status: str) -> int:
+    """从命令状态（如 "UPDATE 1"）中解析影响行数"""
+    try:
+        return int(status.rsplit(" ", 1)[-1])
+    except (AttributeError, ValueError):
+        return 0
+
+
+async def record_login(user_id: int) -> None:
+    """更新最后登录时间（缓存记录包含 last_login_at）"""
+    await Database.execute(UPDATE_LAST_LOGIN, user_id)
+    await UserCache.invalidate(user_id)
+
+
+async def update_user_profile(
+    user_id: int,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    avatar_url: Optional[str] = None
+) -> bool:
+    """更新用户档案，未提供的字段保留原值；返回是否存在该用户的档案"""
+    status = await Database.execute(UPDATE_USER_PROFILE, user_id, first_name, last_name, avatar_url)
+    await UserCache.invalidate(user_id)
+    return _affected_rows(status) > 0
+
+
+async def deactivate_user(user_id: int) -> bool:
+    """禁用用户；返回是否由本次调用禁用
+
+    失效后各worker的下一次认证回源数据库，活跃用户查询不再返回该用户。
+    """
+    status = await Database.execute(DEACTIVATE_USER, user_id)
+    await UserCache.invalidate(user_id)
+
+    deactivated = _affected_rows(status) > 0
+    if deactivated:
+        logger.info("用户已禁用", user_id=user_id)
+    return deactivated
@@ -0,0 +1,143 @@
+"""
+熔断器测试
+"""
+
+import asyncio
+
+import pytest
+import redis.asyncio as redis
+from redis.exceptions import MaxConnectionsError
+
+from shared.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from shared.redis_client import RedisClient
+from shared.redis_topology import RedisPoolExhaustedError
+
+
+def make_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        "test",
+        failure_threshold=3,
+        reset_timeout=10.0,
+        failure_types=(redis.ConnectionError, redis.TimeoutError),
+        ignore_types=(RedisPoolExhaustedError,)
+    )
+
+
+def fail(breaker: CircuitBreaker, error: BaseException) -> None:
+    with pytest.raises(type(error)):
+        with breaker:
+            raise error
+
+
+def expire_cooldown(breaker: CircuitBreaker) -> None:
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_opens_after_consecutive_failures():
+    breaker = make_breaker()
+
+    for _ in range(2):
+        fail(breaker, redis.ConnectionError("down"))
+    assert breaker.state == CLOSED
+
+    fail(breaker, redis.TimeoutError("timeout"))
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        with breaker:
+            pass
+
+
+def test_success_resets_failure_count():
+    breaker = make_breaker()
+
+    fail(breaker, redis.ConnectionError("down"))
+    fail(breaker, redis.ConnectionError("down"))
+    with breaker:
+        pass
+    fail(breaker, redis.ConnectionError("down"))
+
+    assert breaker.state == CLOSED
+    assert breaker.failures == 1
+
+
+def test_half_open_probe_success_closes():
+    breaker = make_breaker()
+    for _ in range(3):
+        fail(breaker, redis.ConnectionError("down"))
+    expire_cooldown(breaker)
+
+    with breaker:
+        assert breaker.state == HALF_OPEN
+        # 探测期间的其他调用仍被拒绝
+        with pytest.raises(CircuitOpenError):
+            with breaker:
+                pass
+
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = make_breaker()
+    for _ in range(3):
+        fail(breaker, redis.ConnectionError("down"))
+    expire_cooldown(breaker)
+
+    fail(breaker, redis.ConnectionError("still down"))
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        with breaker:
+            pass
+
+
+def test_other_errors_count_as_success():
+    breaker = make_breaker()
+    fail(breaker, redis.ConnectionError("down"))
+    fail(breaker, redis.ConnectionError("down"))
+
+    # 命令错误说明Redis可达
+    fail(breaker, redis.ResponseError("WRONGTYPE"))
+
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_ignored_errors_keep_state_and_release_probe():
+    breaker = make_breaker()
+    for _ in range(3):
+        fail(breaker, redis.ConnectionError("down"))
+    expire_cooldown(breaker)
+
+    fail(breaker, RedisPoolExhaustedError("pool exhausted"))
+    assert breaker.state == HALF_OPEN
+
+    # 探测名额已释放，下一次调用可以继续探测
+    with breaker:
+        pass
+    assert breaker.state == CLOSED
+
+
+async def test_cancellation_is_ignored():
+    breaker = make_breaker()
+    fail(breaker, redis.ConnectionError("down"))
+    fail(breaker, redis.ConnectionError("down"))
+
+    with pytest.raises(asyncio.CancelledError):
+        with breaker:
+            raise asyncio.CancelledError()
+
+    assert breaker.state == CLOSED
+    assert breaker.failures == 2
+
+
+@pytest.mark.parametrize("error", [RedisPoolExhaustedError("pool"), MaxConnectionsError()])
+def test_redis_client_does_not_trip_on_pool_exhaustion(error):
+    breaker = RedisClient._circuit
+    failures, state = breaker.failures, breaker.state
+
+    for _ in range(breaker.failure_threshold + 1):
+        fail(breaker, error)
+
+    assert (breaker.failures, breaker.state) == (failures, state)
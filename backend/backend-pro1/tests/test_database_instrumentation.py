@@ -0,0 +1,89 @@
+"""
+数据库查询埋点测试
+"""
+
+import json
+
+from shared.database_instrumentation import QueryInstrumentation, redact_params, summarize_plan
+
+PLAN = {
+    "Plan": {
+        "Node Type": "Nested Loop",
+        "Actual Total Time": 1.5,
+        "Actual Rows": 1,
+        "Plans": [
+            {
+                "Node Type": "Index Scan",
+                "Relation Name": "users",
+                "Index Name": "users_email_key",
+                "Index Cond": "((email)::text = 'alice@example.com'::text)",
+                "Actual Rows": 1,
+            },
+            {
+                "Node Type": "Seq Scan",
+                "Relation Name": "user_profiles",
+                "Filter": "(user_id = 42)",
+                "Rows Removed by Filter": 99,
+                "Actual Rows": 1,
+            },
+        ],
+    },
+    "Planning Time": 0.2,
+    "Execution Time": 1.7,
+}
+
+
+def test_summarize_plan_drops_conditions_with_literals():
+    summary = summarize_plan(PLAN)
+
+    text = json.dumps(summary)
+    assert "alice@example.com" not in text
+    assert "42" not in text
+    assert summary["Execution Time"] == 1.7
+    assert [child["Node Type"] for child in summary["Plan"]["Plans"]] == ["Index Scan", "Seq Scan"]
+    assert summary["Plan"]["Plans"][0]["Index Name"] == "users_email_key"
+
+
+def test_redact_params_keeps_only_types():
+    assert redact_params(("alice@example.com", 42, None)) == ["<str len=17>", "<int>", "NULL"]
+
+
+class FakeTransaction:
+    async def start(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class FakeConnection:
+    def transaction(self, readonly=False):
+        return FakeTransaction()
+
+    async def fetchval(self, query, *params):
+        return json.dumps([PLAN])
+
+
+class FakeController:
+    def __init__(self):
+        self.acquired = 0
+        self.released = 0
+
+    async def acquire(self, timeout=None):
+        self.acquired += 1
+        return FakeConnection()
+
+    async def release(self, connection):
+        self.released += 1
+
+
+async def test_explain_goes_through_controller_and_stores_summary(monkeypatch):
+    controller = FakeController()
+    monkeypatch.setattr(QueryInstrumentation, "_explain_controller", controller)
+    sample = {"sql": "SELECT * FROM users WHERE email = $1"}
+
+    await QueryInstrumentation._explain("user_by_email", sample["sql"], ("alice@example.com",), sample)
+
+    assert (controller.acquired, controller.released) == (1, 1)
+    assert sample["explain"]["execution_time_ms"] == 1.7
+    assert "alice@example.com" not in json.dumps(sample["explain"])
@@ -0,0 +1,112 @@
+"""
+连接池容量控制器测试（使用不建立真实连接的假连接池）
+"""
+
+import asyncio
+
+import pytest
+
+from shared.database_pool import PoolController
+
+
+class FakePool:
+    """只记录检出与归还的连接池"""
+
+    def __init__(self):
+        self.in_use = 0
+
+    async def acquire(self, timeout=None):
+        self.in_use += 1
+        return object()
+
+    async def release(self, connection):
+        self.in_use -= 1
+
+    def get_size(self):
+        return self.in_use
+
+    def get_idle_size(self):
+        return 0
+
+
+def make_controller(limit: int = 1) -> PoolController:
+    return PoolController(FakePool(), "test", min_size=1, max_size=limit, initial_size=limit)
+
+
+async def test_acquire_times_out_when_limit_reached():
+    controller = make_controller()
+    connection = await controller.acquire()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await controller.acquire(timeout=0.05)
+
+    assert controller.status()["waiting"] == 0
+    await controller.release(connection)
+
+
+async def test_waiter_receives_released_permit():
+    controller = make_controller()
+    connection = await controller.acquire()
+
+    waiter = asyncio.create_task(controller.acquire(timeout=1))
+    await asyncio.sleep(0)
+    await controller.release(connection)
+
+    await controller.release(await waiter)
+    assert controller.status()["in_use"] == 0
+
+
+async def test_cancel_after_notify_hands_permit_to_next_waiter():
+    controller = make_controller()
+    connection = await controller.acquire()
+
+    first = asyncio.create_task(controller.acquire())
+    second = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    assert controller.status()["waiting"] == 2
+
+    # 归还连接唤醒第一个等待者，它在恢复运行前被取消（如客户端断开）
+    await controller.release(connection)
+    first.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    await controller.release(await asyncio.wait_for(second, timeout=1))
+
+    status = controller.status()
+    assert (status["in_use"], status["waiting"]) == (0, 0)
+
+
+class ProbeConnection:
+    async def fetchval(self, query, timeout=None):
+        return 42
+
+
+class ProbePool(FakePool):
+    async def acquire(self, timeout=None):
+        await super().acquire(timeout)
+        return ProbeConnection()
+
+
+async def test_headroom_probe_holds_a_permit():
+    controller = PoolController(ProbePool(), "test", min_size=1, max_size=2, initial_size=2)
+    connection = await controller.acquire()
+
+    await controller._check_server_headroom()
+
+    assert controller.server_headroom == 42
+    assert controller.status()["in_use"] == 1
+    assert controller.pool.in_use == 1
+    await controller.release(connection)
+
+
+async def test_headroom_probe_skipped_without_free_permit():
+    controller = PoolController(ProbePool(), "test", min_size=1, max_size=1, initial_size=1)
+    connection = await controller.acquire()
+
+    await controller._check_server_headroom()
+
+    # 探测不会越过检出上限向连接池多取一个连接
+    assert controller.server_headroom is None
+    assert controller.pool.in_use == 1
+    await controller.release(connection)
@@ -0,0 +1,72 @@
+"""
+函数结果缓存测试
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from shared.cache import CachePolicy, FunctionCache
+from shared.redis_client import RedisClient
+
+POLICY = CachePolicy(namespace="test", ttl=60, stale_ttl=60, local_ttl=0, beta=0, cache_none=False)
+KEY = "cache:test:v1:key"
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, fake_redis):
+    """每个用例使用独立的进程内状态"""
+    monkeypatch.setattr(FunctionCache, "_local", type(FunctionCache._local)())
+    monkeypatch.setattr(FunctionCache, "_inflight", {})
+    monkeypatch.setattr(FunctionCache, "_refreshing", {})
+    monkeypatch.setattr(FunctionCache, "_background", set())
+
+
+def counting_loader(value):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return value
+
+    return loader, calls
+
+
+async def test_miss_does_not_wait_for_skipped_refresh():
+    """其他副本持有刷新锁时后台刷新被跳过，同时发生的未命中仍应回源得到新值"""
+    await RedisClient.set(KEY, ["stale", time.time() - 1, 0.01], expire=60)
+    await RedisClient.set(f"{KEY}:refresh", 1, expire=60, nx=True)
+    loader, calls = counting_loader("fresh")
+
+    assert await FunctionCache.get_or_load(KEY, POLICY, loader) == "stale"
+
+    # 旧值在刷新任务运行期间被删除（失效或物理过期），下一次调用未命中
+    await RedisClient.delete(KEY)
+    assert await FunctionCache.get_or_load(KEY, POLICY, loader) == "fresh"
+
+    await asyncio.gather(*FunctionCache._background)
+    assert len(calls) == 1
+    assert FunctionCache._refreshing == {}
+
+
+async def test_concurrent_misses_share_one_load():
+    loader, calls = counting_loader("value")
+
+    results = await asyncio.gather(*(FunctionCache.get_or_load(KEY, POLICY, loader) for _ in range(5)))
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert (await RedisClient.get(KEY))[0] == "value"
+
+
+async def test_stale_entry_is_refreshed_in_background():
+    await RedisClient.set(KEY, ["stale", time.time() - 1, 0.01], expire=60)
+    loader, calls = counting_loader("fresh")
+
+    assert await FunctionCache.get_or_load(KEY, POLICY, loader) == "stale"
+    await asyncio.gather(*FunctionCache._background)
+
+    assert len(calls) == 1
+    assert await FunctionCache.get_or_load(KEY, POLICY, loader) == "fresh"
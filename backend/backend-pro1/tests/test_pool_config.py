@@ -0,0 +1,42 @@
+"""
+连接池配置测试：默认容量需在服务端连接预算之内
+"""
+
+import pytest
+
+from shared.config import Settings
+from shared.pool_config import POOL_CONFIGS, check_connection_budget, connection_budget, get_pool_config
+
+# 4 核生产节点的 gunicorn 默认 worker 数
+WORKERS = 4 * 2 + 1
+
+
+@pytest.mark.parametrize("environment", sorted(POOL_CONFIGS))
+def test_default_pools_fit_server_connections(environment):
+    settings = Settings()
+
+    budget = check_connection_budget(
+        environment,
+        WORKERS,
+        settings.DATABASE_SERVER_MAX_CONNECTIONS,
+        settings.DATABASE_SUPERUSER_RESERVED_CONNECTIONS,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    )
+
+    assert budget <= settings.DATABASE_SERVER_MAX_CONNECTIONS - settings.DATABASE_SUPERUSER_RESERVED_CONNECTIONS
+
+
+@pytest.mark.parametrize("environment", sorted(POOL_CONFIGS))
+@pytest.mark.parametrize("service", ["api_gateway", "data_service", "ai_service"])
+def test_min_size_does_not_exceed_max_size(environment, service):
+    config = get_pool_config(environment, service)
+    assert 1 <= config.min_size <= config.max_size
+
+
+def test_pool_size_override_applies_to_every_service():
+    assert connection_budget("production", 2, pool_size=10, max_overflow=5) == (10 + 5) * 3 * 2
+
+
+def test_overcommit_is_rejected():
+    with pytest.raises(ValueError):
+        check_connection_budget("production", WORKERS, 150, 3, max_overflow=20)
@@ -0,0 +1,107 @@
+"""
+限流套餐解析测试
+令牌中的 plan 声明应使付费用户命中 api-gateway 声明的付费策略
+"""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+from starlette.requests import Request
+
+from shared.middleware.rate_limit_policy import DEFAULT_PLAN
+
+GATEWAY_RATE_LIMITS = Path(__file__).resolve().parent.parent / "api-gateway" / "app" / "core" / "rate_limits.py"
+
+
+def _load_gateway_rate_limits():
+    """按文件加载网关的限流配置（各服务的 app 包同名，不能直接导入）"""
+    spec = importlib.util.spec_from_file_location("gateway_rate_limits", GATEWAY_RATE_LIMITS)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+rate_limits = _load_gateway_rate_limits()
+
+
+async def _app(scope, receive, send):
+    pass
+
+
+@pytest.fixture
+def auth(auth_module):
+    return auth_module
+
+
+@pytest.fixture
+def middleware(auth_module):
+    from shared.middleware.rate_limit import RateLimitMiddleware
+
+    return RateLimitMiddleware(
+        _app,
+        redis_url="redis://localhost:6379/0",
+        rules=rate_limits.GATEWAY_RATE_LIMIT_RULES,
+    )
+
+
+def _request(path: str, token: str = None) -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": headers,
+        "client": ("10.0.0.1", 40000),
+    })
+
+
+def _token(auth, plan: str = None) -> str:
+    record = {"id": 42, "email": "user@example.com", "plan": plan}
+    return auth.create_access_token(auth.token_claims(record))
+
+
+def test_token_claims_carry_plan(auth):
+    assert auth.token_claims({"id": 1, "email": "a@example.com", "plan": "pro"})["plan"] == "pro"
+    assert auth.token_claims({"id": 1, "email": "a@example.com"})["plan"] == DEFAULT_PLAN
+
+
+@pytest.mark.parametrize("plan", rate_limits.PAID_PLANS)
+def test_paid_token_resolves_paid_policy(auth, middleware, plan):
+    path = f"{rate_limits.API_V1_PREFIX}/analysis/run"
+
+    client_id, resolved_plan = middleware._get_client_identity(_request(path, _token(auth, plan)))
+    resolved = middleware.policies.resolve("GET", path, resolved_plan)
+
+    assert client_id == "user:42"
+    assert resolved_plan == plan
+    assert resolved.policy == rate_limits.ANALYSIS_PAID_POLICY
+
+
+def test_free_token_resolves_free_policy(auth, middleware):
+    path = f"{rate_limits.API_V1_PREFIX}/analysis/run"
+
+    _, resolved_plan = middleware._get_client_identity(_request(path, _token(auth, "free")))
+
+    assert middleware.policies.resolve("GET", path, resolved_plan).policy == rate_limits.ANALYSIS_FREE_POLICY
+
+
+def test_anonymous_request_uses_default_plan(middleware):
+    client_id, resolved_plan = middleware._get_client_identity(_request("/api/v1/projects"))
+
+    assert client_id == "ip:10.0.0.1"
+    assert resolved_plan == DEFAULT_PLAN
+
+
+async def test_revoked_token_is_limited_by_ip(auth, middleware, monkeypatch, fake_redis):
+    from shared.token_revocation import TokenRevocationList
+
+    monkeypatch.setattr(TokenRevocationList, "_bloom", None)
+    token = _token(auth, "pro")
+    request = _request(f"{rate_limits.API_V1_PREFIX}/analysis/run", token)
+    assert middleware._get_client_identity(request) == ("user:42", "pro")
+
+    assert await auth.revoke_token(token)
+
+    assert middleware._get_client_identity(request) == ("ip:10.0.0.1", DEFAULT_PLAN)
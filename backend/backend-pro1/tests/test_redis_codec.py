@@ -0,0 +1,94 @@
+"""
+Redis值编解码测试
+"""
+
+from datetime import datetime
+
+import pytest
+
+from shared.redis_codec import TAG_BYTES, TAG_STR, Codec, TaggedSerializer
+
+CODECS = ["json", "orjson", "msgpack"]
+
+VALUES = [
+    {"id": 1, "name": "张三", "tags": ["a", "b"], "active": True, "score": 1.5, "parent": None},
+    [1, "two", 3.0, None],
+    42,
+    0,
+    True,
+    None,
+]
+
+
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("value", VALUES)
+def test_round_trip(codec, value):
+    serializer = TaggedSerializer(codec)
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_str_and_bytes_are_stored_verbatim(codec):
+    serializer = TaggedSerializer(codec)
+
+    assert serializer.dumps("文本") == bytes((TAG_STR,)) + "文本".encode("utf-8")
+    assert serializer.dumps(b"\x00\xff") == bytes((TAG_BYTES,)) + b"\x00\xff"
+    assert serializer.loads(serializer.dumps("42")) == "42"
+    assert serializer.loads(serializer.dumps(b"\x00\xff")) == b"\x00\xff"
+    assert serializer.loads(serializer.dumps(bytearray(b"ab"))) == b"ab"
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_datetime_is_encoded_as_iso_string(codec):
+    serializer = TaggedSerializer(codec)
+    created_at = datetime(2024, 1, 2, 3, 4, 5)
+
+    assert serializer.loads(serializer.dumps({"created_at": created_at})) == {
+        "created_at": created_at.isoformat()
+    }
+
+
+@pytest.mark.parametrize("writer", CODECS)
+@pytest.mark.parametrize("reader", CODECS)
+def test_values_written_by_another_codec_remain_readable(writer, reader):
+    value = {"plan": "pro", "limits": [10, 20]}
+    assert TaggedSerializer(reader).loads(TaggedSerializer(writer).dumps(value)) == value
+
+
+def test_untagged_legacy_values():
+    serializer = TaggedSerializer("orjson")
+
+    # INCR 写入的计数器与外部写入的文本
+    assert serializer.loads(b"17") == "17"
+    assert serializer.loads('{"legacy": true}'.encode("utf-8")) == '{"legacy": true}'
+    assert serializer.loads("旧值".encode("utf-8")) == "旧值"
+    # 非UTF-8的原始字节原样返回
+    assert serializer.loads(b"\xff\xfe") == b"\xff\xfe"
+    assert serializer.loads(b"") == ""
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        TaggedSerializer("pickle")
+
+
+def test_incomplete_codec_fails_at_instantiation():
+    class EncodeOnly(Codec):
+        def encode(self, value):
+            return b""
+
+    with pytest.raises(TypeError):
+        EncodeOnly()
+
+
+async def test_redis_client_reads_tagged_and_untagged_values(fake_redis):
+    from shared.redis_client import RedisClient
+
+    await RedisClient.set("codec:record", {"id": 1, "email": "a@example.com"})
+    await RedisClient.set("codec:text", "plain")
+    await fake_redis.incr("codec:counter")
+
+    assert await RedisClient.get("codec:record") == {"id": 1, "email": "a@example.com"}
+    assert await RedisClient.get("codec:text") == "plain"
+    assert await RedisClient.get("codec:counter") == "1"
+    assert await RedisClient.get("codec:missing") is None
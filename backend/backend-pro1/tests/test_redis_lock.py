@@ -0,0 +1,110 @@
+"""
+Redis分布式锁测试（锁脚本经 fakeredis 的Lua支持执行）
+"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("lupa", reason="fakeredis 执行Lua脚本需要 lupa")
+
+from shared.redis_lock import LockNotAcquiredError, LockReleaseListener, RedisLock  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+async def isolated_listener(monkeypatch, fake_redis):
+    """每个用例使用独立的等待方登记表，结束时停止释放通知监听"""
+    monkeypatch.setattr(LockReleaseListener, "_waiters", {})
+    monkeypatch.setattr(LockReleaseListener, "_listener_task", None)
+    yield
+    await LockReleaseListener.stop()
+
+
+async def test_fence_increases_with_each_acquisition():
+    first = RedisLock("job", ttl=5)
+    assert await first.acquire()
+    first_fence = first.fence
+    assert await first.release()
+
+    second = RedisLock("job", ttl=5)
+    assert await second.acquire()
+    assert second.fence > first_fence
+    await second.release()
+
+
+async def test_lock_is_exclusive():
+    holder = RedisLock("job", ttl=5)
+    other = RedisLock("job", ttl=5)
+    assert await holder.acquire()
+
+    assert not await other.acquire(blocking=False)
+    assert not await other.acquire(timeout=0.1)
+    with pytest.raises(LockNotAcquiredError):
+        async with RedisLock("job", ttl=5, blocking_timeout=0.1):
+            pass
+
+    await holder.release()
+    assert await other.acquire(blocking=False)
+    await other.release()
+
+
+async def test_auto_extend_keeps_lock_past_ttl(fake_redis):
+    lock = RedisLock("job", ttl=0.3)
+    assert await lock.acquire()
+
+    await asyncio.sleep(0.6)
+
+    assert lock.locked()
+    assert await fake_redis.pttl(lock.key) > 0
+    await lock.release()
+
+
+async def test_lost_lock_is_detected(fake_redis):
+    holder = RedisLock("job", ttl=0.3)
+    assert await holder.acquire()
+
+    # 模拟持有者停顿期间锁过期并被其他实例获取
+    await fake_redis.delete(holder.key)
+    usurper = RedisLock("job", ttl=5, auto_extend=False)
+    assert await usurper.acquire(blocking=False)
+
+    await asyncio.wait_for(holder.wait_lost(), timeout=2)
+
+    assert not holder.locked()
+    assert usurper.fence > holder.fence
+    # 失去锁的一方释放时不能删除新持有者的锁
+    assert not await holder.release()
+    assert await fake_redis.get(usurper.key) == usurper.token
+    await usurper.release()
+
+
+async def test_expired_lock_without_extension_is_not_locked():
+    lock = RedisLock("job", ttl=0.1, auto_extend=False)
+    assert await lock.acquire()
+
+    await asyncio.sleep(0.15)
+
+    assert not lock.locked()
+    other = RedisLock("job", ttl=5)
+    assert await other.acquire(blocking=False)
+    assert other.fence > lock.fence
+    await other.release()
+
+
+async def test_release_notification_wakes_waiter():
+    await LockReleaseListener.start()
+    holder = RedisLock("job", ttl=30)
+    assert await holder.acquire()
+
+    waiter = RedisLock("job", ttl=30)
+    waiting = asyncio.create_task(waiter.acquire(timeout=10))
+    await asyncio.sleep(0.1)
+
+    released_at = time.monotonic()
+    await holder.release()
+    assert await asyncio.wait_for(waiting, timeout=5)
+
+    # 不依赖30秒的锁有效期轮询，收到释放通知后立即重试
+    assert time.monotonic() - released_at < 5
+    await waiter.release()
@@ -0,0 +1,107 @@
+"""
+Redis自动流水线测试
+"""
+
+import asyncio
+
+import pytest
+import redis.asyncio as redis
+
+from shared.redis_pipeline import AutoPipeline
+
+
+async def test_concurrent_commands_share_one_round_trip(fake_redis):
+    pipeline = AutoPipeline(fake_redis, "test")
+
+    await asyncio.gather(*(pipeline.execute_command("SET", f"key:{i}", i) for i in range(10)))
+    values = await asyncio.gather(*(pipeline.execute_command("GET", f"key:{i}") for i in range(10)))
+
+    assert values == [str(i) for i in range(10)]
+    assert pipeline.commands == 20
+    assert pipeline.round_trips == 2
+
+
+async def test_batches_are_split_at_max_batch(fake_redis):
+    pipeline = AutoPipeline(fake_redis, "test", max_batch=4)
+
+    results = await asyncio.gather(*(pipeline.execute_command("INCR", "counter") for _ in range(10)))
+
+    assert sorted(results) == list(range(1, 11))
+    assert pipeline.round_trips == 3
+
+
+async def test_single_command_is_sent_directly(fake_redis):
+    pipeline = AutoPipeline(fake_redis, "test")
+
+    assert await pipeline.execute_command("PING") is True
+    assert pipeline.round_trips == 1
+
+
+async def test_command_error_does_not_affect_batch(fake_redis):
+    await fake_redis.set("text", "not a number")
+    pipeline = AutoPipeline(fake_redis, "test")
+
+    results = await asyncio.gather(
+        pipeline.execute_command("SET", "a", "1"),
+        pipeline.execute_command("INCR", "text"),
+        pipeline.execute_command("GET", "a"),
+        return_exceptions=True
+    )
+
+    assert results[0] is True
+    assert isinstance(results[1], redis.ResponseError)
+    assert results[2] == "1"
+    assert pipeline.round_trips == 1
+
+
+async def test_cancelled_caller_does_not_affect_batch(fake_redis):
+    pipeline = AutoPipeline(fake_redis, "test")
+
+    first = asyncio.create_task(pipeline.execute_command("SET", "a", "1"))
+    cancelled = asyncio.create_task(pipeline.execute_command("SET", "b", "2"))
+    last = asyncio.create_task(pipeline.execute_command("GET", "a"))
+
+    # 三条命令已入队、批次尚未发送时取消其中一个调用方
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await first is True
+    assert await last == "1"
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    await pipeline.close()
+    assert pipeline.round_trips == 1
+    # 已入队的命令仍随批次发送，只是响应被丢弃
+    assert await fake_redis.get("b") == "2"
+
+
+class BrokenPipe:
+    def execute_command(self, *args, **options):
+        pass
+
+    async def execute(self, raise_on_error=True):
+        raise redis.ConnectionError("connection reset")
+
+
+class BrokenClient:
+    async def execute_command(self, *args, **options):
+        raise redis.ConnectionError("connection reset")
+
+    def pipeline(self, transaction=True):
+        return BrokenPipe()
+
+
+async def test_connection_error_propagates_to_whole_batch():
+    pipeline = AutoPipeline(BrokenClient(), "test")
+
+    results = await asyncio.gather(
+        *(pipeline.execute_command("GET", f"key:{i}") for i in range(3)),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(result, redis.ConnectionError) for result in results)
+
+
+def test_invalid_max_batch_is_rejected():
+    with pytest.raises(ValueError):
+        AutoPipeline(None, "test", max_batch=0)
@@ -0,0 +1,54 @@
+"""
+令牌验证缓存测试：撤销钩子命中时视为未命中
+"""
+
+import time
+import uuid
+
+import pytest
+
+from shared.token_cache import TokenVerificationCache
+from shared.token_revocation import TokenRevocationList
+
+
+@pytest.fixture
+def revocation_hook(monkeypatch, fake_redis):
+    """以布隆过滤器作为撤销钩子，每个用例使用空的缓存与过滤器"""
+    monkeypatch.setattr(TokenVerificationCache, "_entries", type(TokenVerificationCache._entries)())
+    monkeypatch.setattr(TokenVerificationCache, "_revocation_hooks", [])
+    monkeypatch.setattr(TokenRevocationList, "_bloom", None)
+    TokenVerificationCache.add_revocation_hook(TokenRevocationList.might_be_revoked)
+
+
+def _payload() -> dict:
+    return {"sub": "42", "type": "access", "exp": time.time() + 600, "jti": uuid.uuid4().hex}
+
+
+async def test_revoked_jti_misses_cache(revocation_hook):
+    payload = _payload()
+    TokenVerificationCache.put("token", payload)
+    assert TokenVerificationCache.get("token") == payload
+
+    assert await TokenRevocationList.revoke(payload)
+
+    assert TokenVerificationCache.get("token") is None
+    # 已撤销的载荷不会被重新写入缓存
+    TokenVerificationCache.put("token", payload)
+    assert TokenVerificationCache.get("token") is None
+
+
+async def test_other_tokens_still_hit(revocation_hook):
+    revoked, active = _payload(), _payload()
+    TokenVerificationCache.put("revoked", revoked)
+    TokenVerificationCache.put("active", active)
+
+    await TokenRevocationList.revoke(revoked)
+
+    assert TokenVerificationCache.get("revoked") is None
+    assert TokenVerificationCache.get("active") == active
+
+
+def test_hook_is_registered_once(revocation_hook):
+    TokenVerificationCache.add_revocation_hook(TokenRevocationList.might_be_revoked)
+
+    assert TokenVerificationCache._revocation_hooks == [TokenRevocationList.might_be_revoked]
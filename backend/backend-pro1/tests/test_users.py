@@ -0,0 +1,89 @@
+"""
+用户写操作测试：提交后应使两级用户缓存失效
+"""
+
+import pytest
+
+from shared import users
+from shared.database import Database
+from shared.queries import DEACTIVATE_USER, UPDATE_LAST_LOGIN, UPDATE_USER_PROFILE
+from shared.user_cache import USER_CACHE_INVALIDATION_CHANNEL, USER_CACHE_KEY_PREFIX, UserCache
+
+ACTIVE = {"id": 7, "email": "a@example.com", "is_active": True, "first_name": "张"}
+
+
+class FakeUsersTable:
+    """记录执行的语句，模拟 users/user_profiles 的更新"""
+
+    def __init__(self):
+        self.record = dict(ACTIVE)
+        self.executed = []
+
+    async def execute(self, query, *args):
+        self.executed.append((query, args))
+        if query is DEACTIVATE_USER:
+            if not self.record["is_active"]:
+                return "UPDATE 0"
+            self.record["is_active"] = False
+        elif query is UPDATE_USER_PROFILE:
+            self.record["first_name"] = args[1] or self.record["first_name"]
+        return "UPDATE 1"
+
+    async def load_active(self, user_id):
+        return dict(self.record) if self.record["is_active"] else None
+
+
+@pytest.fixture
+def table(monkeypatch, fake_redis):
+    table = FakeUsersTable()
+    monkeypatch.setattr(Database, "execute", table.execute)
+    UserCache.clear()
+    yield table
+    UserCache.clear()
+
+
+async def _cached(table):
+    return await UserCache.get_or_load(ACTIVE["id"], table.load_active)
+
+
+async def test_deactivate_user_evicts_both_tiers(table, fake_redis):
+    assert (await _cached(table))["is_active"]
+    assert await fake_redis.exists(f"{USER_CACHE_KEY_PREFIX}{ACTIVE['id']}")
+
+    assert await users.deactivate_user(ACTIVE["id"])
+
+    assert not await fake_redis.exists(f"{USER_CACHE_KEY_PREFIX}{ACTIVE['id']}")
+    # 下一次认证回源数据库，被禁用的用户不再通过
+    assert await _cached(table) is None
+    assert not await users.deactivate_user(ACTIVE["id"])
+
+
+async def test_profile_update_is_visible_on_next_read(table):
+    assert (await _cached(table))["first_name"] == "张"
+
+    assert await users.update_user_profile(ACTIVE["id"], first_name="李")
+
+    assert table.executed[-1] == (UPDATE_USER_PROFILE, (ACTIVE["id"], "李", None, None))
+    assert (await _cached(table))["first_name"] == "李"
+
+
+async def test_record_login_invalidates(table, fake_redis):
+    await _cached(table)
+
+    await users.record_login(ACTIVE["id"])
+
+    assert table.executed == [(UPDATE_LAST_LOGIN, (ACTIVE["id"],))]
+    assert UserCache._local_get(ACTIVE["id"]) is None
+    assert not await fake_redis.exists(f"{USER_CACHE_KEY_PREFIX}{ACTIVE['id']}")
+
+
+async def test_invalidation_is_broadcast(table, fake_redis):
+    pubsub = fake_redis.pubsub()
+    await pubsub.subscribe(USER_CACHE_INVALIDATION_CHANNEL)
+    await pubsub.get_message(timeout=1)
+
+    await users.deactivate_user(ACTIVE["id"])
+
+    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+    assert message["data"] == str(ACTIVE["id"])
+    await pubsub.aclose()
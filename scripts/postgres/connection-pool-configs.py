@@ -1,98 +1,25 @@
 """
 PostgreSQL Connection Pool Configuration for SaaS Control Deck
 Environment-specific connection pool settings optimized for different workloads
+
+Pool sizes and session settings come from
+backend/backend-pro1/shared/pool_config.py, the same source the services use
+(Database.connect_service); this script remains as a standalone health-check tool.
 """
 
 import asyncio
+import sys
+from pathlib import Path
 import asyncpg
 from typing import Dict, Any, Optional
-from dataclasses import dataclass
 import structlog
 
-logger = structlog.get_logger()
-
-@dataclass
-class PoolConfig:
-    """Connection pool configuration for different environments"""
-    min_size: int
-    max_size: int
-    command_timeout: int
-    query_timeout: int
-    server_settings: Dict[str, str]
-    pool_recycle: int  # Seconds before recreating connections
-    retry_attempts: int
-    retry_delay: float
+# Make the shared backend package importable when run from the repository
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend" / "backend-pro1"))
 
-# Environment-specific connection pool configurations
-POOL_CONFIGS = {
-    "development": PoolConfig(
-        min_size=2,
-        max_size=8,
-        command_timeout=30,
-        query_timeout=60,
-        server_settings={
-            'application_name': 'saascontrol_dev',
-            'statement_timeout': '60s',
-            'lock_timeout': '30s',
-            'jit': 'off',  # Disable JIT for dev (faster small queries)
-            'work_mem': '16MB',
-            'temp_buffers': '32MB'
-        },
-        pool_recycle=3600,  # 1 hour
-        retry_attempts=3,
-        retry_delay=1.0
-    ),
-    
-    "staging": PoolConfig(
-        min_size=5,
-        max_size=15,
-        command_timeout=45,
-        query_timeout=120,
-        server_settings={
-            'application_name': 'saascontrol_stage',
-            'statement_timeout': '120s',
-            'lock_timeout': '45s',
-            'jit': 'on',
-            'jit_above_cost': '100000',
-            'work_mem': '24MB',
-            'temp_buffers': '48MB',
-            'maintenance_work_mem': '128MB'
-        },
-        pool_recycle=1800,  # 30 minutes
-        retry_attempts=5,
-        retry_delay=2.0
-    ),
-    
-    "production": PoolConfig(
-        min_size=10,
-        max_size=25,
-        command_timeout=60,
-        query_timeout=300,
-        server_settings={
-            'application_name': 'saascontrol_prod',
-            'statement_timeout': '300s',
-            'lock_timeout': '60s',
-            'jit': 'on',
-            'jit_above_cost': '50000',
-            'work_mem': '32MB',
-            'temp_buffers': '64MB',
-            'maintenance_work_mem': '256MB',
-            'shared_preload_libraries': 'pg_stat_statements',
-            'track_activities': 'on',
-            'track_counts': 'on'
-        },
-        pool_recycle=1200,  # 20 minutes
-        retry_attempts=10,
-        retry_delay=5.0
-    )
-}
+from shared.pool_config import get_pool_config  # noqa: E402
 
-# Service-specific pool size multipliers
-SERVICE_MULTIPLIERS = {
-    "api_gateway": 1.2,  # Higher load from frontend requests
-    "data_service": 1.5,  # Database-intensive operations
-    "ai_service": 0.8     # Longer-running but fewer concurrent operations
-}
+logger = structlog.get_logger()
 
 class OptimizedDatabase:
     """Enhanced database connection manager with environment-specific optimization"""
@@ -104,13 +31,12 @@ class OptimizedDatabase:
     async def initialize_pools(cls, environment: str, database_configs: Dict[str, str]):
         """Initialize connection pools for all databases in the environment"""
         cls._environment = environment
-        pool_config = POOL_CONFIGS.get(environment, POOL_CONFIGS["development"])
         
         for service, db_url in database_configs.items():
-            # Apply service-specific multipliers
-            multiplier = SERVICE_MULTIPLIERS.get(service, 1.0)
-            adjusted_max_size = int(pool_config.max_size * multiplier)
-            adjusted_min_size = max(1, int(pool_config.min_size * multiplier))
+            # Sizes already include the service-specific multiplier
+            pool_config = get_pool_config(environment, service)
+            adjusted_max_size = pool_config.max_size
+            adjusted_min_size = pool_config.min_size
             
             try:
                 pool = await asyncpg.create_pool(
@@ -118,8 +44,7 @@ class OptimizedDatabase:
                     min_size=adjusted_min_size,
                     max_size=adjusted_max_size,
                     command_timeout=pool_config.command_timeout,
-                    server_settings=pool_config.server_settings,
-                    setup=cls._setup_connection
+                    server_settings=pool_config.startup_settings(service)
                 )
                 
                 cls._pools[service] = pool
@@ -141,25 +66,6 @@ class OptimizedDatabase:
                 )
                 raise
     
-    @classmethod
-    async def _setup_connection(cls, connection: asyncpg.Connection):
-        """Setup function called for each new connection"""
-        # Set connection-specific optimizations
-        await connection.execute("SET timezone = 'UTC'")
-        await connection.execute("SET standard_conforming_strings = on")
-        
-        # Environment-specific connection setup
-        if cls._environment == "production":
-            # Production-specific settings
-            await connection.execute("SET log_statement_stats = off")
-            await connection.execute("SET log_parser_stats = off")
-            await connection.execute("SET log_planner_stats = off")
-            await connection.execute("SET log_executor_stats = off")
-        elif cls._environment == "development":
-            # Development-specific settings for debugging
-            await connection.execute("SET log_min_duration_statement = '1s'")
-            await connection.execute("SET auto_explain.log_min_duration = '2s'")
-    
     @classmethod
     def get_pool(cls, service: str) -> asyncpg.Pool:
         """Get connection pool for specific service"""